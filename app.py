@@ -1,10 +1,16 @@
+import inspect
+import io
+import os
+import tempfile
+
+import numpy as np
 import streamlit as st
 import pandas as pd
-import numpy as np
-import math
 from datetime import datetime
-import plotly.graph_objects as go
-import plotly.express as px
+
+from soil_loss import (charts, engine, erosivity, figures, optimize, params, profiling, projects, reports, segments,
+                       scenarios, sensitivity, spatial, sweep, timeseries, uncertainty)
+from soil_loss.summary import COL_TOTAL, COL_TYPE, summary_frame
 
 # ========== 页面配置 ==========
 st.set_page_config(
@@ -14,6 +20,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# ========== 性能诊断（可选） ==========
+# 设置环境变量 SOIL_LOSS_PROFILE=1 或在网址后加 ?debug=1 启用，诊断面板显示在侧边栏末尾。
+# 未启用时 prof.span() 为空操作。
+profiling_on = profiling.enabled_by_env() or st.query_params.get("debug") == "1"
+prof = profiling.RerunProfile(enabled=profiling_on, memory=st.session_state.get("prof_memory", False),
+                              capture=st.session_state.pop("prof_capture", None))
+
 # ========== CSS样式 ==========
 st.markdown("""
 <style>
@@ -54,64 +67,262 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# ========== 缓存计算 ==========
+# 每次控件变化都会从头执行脚本；图表、汇总表和坡段计算按输入缓存，
+# 未变化的部分直接复用上次结果。max_entries 限制每个函数的缓存条目数（LRU 淘汰）。
+CACHE_ENTRIES = 256
+
+
+@st.cache_resource(show_spinner=False)
+def parameter_store():
+    # 参数库连接在会话间共享，查询结果由参数库自身在进程内缓存
+    return params.ParameterStore()
+
+
+@st.cache_resource(show_spinner=False)
+def profile_history():
+    return profiling.ProfileHistory()
+
+
+@st.cache_resource(show_spinner=False)
+def project_store():
+    return projects.ProjectStore()
+
+
+# 项目库查询按库内容标识 version 缓存，保存或删除项目后自动失效
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_portfolio(version, regions, name_like, order_by, descending):
+    return project_store().projects(order_by=order_by, descending=descending,
+                                    regions=regions, name_like=name_like)
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_portfolio_charts(version, regions, name_like, top_ids):
+    store = project_store()
+    df_region = store.region_summary(regions=regions, name_like=name_like)
+    df_matrix = store.type_matrix(ids=top_ids)
+    return figures.portfolio_bar(df_matrix), figures.region_type_bar(df_region), df_region
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner="正在由降雨记录计算R...")
+def cached_station_r(data, name):
+    source = io.BytesIO(data)
+    frame = pd.read_parquet(source) if name.lower().endswith(".parquet") else pd.read_csv(source)
+    return erosivity.erosivity_from_frame(frame).mean()
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_area_pie(labels, values):
+    return figures.area_pie(labels, values)
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_excavation_sketch(slope_height, slope_angle):
+    return figures.excavation_sketch(slope_height, slope_angle)
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_pile_sketch(pile_shape, pile_height, pile_length):
+    return figures.pile_sketch(pile_shape, pile_height, pile_length)
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_profile_table(segment_df):
+    return segments.profile_table(segment_df)
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_profile_figure(segment_df):
+    return charts.profile_figure(segment_df)
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_summary(areas, unit_losses, total_losses):
+    return summary_frame(areas, unit_losses, total_losses)
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner="正在运行蒙特卡洛模拟...")
+def cached_monte_carlo(general, excavation, pile, other_area, region, soil_type, fraction, n_draws, seed,
+                       revision):
+    store = parameter_store()
+    distributions = uncertainty.default_distributions(general, excavation, pile, region, soil_type, fraction,
+                                                      store.r_ranges(revision), store.k_ranges(revision))
+    result = uncertainty.simulate(*distributions, other_area=other_area, n_draws=n_draws, seed=seed,
+                                  tables=store.tables(revision))
+    return result.percentiles()
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner="正在计算敏感性指数...")
+def cached_sensitivity(kind, inputs, method, fraction, n_samples, revision):
+    values = {"slope_length": 50.0, "slope_angle": 15.0, **inputs}
+    bounds = sensitivity.default_bounds(kind, values, fraction, parameter_store().tables(revision))
+    if method == "Sobol":
+        return sensitivity.sobol(kind, bounds, n=n_samples, seed=0), ["ST", "S1"]
+    return sensitivity.morris(kind, bounds, trajectories=max(n_samples // 16, 10), seed=0), ["mu_star", "sigma"]
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner="正在搜索最低费用方案...")
+def cached_optimization(general, excavation, pile, bounds, options, costs, option_costs, target, revision):
+    problem = optimize.DesignProblem(general, excavation, pile, bounds=bounds, options=options, costs=costs,
+                                     option_costs=option_costs, tables=parameter_store().tables(revision))
+    result = optimize.optimize(problem, target=target, seed=0)
+    chosen = result.cheapest()
+    return result, chosen, figures.pareto_front(result.front, result.baseline_loss, target, chosen)
+
+
+@st.cache_resource(max_entries=CACHE_ENTRIES, show_spinner="正在计算响应面...")
+def cached_sweep(kind, inputs, axes, revision):
+    # 响应面数组较大，按引用共享（只读），切片时不复制整个网格
+    return sweep.evaluate(kind, inputs, dict(axes), parameter_store().tables(revision))
+
+
+@st.cache_resource(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_scenario_baseline(units, revision):
+    # 基准单元结果按单元表共享，各情景只重算被修改的单元
+    return scenarios.Baseline(units, parameter_store().tables(revision))
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_scenarios(units, table, revision):
+    baseline = cached_scenario_baseline(units, revision)
+    result = scenarios.scenarios_from_table(baseline, table)
+    df_compare = scenarios.compare(baseline, result.values())
+    df_types = df_compare[df_compare[COL_TYPE] != scenarios.TOTAL_LABEL]
+    df_matrix = df_types.pivot(index="情景", columns=COL_TYPE, values=COL_TOTAL).reindex(df_types["情景"].unique())
+    changes = {name: scenario.changes() for name, scenario in result.items()}
+    return (df_compare, changes, figures.portfolio_bar(df_matrix, "各情景流失量构成"),
+            figures.scenario_change_bar(df_compare))
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_sensitivity_chart(df_indices, columns, title):
+    return figures.sensitivity_bar(df_indices, columns, title)
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_monthly(coefficients, annual_R, region, base_area, base_C, base_P, df_phases, n_months,
+                   start_month, start_year, revision):
+    kinds = ["一般扰动地表", "工程开挖面", "工程堆积体"]
+    phases = pd.DataFrame({
+        "unit": [kinds.index(kind) for kind in df_phases["扰动类型"]],
+        "start": df_phases["开始月"].astype(int),
+        "end": df_phases["结束月"].astype(int),
+        "area": df_phases["面积(hm²)"].astype(float),
+        "C": df_phases["C"].astype(float),
+        "P": df_phases["P"].astype(float)
+    })
+    result = timeseries.simulate_period(coefficients, kinds, annual_R, region, base_area, base_C, base_P,
+                                        phases, n_months, start_month, start_year,
+                                        parameter_store().monthly_shares(revision))
+    return result.by_type()
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_summary_charts(df_summary):
+    return figures.loss_pie(df_summary), figures.unit_loss_bar(df_summary)
+
+
+@st.cache_resource(max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_summary_styler(df_summary):
+    # Styler 不可序列化，按汇总表内容缓存对象本身
+    return df_summary.style.format({
+        "面积(hm²)": "{:.2f}",
+        "单位流失量(t/hm²)": "{:.2f}",
+        "总流失量(t)": "{:.2f}"
+    }).background_gradient(subset=["总流失量(t)"], cmap="YlOrRd")
+
+
 # ========== 标题 ==========
 st.markdown('<h1 class="main-header">🌍 生产建设项目土壤流失量综合测算平台</h1>', unsafe_allow_html=True)
 st.markdown("**依据《生产建设项目土壤流失量测算导则》（SL 773-2018）**")
 st.caption("Version 2.0 | 涵盖导则全部计算场景 | 支持多项目对比")
 
 # ========== 侧边栏 - 项目配置 ==========
-with st.sidebar:
+store = parameter_store()
+
+with st.sidebar, prof.span("侧边栏"):
     st.header("⚙️ 项目配置")
     
     project_name = st.text_input("项目名称", "示例水土保持项目")
-    project_location = st.selectbox("项目所在地", 
-        ["华北地区", "东北地区", "华东地区", "华中地区", "华南地区", "西南地区", "西北地区"])
     
     st.divider()
     st.header("📊 预设参数库")
     
-    # R因子数据库
-    r_factor_db = {
-        "华北地区": 1800,
-        "东北地区": 2200,
-        "华东地区": 3500,
-        "华中地区": 4200,
-        "华南地区": 5800,
-        "西南地区": 3800,
-        "西北地区": 1200
-    }
+    revisions = store.revisions()
+    param_revision = st.selectbox("标准版本", revisions, index=revisions.index(store.revision))
+    param_tables = store.tables(param_revision)
+    
+    # R因子数据库（地区级）
+    df_r_regions = store.r_factors(param_revision, level="region")
+    r_factor_db = dict(zip(df_r_regions["name"], df_r_regions["value"]))
     
     # K因子数据库
-    k_factor_db = {
-        "砂土": 0.12,
-        "砂壤土": 0.18,
-        "轻壤土": 0.25,
-        "中壤土": 0.32,
-        "重壤土": 0.38,
-        "黏土": 0.42
-    }
+    df_k = store.k_factors(param_revision)
+    k_factor_db = dict(zip(df_k["name"], df_k["value"]))
+    
+    project_location = st.selectbox("项目所在地", list(r_factor_db))
     
     use_preset = st.checkbox("使用地区预设参数", value=True)
     
     if use_preset:
-        r_preset = r_factor_db.get(project_location, 2000)
-        st.info(f"📌 {project_location} R因子参考值: {r_preset} MJ·mm/(hm²·h)")
+        r_preset = r_factor_db.get(project_location, engine.R_FACTOR_DEFAULT)
+        if st.toggle("按坐标查询最近站点R值", value=False, key="r_by_coord"):
+            coord_cols = st.columns(2)
+            with coord_cols[0]:
+                project_lon = st.number_input("经度 (°E)", -180.0, 180.0, 116.40, 0.01, key="lon")
+            with coord_cols[1]:
+                project_lat = st.number_input("纬度 (°N)", -90.0, 90.0, 39.90, 0.01, key="lat")
+            r_code, r_preset, r_distance = store.nearest_r(project_lon, project_lat, param_revision)
+            st.caption(f"最近站点: {r_code}，距离 {r_distance:.1f} km")
+        if st.toggle("由降雨过程记录计算R", value=False, key="r_from_records",
+                     help="逐 1/5 分钟雨量记录 (CSV/Parquet: station, time, rain)，按 R = Σ(E×I30) 计算多年平均 R"):
+            record_file = st.file_uploader("降雨过程记录", type=["csv", "parquet"], key="r_records")
+            if record_file is not None:
+                try:
+                    df_station_r = cached_station_r(record_file.getvalue(), record_file.name)
+                except (KeyError, ValueError) as e:
+                    st.error(f"记录无法解析: {e}")
+                else:
+                    if len(df_station_r):
+                        r_station = st.selectbox("站点", df_station_r["station"].astype(str), key="r_station")
+                        row = df_station_r[df_station_r["station"].astype(str) == r_station].iloc[0]
+                        r_preset = round(float(row["R"]), 1)
+                        st.caption(f"{int(row['years'])} 年记录，{int(row['events'])} 次侵蚀性降雨")
+                    else:
+                        st.warning("记录中没有侵蚀性降雨")
+        st.info(f"📌 {project_location} R因子参考值: {r_preset:g} MJ·mm/(hm²·h)")
     
     st.divider()
     calculation_year = st.slider("测算年份", 2020, 2030, 2024)
 
 # ========== 主界面 - 标签页布局 ==========
-tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
+# 新版 Streamlit 的标签页可跟踪选中状态（切换时重跑），未显示的标签页跳过图表、参考表等重内容；
+# 输入控件始终创建，保证各标签页的输入和汇总结果不受影响。旧版本不跟踪状态，按全部显示处理。
+TRACKED_TABS = "on_change" in inspect.signature(st.tabs).parameters
+
+
+def tracked_tabs(labels, key):
+    if TRACKED_TABS:
+        return st.tabs(labels, key=key, on_change="rerun")
+    return st.tabs(labels)
+
+
+def is_open(*tabs):
+    return all(getattr(tab, "open", None) is not False for tab in tabs)
+
+
+tab1, tab2, tab3, tab4, tab5, tab6, tab7 = tracked_tabs([
     "📋 项目概览", 
     "📐 一般扰动地表", 
     "⚒️ 工程开挖面", 
     "⛰️ 工程堆积体", 
     "📈 结果汇总", 
-    "⚙️ 参数查询"
-])
+    "⚙️ 参数查询",
+    "🗂️ 多项目对比"
+], key="main_tabs")
 
 # ========== 标签页1: 项目概览 ==========
-with tab1:
+with tab1, prof.span("项目概览"):
     col1, col2 = st.columns([2, 1])
     
     with col1:
@@ -129,15 +340,44 @@ with tab1:
         # 扰动类型面积分配
         st.markdown('<h3 class="sub-header">扰动类型面积分配</h3>', unsafe_allow_html=True)
         
+        # 面积输入框的初值放在会话状态中，图层导入时直接改写
+        AREA_DEFAULTS = {"area_general": 4.0, "area_excavation": 2.0, "area_pile": 3.0, "area_other": 1.0}
+        for key, default in AREA_DEFAULTS.items():
+            st.session_state.setdefault(key, default)
+        
+        def import_layer_areas():
+            uploaded = st.session_state.get("area_layer")
+            st.session_state.pop("area_layer_error", None)
+            if uploaded is None:
+                return
+            try:
+                with tempfile.TemporaryDirectory() as folder:
+                    path = os.path.join(folder, uploaded.name)
+                    with open(path, "wb") as f:
+                        f.write(uploaded.getvalue())
+                    layer_areas = spatial.type_areas(spatial.read_layer(path))
+            except (ImportError, ValueError, RuntimeError) as e:
+                st.session_state["area_layer_error"] = str(e)
+                return
+            for key, area in zip(AREA_DEFAULTS, layer_areas):
+                st.session_state[key] = round(area, 4)
+        
+        with st.expander("从扰动区图层导入面积"):
+            st.file_uploader("扰动区多边形图层 (GeoJSON/GeoPackage，属性列 disturbance_type)",
+                             type=["geojson", "json", "gpkg"], key="area_layer", on_change=import_layer_areas,
+                             help="按多边形投影面积汇总各扰动类型面积；逐多边形测算及 R/K 分区连接见命令行 spatial 子命令")
+            if "area_layer_error" in st.session_state:
+                st.error(st.session_state["area_layer_error"])
+        
         dist_cols = st.columns(4)
         with dist_cols[0]:
-            area_general = st.number_input("一般扰动地表 (hm²)", min_value=0.0, value=4.0, step=0.5)
+            area_general = st.number_input("一般扰动地表 (hm²)", min_value=0.0, step=0.5, key="area_general")
         with dist_cols[1]:
-            area_excavation = st.number_input("工程开挖面 (hm²)", min_value=0.0, value=2.0, step=0.5)
+            area_excavation = st.number_input("工程开挖面 (hm²)", min_value=0.0, step=0.5, key="area_excavation")
         with dist_cols[2]:
-            area_pile = st.number_input("工程堆积体 (hm²)", min_value=0.0, value=3.0, step=0.5)
+            area_pile = st.number_input("工程堆积体 (hm²)", min_value=0.0, step=0.5, key="area_pile")
         with dist_cols[3]:
-            area_other = st.number_input("其他扰动 (hm²)", min_value=0.0, value=1.0, step=0.5)
+            area_other = st.number_input("其他扰动 (hm²)", min_value=0.0, step=0.5, key="area_other")
     
     with col2:
         st.markdown('<h3 class="sub-header">项目摘要</h3>', unsafe_allow_html=True)
@@ -150,95 +390,122 @@ with tab1:
             '其他扰动': area_other
         }
         
-        fig = go.Figure(data=[go.Pie(
-            labels=list(areas.keys()),
-            values=list(areas.values()),
-            hole=.3,
-            marker_colors=['#3b82f6', '#10b981', '#f59e0b', '#ef4444']
-        )])
-        fig.update_layout(
-            title="扰动类型面积分布",
-            height=300,
-            showlegend=True,
-            margin=dict(t=50, b=0, l=0, r=0)
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        if is_open(tab1):
+            with prof.span("面积饼图", "render"):
+                st.plotly_chart(cached_area_pie(tuple(areas.keys()), tuple(areas.values())),
+                                use_container_width=True)
         
         # 项目摘要指标
         total_area = sum(areas.values())
         st.metric("总扰动面积", f"{total_area:.2f} hm²")
         st.metric("植被覆盖率", f"{vegetation_coverage}%")
         if use_preset:
-            st.metric("R因子预设值", f"{r_preset}")
+            st.metric("R因子预设值", f"{r_preset:g}")
 
 # ========== 标签页2: 一般扰动地表计算 ==========
-with tab2:
+with tab2, prof.span("一般扰动地表"):
     st.markdown('<h3 class="sub-header">一般扰动地表土壤流失量计算</h3>', unsafe_allow_html=True)
     
     # 使用扩展或基本模式
     calculation_mode = st.radio("计算模式", ["基本计算", "详细计算（多坡段）"], horizontal=True)
     
-    if calculation_mode == "基本计算":
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.markdown("**侵蚀因子**")
-            R = st.number_input("R - 降雨侵蚀力因子", 
-                               min_value=0.0, value=float(r_preset) if use_preset else 2000.0, 
-                               step=100.0, key="r_gen")
-            K = st.number_input("K - 土壤可蚀性因子", 
-                               min_value=0.0, value=k_factor_db[soil_type_main], 
-                               step=0.01, key="k_gen",
-                               help="参考值: 砂土0.12, 壤土0.25-0.38, 黏土0.42")
-            C = st.slider("C - 植被覆盖因子", 0.0, 1.0, 0.3, 0.05, key="c_gen",
-                         help="0表示完全覆盖，1表示无覆盖")
-        
-        with col2:
-            st.markdown("**地形因子**")
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.markdown("**侵蚀因子**")
+        R = st.number_input("R - 降雨侵蚀力因子", 
+                           min_value=0.0, value=float(r_preset) if use_preset else 2000.0, 
+                           step=100.0, key="r_gen")
+        K = st.number_input("K - 土壤可蚀性因子", 
+                           min_value=0.0, value=k_factor_db[soil_type_main], 
+                           step=0.01, key="k_gen",
+                           help="参考值: 砂土0.12, 壤土0.25-0.38, 黏土0.42")
+        C = st.slider("C - 植被覆盖因子", 0.0, 1.0, 0.3, 0.05, key="c_gen",
+                     help="0表示完全覆盖，1表示无覆盖")
+    
+    with col3:
+        st.markdown("**工程因子**")
+        P = st.slider("P - 水土保持措施因子", 0.0, 1.0, 1.0, 0.1,
+                     help="1表示无措施，值越小表示措施效果越好")
+        T = st.selectbox("T - 耕作管理因子", [1.0, 0.8, 0.6, 0.4], index=0,
+                       help="反映耕作方式对侵蚀的影响")
+    
+    with col2:
+        st.markdown("**地形因子**")
+        if calculation_mode == "基本计算":
             slope_length = st.number_input("λ - 坡长 (m)", min_value=0.0, value=50.0, step=5.0)
             slope_angle = st.slider("θ - 坡度 (°)", 0.0, 90.0, 15.0, 1.0)
             
             # 根据坡度确定m,n值
-            if slope_angle < 20:
-                m, n = 0.3, 1.2
-                slope_type = "缓坡"
-            else:
-                m, n = 0.5, 1.3
-                slope_type = "陡坡"
+            m, n = engine.slope_exponents(slope_angle)
+            slope_type = "缓坡" if slope_angle < engine.SLOPE_CLASS_THRESHOLD else "陡坡"
             
             st.info(f"坡度类型: {slope_type} (m={m}, n={n})")
-        
-        with col3:
-            st.markdown("**工程因子**")
-            P = st.slider("P - 水土保持措施因子", 0.0, 1.0, 1.0, 0.1,
-                         help="1表示无措施，值越小表示措施效果越好")
-            T = st.selectbox("T - 耕作管理因子", [1.0, 0.8, 0.6, 0.4], index=0,
-                           help="反映耕作方式对侵蚀的影响")
-        
-        # 计算LS因子和土壤流失量
-        slope_rad = math.radians(slope_angle)
-        LS = math.pow(slope_length / 20, m) * math.pow(math.sin(slope_rad) / 0.3, n)
-        A_general = R * K * LS * C * P * T * area_general
-        
-        # 显示结果卡片
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        res_cols = st.columns(4)
-        with res_cols[0]:
-            st.metric("LS因子", f"{LS:.4f}")
-        with res_cols[1]:
-            st.metric("单位面积流失量", f"{R * K * LS * C * P * T:.2f} t/hm²")
-        with res_cols[2]:
-            st.metric("计算面积", f"{area_general} hm²")
-        with res_cols[3]:
-            st.metric("总流失量", f"{A_general:.2f} t", delta=None)
-        st.markdown('</div>', unsafe_allow_html=True)
+            
+            # 计算LS因子
+            LS = engine.ls_factor(slope_length, slope_angle)
+        else:
+            # 多坡段: 上传坡段表或直接编辑单个坡面
+            segment_file = st.file_uploader("坡段表 (CSV: profile, segment_length, segment_angle)",
+                                            type=["csv"], key="seg_file",
+                                            help="每行一个坡段，同一坡面内按自上而下顺序排列")
+            if segment_file is not None:
+                segment_df = pd.read_csv(segment_file)
+            else:
+                segment_df = st.data_editor(
+                    pd.DataFrame({
+                        "profile": ["坡面1"] * 3,
+                        "segment_length": [20.0, 15.0, 15.0],
+                        "segment_angle": [8.0, 15.0, 25.0]
+                    }),
+                    num_rows="dynamic", use_container_width=True, key="seg_editor"
+                )
+            
+            try:
+                with prof.span("坡段计算", "compute"):
+                    df_profiles = cached_profile_table(segment_df.dropna())
+            except ValueError as e:
+                st.error(str(e))
+                df_profiles = pd.DataFrame({"坡面": [], "坡段数": [], "总坡长(m)": [], "LS因子": []})
+            
+            # 各坡面代表相等的扰动面积，取坡面LS均值
+            LS = df_profiles["LS因子"].mean() if len(df_profiles) else 0.0
+            st.info(f"坡面数: {len(df_profiles)}，坡段数: {int(df_profiles['坡段数'].sum())}")
     
+    # 计算土壤流失量
+    with prof.span("公式计算", "compute"):
+        unit_general = engine.general_unit_loss(R, K, LS, C, P, T)
+        A_general = unit_general * area_general
+    
+    general_inputs = dict(R=R, K=K, C=C, P=P, T=T, area=area_general)
+    if calculation_mode == "基本计算":
+        general_inputs.update(slope_length=slope_length, slope_angle=slope_angle)
     else:
-        st.info("多坡段详细计算功能需要更多参数输入...")
-        # 这里可以扩展多坡段计算逻辑
+        general_inputs.update(LS=float(LS))
+    
+    # 显示结果卡片
+    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+    res_cols = st.columns(4)
+    with res_cols[0]:
+        st.metric("LS因子", f"{LS:.4f}")
+    with res_cols[1]:
+        st.metric("单位面积流失量", f"{unit_general:.2f} t/hm²")
+    with res_cols[2]:
+        st.metric("计算面积", f"{area_general} hm²")
+    with res_cols[3]:
+        st.metric("总流失量", f"{A_general:.2f} t", delta=None)
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    if calculation_mode != "基本计算":
+        with st.expander(f"各坡面LS因子 ({len(df_profiles)} 个坡面)"):
+            st.dataframe(df_profiles.style.format({"总坡长(m)": "{:.1f}", "LS因子": "{:.4f}"}),
+                         use_container_width=True, hide_index=True)
+            if is_open(tab2) and len(df_profiles):
+                with prof.span("坡面剖面图", "render"):
+                    st.plotly_chart(cached_profile_figure(segment_df.dropna()), use_container_width=True)
 
 # ========== 标签页3: 工程开挖面计算 ==========
-with tab3:
+with tab3, prof.span("工程开挖面"):
     st.markdown('<h3 class="sub-header">工程开挖面土壤流失量计算</h3>', unsafe_allow_html=True)
     
     exc_cols = st.columns([2, 1])
@@ -253,72 +520,48 @@ with tab3:
             slope_angle_ex = st.slider("坡度 β (°)", 0.0, 90.0, 45.0, 5.0, key="sa_ex")
         
         with exc_params[1]:
-            soil_type_ex = st.selectbox("土体类型", ["砂土", "壤土", "黏土", "砾石土"], key="st_ex")
-            saturation = st.radio("土体饱和度", ["湿润", "半湿润", "干燥"], horizontal=True, key="sat_ex")
+            soil_type_ex = st.selectbox("土体类型", list(param_tables["excavation_k"]), key="st_ex")
+            saturation = st.radio("土体饱和度", list(param_tables["saturation"]), horizontal=True, key="sat_ex")
             exposure_time = st.slider("裸露时间 (月)", 1, 36, 12, key="time_ex")
         
         with exc_params[2]:
             # 确定开挖面参数
-            if soil_type_ex == "砂土":
-                k_ex = 0.12
-                porosity = "高"
-            elif soil_type_ex == "壤土":
-                k_ex = 0.25
-                porosity = "中"
-            elif soil_type_ex == "黏土":
-                k_ex = 0.30
-                porosity = "低"
-            else:
-                k_ex = 0.10
-                porosity = "很高"
+            k_ex = param_tables["excavation_k"][soil_type_ex]
+            porosity = store.notes("excavation_k", param_revision).get(soil_type_ex) or "-"
             
-            sat_factor_map = {"湿润": 1.0, "半湿润": 0.85, "干燥": 0.7}
-            sat_factor = sat_factor_map[saturation]
+            sat_factor = param_tables["saturation"][saturation]
             
             st.info(f"土体参数: K={k_ex}, 孔隙度={porosity}")
     
     with exc_cols[1]:
         # 开挖面示意图
         st.markdown("**开挖面示意图**")
-        fig = go.Figure()
-        
-        # 绘制边坡
-        x = [0, slope_height / math.tan(math.radians(slope_angle_ex)), slope_height / math.tan(math.radians(slope_angle_ex))]
-        y = [0, 0, slope_height]
-        
-        fig.add_trace(go.Scatter(x=x, y=y, fill='tozeroy', fillcolor='rgba(139,69,19,0.3)',
-                                line=dict(color='saddlebrown', width=3),
-                                name=f"开挖面 β={slope_angle_ex}°"))
-        
-        fig.update_layout(
-            title=f"坡高: {slope_height}m, 坡度: {slope_angle_ex}°",
-            xaxis_title="水平距离 (m)",
-            yaxis_title="高度 (m)",
-            height=250,
-            showlegend=True,
-            margin=dict(t=40, b=20, l=40, r=20)
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        if is_open(tab3):
+            with prof.span("开挖面示意图", "render"):
+                st.plotly_chart(cached_excavation_sketch(slope_height, slope_angle_ex), use_container_width=True)
     
     # 计算开挖面土壤流失量
-    slope_rad_ex = math.radians(slope_angle_ex)
-    A_excavation = 4.41 * R_ex * k_ex * sat_factor * slope_height * math.sin(slope_rad_ex) * area_excavation
+    with prof.span("公式计算", "compute"):
+        unit_excavation, A_excavation = engine.excavation_loss(
+            R_ex, soil_type_ex, saturation, slope_height, slope_angle_ex, area_excavation, param_tables)
+    excavation_inputs = dict(R=R_ex, soil_type=soil_type_ex, saturation=saturation,
+                             slope_height=slope_height, slope_angle=slope_angle_ex, area=area_excavation)
     
     st.markdown('<div class="metric-card">', unsafe_allow_html=True)
     exc_res_cols = st.columns(3)
     with exc_res_cols[0]:
         st.metric("饱和影响系数", f"{sat_factor}")
     with exc_res_cols[1]:
-        st.metric("单位面积流失量", f"{4.41 * R_ex * k_ex * sat_factor * slope_height * math.sin(slope_rad_ex):.2f} t/hm²")
+        st.metric("单位面积流失量", f"{unit_excavation:.2f} t/hm²")
     with exc_res_cols[2]:
         st.metric("开挖面总流失量", f"{A_excavation:.2f} t")
     st.markdown('</div>', unsafe_allow_html=True)
 
 # ========== 标签页4: 工程堆积体计算 ==========
-with tab4:
+with tab4, prof.span("工程堆积体"):
     st.markdown('<h3 class="sub-header">工程堆积体土壤流失量计算</h3>', unsafe_allow_html=True)
     
-    pile_tabs = st.tabs(["基本参数", "堆积体形态", "材料特性"])
+    pile_tabs = tracked_tabs(["基本参数", "堆积体形态", "材料特性"], key="pile_tabs")
     
     with pile_tabs[0]:
         col1, col2 = st.columns(2)
@@ -330,71 +573,33 @@ with tab4:
         
         with col2:
             pile_length = st.number_input("坡长 L (m)", min_value=0.0, value=25.0, step=2.0)
-            pile_shape = st.selectbox("堆积体形状", ["锥形", "脊形", "扇形", "不规则形"])
+            pile_shape = st.selectbox("堆积体形状", list(param_tables["shape"]))
             compaction = st.slider("压实度 (%)", 50, 100, 75, 5)
     
     with pile_tabs[1]:
         # 形状系数
-        shape_factors = {
-            "锥形": 0.75,
-            "脊形": 1.00,
-            "扇形": 0.80,
-            "不规则形": 0.90
-        }
-        
-        shape_factor = shape_factors[pile_shape]
+        shape_factor = param_tables["shape"][pile_shape]
         
         # 绘制堆积体示意图
-        fig = go.Figure()
-        
-        if pile_shape == "锥形":
-            # 简化锥形表示
-            theta = np.linspace(0, 2*np.pi, 100)
-            r = pile_height
-            x = r * np.cos(theta)
-            y = r * np.sin(theta)
-            fig.add_trace(go.Scatter(x=x, y=y, fill='toself', fillcolor='rgba(210,180,140,0.5)'))
-        elif pile_shape == "脊形":
-            # 脊形表示
-            x = [-pile_length/2, 0, pile_length/2]
-            y = [0, pile_height, 0]
-            fig.add_trace(go.Scatter(x=x, y=y, fill='tozeroy', fillcolor='rgba(210,180,140,0.5)'))
-        
-        fig.update_layout(
-            title=f"{pile_shape}堆积体示意图",
-            xaxis_title="距离 (m)",
-            yaxis_title="高度 (m)",
-            height=200,
-            showlegend=False
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        if is_open(tab4, pile_tabs[1]):
+            with prof.span("堆积体示意图", "render"):
+                st.plotly_chart(cached_pile_sketch(pile_shape, pile_height, pile_length), use_container_width=True)
         
         st.info(f"形状系数: {shape_factor}")
     
     with pile_tabs[2]:
-        material_type = st.selectbox("堆积材料", ["弃渣", "表土", "混合料", "建筑垃圾"])
-        gradation = st.selectbox("级配情况", ["良好", "一般", "不良"])
+        material_type = st.selectbox("堆积材料", list(param_tables["material"]))
+        gradation = st.selectbox("级配情况", list(param_tables["gradation"]))
         contains_clay = st.checkbox("含黏粒成分", value=True)
-        
-        # 材料系数
-        if material_type == "弃渣":
-            material_factor = 1.0
-        elif material_type == "表土":
-            material_factor = 0.8
-        elif material_type == "建筑垃圾":
-            material_factor = 0.6
-        else:
-            material_factor = 0.9
-        
-        gradation_factor = 1.0 if gradation == "良好" else 1.2 if gradation == "一般" else 1.5
-        clay_factor = 0.9 if contains_clay else 1.0
-        compaction_factor = 0.7 + (compaction / 100) * 0.3
     
     # 计算堆积体土壤流失量
-    slope_rad_pile = math.radians(pile_angle)
-    base_calc = 0.21 * R_pile * pile_height * pile_length * shape_factor * math.pow(math.sin(slope_rad_pile), 1.5)
-    material_adjustment = material_factor * gradation_factor * clay_factor * compaction_factor
-    A_pile = base_calc * material_adjustment * area_pile
+    with prof.span("公式计算", "compute"):
+        base_calc, material_adjustment, unit_pile, A_pile = engine.pile_loss(
+            R_pile, pile_height, pile_angle, pile_length, pile_shape, material_type,
+            gradation, contains_clay, compaction, area_pile, param_tables)
+    pile_inputs = dict(R=R_pile, pile_height=pile_height, pile_angle=pile_angle, pile_length=pile_length,
+                       shape=pile_shape, material=material_type, gradation=gradation,
+                       contains_clay=contains_clay, compaction=compaction, area=area_pile)
     
     st.markdown('<div class="metric-card">', unsafe_allow_html=True)
     pile_res_cols = st.columns(4)
@@ -409,45 +614,39 @@ with tab4:
     st.markdown('</div>', unsafe_allow_html=True)
 
 # ========== 标签页5: 结果汇总与分析 ==========
-with tab5:
+with tab5, prof.span("结果汇总"):
     st.markdown('<h3 class="sub-header">📊 土壤流失量测算结果汇总</h3>', unsafe_allow_html=True)
     
     # 汇总数据
-    summary_data = {
-        "扰动类型": ["一般扰动地表", "工程开挖面", "工程堆积体", "其他扰动"],
-        "面积(hm²)": [area_general, area_excavation, area_pile, area_other],
-        "单位流失量(t/hm²)": [
-            (R * K * LS * C * P * T) if 'A_general' in locals() else 0,
-            (4.41 * R_ex * k_ex * sat_factor * slope_height * math.sin(slope_rad_ex)) if 'A_excavation' in locals() else 0,
-            (base_calc * material_adjustment) if 'A_pile' in locals() else 0,
-            0
-        ],
-        "总流失量(t)": [
-            A_general if 'A_general' in locals() else 0,
-            A_excavation if 'A_excavation' in locals() else 0,
-            A_pile if 'A_pile' in locals() else 0,
-            0
-        ]
-    }
-    
-    df_summary = pd.DataFrame(summary_data)
+    with prof.span("汇总计算", "compute"):
+        df_summary = cached_summary(
+            [area_general, area_excavation, area_pile, area_other],
+            [
+                unit_general if 'A_general' in locals() else 0,
+                unit_excavation if 'A_excavation' in locals() else 0,
+                unit_pile if 'A_pile' in locals() else 0,
+                0
+            ],
+            [
+                A_general if 'A_general' in locals() else 0,
+                A_excavation if 'A_excavation' in locals() else 0,
+                A_pile if 'A_pile' in locals() else 0,
+                0
+            ]
+        )
     
     # 计算总计
     total_loss = df_summary["总流失量(t)"].sum()
     avg_unit_loss = df_summary["单位流失量(t/hm²)"].mean()
     
-    # 显示汇总表格
+    # 显示汇总表格；指标和汇总数据始终计算，表格、图表及分析结果仅在本标签页显示时生成
+    results_open = is_open(tab5)
     col1, col2 = st.columns([3, 1])
     
     with col1:
-        st.dataframe(
-            df_summary.style.format({
-                "面积(hm²)": "{:.2f}",
-                "单位流失量(t/hm²)": "{:.2f}",
-                "总流失量(t)": "{:.2f}"
-            }).background_gradient(subset=["总流失量(t)"], cmap="YlOrRd"),
-            use_container_width=True
-        )
+        if results_open:
+            with prof.span("汇总表 Styler", "render"):
+                st.dataframe(cached_summary_styler(df_summary), use_container_width=True)
     
     with col2:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
@@ -456,151 +655,549 @@ with tab5:
         st.metric("⏱️ 测算年份", f"{calculation_year}")
         st.markdown('</div>', unsafe_allow_html=True)
     
-    # 可视化图表
-    st.markdown('<h3 class="sub-header">📈 流失量分布可视化</h3>', unsafe_allow_html=True)
-    
-    viz_cols = st.columns(2)
+    # 不确定性分析
+    st.markdown('<h3 class="sub-header">🎲 不确定性分析（蒙特卡洛）</h3>', unsafe_allow_html=True)
     
-    with viz_cols[0]:
-        # 流失量构成饼图
-        fig_pie = px.pie(
-            df_summary, 
-            values='总流失量(t)', 
-            names='扰动类型',
-            title='土壤流失量构成',
-            color_discrete_sequence=px.colors.sequential.RdBu
-        )
-        fig_pie.update_traces(textposition='inside', textinfo='percent+label')
-        st.plotly_chart(fig_pie, use_container_width=True)
-    
-    with viz_cols[1]:
-        # 单位流失量柱状图
-        fig_bar = px.bar(
-            df_summary,
-            x='扰动类型',
-            y='单位流失量(t/hm²)',
-            title='单位面积流失量对比',
-            color='单位流失量(t/hm²)',
-            color_continuous_scale='Viridis'
-        )
-        st.plotly_chart(fig_bar, use_container_width=True)
+    if st.toggle("启用不确定性分析", value=False, key="mc_on",
+                 help="R、K按参数查询手册中所在地区/土壤类型的范围抽样，C、P及几何参数按浮动比例抽样"):
+        mc_cols = st.columns(3)
+        with mc_cols[0]:
+            mc_draws = st.select_slider("抽样次数", [10_000, 100_000, 1_000_000], value=100_000, key="mc_draws")
+        with mc_cols[1]:
+            mc_spread = st.slider("C/P/几何参数浮动 (±%)", 0, 50, 10, 5, key="mc_spread")
+        with mc_cols[2]:
+            mc_seed = st.number_input("随机种子", min_value=0, value=42, step=1, key="mc_seed")
+        
+        if results_open:
+            with prof.span("蒙特卡洛", "compute"):
+                df_mc = cached_monte_carlo(general_inputs, excavation_inputs, pile_inputs, area_other,
+                                           project_location, soil_type_main, mc_spread / 100, mc_draws, mc_seed,
+                                           param_revision)
+            mc_total = df_mc.iloc[-1]
+            mc_metric_cols = st.columns(3)
+            with mc_metric_cols[0]:
+                st.metric("总流失量 P5", f"{mc_total['总流失量P5(t)']:.2f} t")
+            with mc_metric_cols[1]:
+                st.metric("总流失量 P50", f"{mc_total['总流失量P50(t)']:.2f} t")
+            with mc_metric_cols[2]:
+                st.metric("总流失量 P95", f"{mc_total['总流失量P95(t)']:.2f} t")
+            st.dataframe(df_mc.style.format(precision=2), use_container_width=True, hide_index=True)
+        
+    # 施工期逐月模拟
+    st.markdown('<h3 class="sub-header">🗓️ 施工期逐月模拟</h3>', unsafe_allow_html=True)
     
+    if st.toggle("启用逐月模拟", value=False, key="ts_on",
+                 help="年R按所在地区典型逐月比例分配，按施工分期表逐月计算扰动面积及C、P变化"):
+        ts_cols = st.columns([1, 3])
+        with ts_cols[0]:
+            ts_start_month = st.selectbox("开工月份", list(range(1, 13)), index=2, key="ts_start")
+            ts_months = st.number_input("模拟月数", min_value=1, value=int(construction_period), step=1,
+                                        key="ts_months")
+        with ts_cols[1]:
+            st.caption("施工分期表：面积、C、P留空时取各标签页的输入值；不在任何分期内的月份不计扰动")
+            df_phases = st.data_editor(
+                pd.DataFrame({
+                    "扰动类型": ["一般扰动地表", "工程开挖面", "工程堆积体"],
+                    "开始月": [1, 1, 1],
+                    "结束月": [int(construction_period), int(exposure_time), int(construction_period)],
+                    "面积(hm²)": [None, None, None],
+                    "C": [None, None, None],
+                    "P": [None, None, None]
+                }),
+                column_config={
+                    "扰动类型": st.column_config.SelectboxColumn(
+                        options=["一般扰动地表", "工程开挖面", "工程堆积体"], required=True),
+                    "开始月": st.column_config.NumberColumn(min_value=1, step=1, required=True),
+                    "结束月": st.column_config.NumberColumn(min_value=1, step=1, required=True),
+                    "面积(hm²)": st.column_config.NumberColumn(min_value=0.0),
+                    "C": st.column_config.NumberColumn(min_value=0.0, max_value=1.0),
+                    "P": st.column_config.NumberColumn(min_value=0.0, max_value=1.0)
+                },
+                num_rows="dynamic", use_container_width=True, hide_index=True, key="ts_phases"
+            )
+        
+        if results_open:
+            # 各单元 R=C=P=1 时的单位面积流失量
+            ts_coefficients = [
+                engine.general_unit_loss(1.0, K, LS, 1.0, 1.0, T),
+                engine.excavation_unit_loss(1.0, k_ex, sat_factor, slope_height, slope_angle_ex),
+                engine.pile_base_loss(1.0, pile_height, pile_length, shape_factor, pile_angle) * material_adjustment
+            ]
+            with prof.span("逐月模拟", "compute"):
+                df_monthly = cached_monthly(
+                    ts_coefficients, [R, R_ex, R_pile], project_location,
+                    [area_general, area_excavation, area_pile], [C, 1.0, 1.0], [P, 1.0, 1.0],
+                    df_phases.dropna(subset=["扰动类型", "开始月", "结束月"]), int(ts_months), ts_start_month,
+                    calculation_year, param_revision
+                )
+            
+            ts_metric_cols = st.columns(3)
+            with ts_metric_cols[0]:
+                st.metric("施工期累计流失量", f"{df_monthly['累计(t)'].iloc[-1]:.2f} t")
+            with ts_metric_cols[1]:
+                st.metric("月最大流失量", f"{df_monthly['合计(t)'].max():.2f} t")
+            with ts_metric_cols[2]:
+                st.metric("流失高峰月份", df_monthly.loc[df_monthly['合计(t)'].idxmax(), "月份"])
+            with prof.span("逐月图表", "render"):
+                st.plotly_chart(figures.monthly_loss_chart(df_monthly), use_container_width=True)
+            with st.expander("逐月流失量明细"):
+                st.dataframe(df_monthly.style.format(precision=2), use_container_width=True, hide_index=True)
+        
+    if results_open:
+        # 可视化图表
+        st.markdown('<h3 class="sub-header">📈 流失量分布可视化</h3>', unsafe_allow_html=True)
+        
+        viz_cols = st.columns(2)
+        with prof.span("汇总图表构建", "compute"):
+            fig_pie, fig_bar = cached_summary_charts(df_summary)
+        
+        with viz_cols[0], prof.span("流失量饼图", "render"):
+            # 流失量构成饼图
+            st.plotly_chart(fig_pie, use_container_width=True)
+        
+        with viz_cols[1], prof.span("单位流失量柱状图", "render"):
+            # 单位流失量柱状图
+            st.plotly_chart(fig_bar, use_container_width=True)
+        
+    # 参数敏感性分析
+    if st.toggle("参数敏感性分析", value=False, key="sa_on",
+                 help="连续参数在输入值±浮动范围内取值，分类系数取参数表全范围"):
+        sa_cols = st.columns(4)
+        with sa_cols[0]:
+            sa_kind = st.selectbox("计算公式", ["一般扰动地表", "工程开挖面", "工程堆积体"], key="sa_kind")
+        with sa_cols[1]:
+            sa_method = st.radio("方法", ["Sobol", "Morris"], horizontal=True, key="sa_method")
+        with sa_cols[2]:
+            sa_spread = st.slider("参数浮动 (±%)", 5, 50, 20, 5, key="sa_spread")
+        with sa_cols[3]:
+            sa_samples = st.select_slider("基础样本数", [1_024, 16_384, 131_072], value=16_384, key="sa_n")
+        
+        if results_open:
+            sa_inputs = {"一般扰动地表": general_inputs, "工程开挖面": excavation_inputs,
+                         "工程堆积体": pile_inputs}[sa_kind]
+            if sa_kind == "一般扰动地表" and "LS" in sa_inputs:
+                st.info("多坡段模式下坡长、坡度取基本计算模式的默认值参与敏感性分析")
+            with prof.span("敏感性分析", "compute"):
+                df_sa, sa_columns = cached_sensitivity(sa_kind, sa_inputs, sa_method, sa_spread / 100, sa_samples,
+                                                       param_revision)
+            
+            sa_viz = st.columns([2, 1])
+            with sa_viz[0], prof.span("敏感性图表", "render"):
+                st.plotly_chart(cached_sensitivity_chart(df_sa, sa_columns, f"{sa_kind} {sa_method} 敏感性指数"),
+                                use_container_width=True)
+            with sa_viz[1]:
+                st.dataframe(df_sa.style.format(precision=4), use_container_width=True, hide_index=True)
+        
+    # 反算设计：满足目标流失量的最低费用措施组合
+    if st.toggle("反算设计（费用优化）", value=False, key="opt_on",
+                 help="在可调参数范围内搜索措施费用最低且总流失量不超过目标的方案，并给出费用-流失量 Pareto 前沿"):
+        opt_bounds = optimize.default_bounds(general_inputs, excavation_inputs, pile_inputs)
+        opt_choices = list(opt_bounds) + list(optimize.CATEGORICAL)
+        opt_cols = st.columns([1, 3])
+        with opt_cols[0]:
+            opt_target = st.number_input("目标总流失量 (t)", min_value=0.0, value=float(round(total_loss / 2)),
+                                         step=100.0, key="opt_target")
+        with opt_cols[1]:
+            opt_names = st.multiselect("可调参数", opt_choices, key="opt_names",
+                                       default=[n for n in ["C", "P", "pile_height", "pile_angle", "gradation"]
+                                                if n in opt_choices],
+                                       format_func=optimize.LABELS.get)
+        
+        edit_cols = st.columns(2)
+        with edit_cols[0]:
+            df_ranges = st.data_editor(pd.DataFrame({
+                "参数": [optimize.LABELS[n] for n in opt_names if n in opt_bounds],
+                "下限": [opt_bounds[n][0] for n in opt_names if n in opt_bounds],
+                "上限": [opt_bounds[n][1] for n in opt_names if n in opt_bounds],
+                "单价(元/hm²/单位)": [optimize.CONTINUOUS[n][4] for n in opt_names if n in opt_bounds]
+            }), disabled=["参数"], use_container_width=True, hide_index=True, key="opt_ranges")
+        with edit_cols[1]:
+            opt_option_costs = optimize.default_option_costs(param_tables)
+            df_options = st.data_editor(pd.DataFrame(
+                [{"参数": optimize.LABELS[n], "选项": option, "可选": True, "换用单价(元/hm²)": cost}
+                 for n in opt_names if n in optimize.CATEGORICAL for option, cost in opt_option_costs[n].items()],
+                columns=["参数", "选项", "可选", "换用单价(元/hm²)"]
+            ), disabled=["参数", "选项"], use_container_width=True, hide_index=True, key="opt_options")
+        
+        if results_open and opt_names:
+            names = {label: n for n, label in optimize.LABELS.items()}
+            bounds = {names[row["参数"]]: (row["下限"], row["上限"]) for _, row in df_ranges.iterrows()}
+            costs = {names[label]: cost for label, cost in zip(df_ranges["参数"], df_ranges["单价(元/hm²/单位)"])}
+            allowed = df_options[df_options["可选"]]
+            options = {names[label]: allowed.loc[allowed["参数"] == label, "选项"].tolist()
+                       for label in df_options["参数"].unique()}
+            option_costs = {names[label]: dict(zip(group["选项"], group["换用单价(元/hm²)"]))
+                            for label, group in df_options.groupby("参数")}
+            try:
+                with prof.span("反算设计", "compute"):
+                    opt_result, opt_chosen, fig_pareto = cached_optimization(
+                        general_inputs, excavation_inputs, pile_inputs, bounds, options, costs, option_costs,
+                        opt_target, param_revision)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                opt_viz = st.columns([2, 1])
+                with opt_viz[0], prof.span("Pareto 前沿图", "render"):
+                    st.plotly_chart(fig_pareto, use_container_width=True)
+                with opt_viz[1]:
+                    st.caption(f"共计算 {opt_result.evaluations:,} 组方案，前沿 {len(opt_result.front)} 个方案")
+                    if opt_chosen is None:
+                        st.warning("可调范围内没有满足目标流失量的方案，请放宽参数范围或提高目标值")
+                    else:
+                        st.metric("最低费用", f"{opt_chosen[optimize.COL_COST]:,.0f} 元",
+                                  delta=f"总流失量 {opt_chosen[optimize.COL_LOSS]:.2f} t", delta_color="off")
+                        design = opt_chosen.drop([optimize.COL_COST, optimize.COL_LOSS])
+                        st.dataframe(design.map(lambda v: f"{v:.4g}" if isinstance(v, float) else v).rename("方案取值"),
+                                     use_container_width=True)
+                with st.expander(f"Pareto 前沿方案 ({len(opt_result.front)} 个)"):
+                    st.dataframe(opt_result.front, use_container_width=True, hide_index=True)
+        
+    # 参数扫描：整个网格一次计算并缓存，切片只索引缓存的响应面
+    if st.toggle("参数扫描（响应面）", value=False, key="sw_on",
+                 help="在多个参数的取值网格上一次性计算单位面积流失量，拖动切片位置不重新计算"):
+        SWEEP_DEFAULTS = {"一般扰动地表": ["slope_angle", "slope_length"],
+                          "工程开挖面": ["slope_angle", "slope_height", "soil_type"],
+                          "工程堆积体": ["pile_height", "pile_angle", "gradation"]}
+        sw_cols = st.columns([1, 3])
+        with sw_cols[0]:
+            sw_kind = st.selectbox("计算公式", list(SWEEP_DEFAULTS), key="sw_kind")
+        with sw_cols[1]:
+            sw_names = st.multiselect("扫描参数（网格各维）", sweep.AXES[sw_kind], default=SWEEP_DEFAULTS[sw_kind],
+                                      format_func=sweep.LABELS.get, key=f"sw_axes_{sw_kind}")
+        sw_numeric = [n for n in sw_names if not sweep.is_categorical(n)]
+        df_axes = st.data_editor(pd.DataFrame({
+            "参数": [sweep.LABELS[n] for n in sw_numeric],
+            "下限": [sweep.DEFAULT_RANGES[n][0] for n in sw_numeric],
+            "上限": [sweep.DEFAULT_RANGES[n][1] for n in sw_numeric],
+            "取值个数": [sweep.DEFAULT_STEPS] * len(sw_numeric)
+        }), disabled=["参数"], use_container_width=True, hide_index=True, key=f"sw_ranges_{sw_kind}")
+        
+        if results_open and sw_names:
+            sw_inputs = {"一般扰动地表": general_inputs, "工程开挖面": excavation_inputs,
+                         "工程堆积体": pile_inputs}[sw_kind]
+            ranges = dict(zip(sw_numeric, df_axes[["下限", "上限", "取值个数"]].itertuples(index=False)))
+            sw_axes = tuple(
+                (n, tuple(sweep.default_axis(n, tables=param_tables)) if sweep.is_categorical(n)
+                 else tuple(np.linspace(ranges[n][0], ranges[n][1], max(int(ranges[n][2]), 2))))
+                for n in sw_names
+            )
+            try:
+                with prof.span("参数扫描", "compute"):
+                    surface = cached_sweep(sw_kind, sw_inputs, sw_axes, param_revision)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                view_cols = st.columns(4)
+                with view_cols[0]:
+                    sw_x = st.selectbox("横轴", sw_names, format_func=sweep.LABELS.get, key="sw_x")
+                with view_cols[1]:
+                    y_choices = [n for n in sw_names if n != sw_x]
+                    sw_y = st.selectbox("纵轴", y_choices or ["—"], format_func=lambda n: sweep.LABELS.get(n, n),
+                                        key="sw_y")
+                with view_cols[2]:
+                    sw_total = st.radio("显示", ["单位面积流失量", "总流失量"], horizontal=True, key="sw_total")
+                with view_cols[3]:
+                    sw_style = st.radio("图型", ["等值线", "热力图"], horizontal=True, key="sw_style")
+                
+                # 其余维度的切片位置，默认取最接近现状输入的格点
+                sw_fixed = {}
+                fixed_names = [n for n in sw_names if n not in (sw_x, sw_y)]
+                slice_cols = st.columns(max(len(fixed_names), 1))
+                for col, name in zip(slice_cols, fixed_names):
+                    values = list(surface.axes[name])
+                    current = surface.index(name, sw_inputs[name]) if name in sw_inputs else 0
+                    with col:
+                        sw_fixed[name] = st.select_slider(
+                            sweep.LABELS[name], values, value=values[current],
+                            key=f"sw_fix_{name}_{len(values)}_{values[0]}_{values[-1]}",
+                            format_func=lambda v: f"{v:g}" if isinstance(v, float) else str(v))
+                
+                total = sw_total == "总流失量"
+                unit_label = "t" if total else "t/hm²"
+                with prof.span("响应面图", "render"):
+                    if y_choices:
+                        x, y, z = surface.section(sw_x, sw_y, sw_fixed, total=total)
+                        fig = figures.response_surface(x, y, z, sweep.LABELS[sw_x], sweep.LABELS[sw_y],
+                                                       f"{sw_kind} {sw_total}", sw_style, unit_label)
+                    else:
+                        x, z = surface.profile(sw_x, sw_fixed, total=total)
+                        fig = figures.response_profile(x, z, sweep.LABELS[sw_x], f"{sw_kind} {sw_total}",
+                                                       f"{sw_total} ({unit_label})")
+                    st.plotly_chart(fig, use_container_width=True)
+                st.caption(f"网格 {' × '.join(map(str, surface.unit.shape))}，"
+                           f"共 {surface.unit.size:,} 个格点（{surface.nbytes / 2 ** 20:.1f} MB，已缓存）")
+        
+    # 减缓措施情景：基准为标签页2–4的各扰动单元，情景为对部分单元输入的修改，只重算被修改的单元
+    if st.toggle("措施情景对比", value=False, key="sc_on",
+                 help="每行修改一个单元的一个输入，同名的行组成一个情景；各情景与基准的汇总、逐单元对比由同一基准结果增量计算"):
+        if calculation_mode == "基本计算" or not len(df_profiles):
+            unit_rows = {"一般扰动地表": dict(disturbance_type="一般扰动地表", **general_inputs)}
+        else:
+            # 多坡段：各坡面为面积相等的单元，LS 取各坡面的值
+            profile_area = area_general / len(df_profiles)
+            unit_rows = {f"坡面 {name}": dict(general_inputs, disturbance_type="一般扰动地表", LS=ls, area=profile_area)
+                         for name, ls in zip(df_profiles["坡面"], df_profiles["LS因子"])}
+        unit_rows["工程开挖面"] = dict(disturbance_type="工程开挖面", **excavation_inputs)
+        unit_rows["工程堆积体"] = dict(disturbance_type="工程堆积体", **pile_inputs)
+        unit_rows["其他扰动"] = dict(disturbance_type="其他扰动", area=area_other)
+        df_units = pd.DataFrame.from_dict(unit_rows, orient="index").assign(project=project_name)
+        unit_labels = list(df_units.index)
+        column_labels = {"disturbance_type": "扰动类型", "area": "面积 (hm²)", **sweep.LABELS}
+        
+        df_scenario_table = st.data_editor(pd.DataFrame({
+            "情景": ["坡面防护", "堆体压实降坡", "堆体压实降坡", "开挖面削坡"],
+            "单元": [unit_labels[0], "工程堆积体", "工程堆积体", "工程开挖面"],
+            "参数": ["P", "compaction", "pile_angle", "slope_angle"],
+            "取值": ["0.6", "95", "22", "35"]
+        }), num_rows="dynamic", use_container_width=True, hide_index=True, key="sc_table", column_config={
+            "单元": st.column_config.SelectboxColumn("单元", options=unit_labels, required=True),
+            "参数": st.column_config.SelectboxColumn("参数", options=scenarios.SCENARIO_COLUMNS, required=True,
+                                                   format_func=lambda n: column_labels.get(n, n)),
+            "取值": st.column_config.TextColumn("取值", required=True,
+                                              help="数值参数填数字，分类参数填选项名称，含黏粒填 是/否")
+        })
+        
+        if results_open:
+            sc_table = df_scenario_table.dropna().rename(
+                columns={"情景": "scenario", "单元": "unit", "参数": "column", "取值": "value"})
+            try:
+                with prof.span("情景计算", "compute"):
+                    df_compare, sc_changes, fig_sc_stack, fig_sc_change = cached_scenarios(
+                        df_units, sc_table, param_revision)
+            except (KeyError, ValueError) as e:
+                st.error(f"情景无法计算: {e}")
+            else:
+                sc_names = list(sc_changes)
+                if sc_names:
+                    sc_name = st.selectbox("查看情景", sc_names, key="sc_view")
+                    df_view = df_compare[df_compare["情景"] == sc_name].drop(columns="情景")
+                    sc_total = df_view.iloc[-1]
+                    sc_cols = st.columns([3, 1])
+                    with sc_cols[0]:
+                        st.dataframe(df_view.style.format(precision=2), use_container_width=True, hide_index=True)
+                    with sc_cols[1]:
+                        st.metric("情景总流失量", f"{sc_total[COL_TOTAL]:.2f} t",
+                                  delta=f"{sc_total['变化量(t)']:.2f} t ({sc_total['变化率(%)']:+.1f}%)",
+                                  delta_color="inverse")
+                    with st.expander(f"{sc_name} 修改的单元 ({len(sc_changes[sc_name])} 个)"):
+                        st.dataframe(sc_changes[sc_name].style.format(precision=2), use_container_width=True,
+                                     hide_index=True)
+                    with prof.span("情景图表", "render"):
+                        chart_cols = st.columns(2)
+                        with chart_cols[0]:
+                            st.plotly_chart(fig_sc_stack, use_container_width=True)
+                        with chart_cols[1]:
+                            st.plotly_chart(fig_sc_change, use_container_width=True)
+        
     # 报告生成
     st.markdown('<h3 class="sub-header">📄 生成测算报告</h3>', unsafe_allow_html=True)
     
-    if st.button("📥 生成完整测算报告", type="primary"):
-        report_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # 当前项目的完整输入，用于报告和保存到项目库
+    project_inputs = dict(
+        region=project_location, year=calculation_year, revision=param_revision, soil_type=soil_type_main,
+        vegetation_coverage=vegetation_coverage, construction_period=int(construction_period),
+        areas=[area_general, area_excavation, area_pile, area_other],
+        general=general_inputs, excavation=excavation_inputs, pile=pile_inputs)
+    
+    # 报告区域为局部片段：点击按钮只重新执行本片段，不重算整个页面
+    @st.fragment
+    def report_section(project_name, calculation_year, inputs, df_summary):
+        if st.button("📥 生成完整测算报告", type="primary"):
+            report = reports.report_from_inputs(project_name, inputs, df_summary, tables=param_tables)
+            file_stem = f"土壤流失测算报告_{project_name}_{calculation_year}"
+            
+            download_cols = st.columns(3)
+            with download_cols[0]:
+                st.download_button(
+                    label="下载报告 (Markdown格式)",
+                    data=reports.render_markdown(report),
+                    file_name=f"{file_stem}.md",
+                    mime="text/markdown"
+                )
+            with download_cols[1]:
+                st.download_button(
+                    label="下载报告 (HTML格式)",
+                    data=reports.render_html(report),
+                    file_name=f"{file_stem}.html",
+                    mime="text/html"
+                )
+            with download_cols[2]:
+                try:
+                    st.download_button(
+                        label="下载报告 (Excel格式)",
+                        data=reports.render_xlsx(report),
+                        file_name=f"{file_stem}.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    )
+                except ImportError as exc:
+                    st.caption(str(exc))
         
-        report = f"""
-        # 生产建设项目土壤流失量测算报告
+            st.success("报告已生成！点击上方按钮下载。")
+    
+    report_section(project_name, calculation_year, project_inputs, df_summary)
+    
+    # 保存到项目库
+    @st.fragment
+    def save_section(project_name, df_summary, inputs):
+        if st.button("💾 保存到项目库", help="同名项目将被覆盖，可在“多项目对比”标签页中对比"):
+            project_store().save(project_name, df_summary, region=inputs["region"], year=inputs["year"],
+                                 revision=inputs["revision"], inputs=inputs)
+            st.success(f"已保存项目: {project_name}")
+    
+    save_section(project_name, df_summary, project_inputs)
+
+# ========== 标签页6: 参数查询 ==========
+with tab6, prof.span("参数查询"):
+    if is_open(tab6):
+        st.markdown('<h3 class="sub-header">📚 SL 773-2018 参数查询手册</h3>', unsafe_allow_html=True)
         
-        ## 1. 项目基本信息
-        - **项目名称**: {project_name}
-        - **项目地点**: {project_location}
-        - **测算年份**: {calculation_year}
-        - **总扰动面积**: {total_area:.2f} hm²
-        - **主要土壤类型**: {soil_type_main}
+        param_tabs = st.tabs(["R因子", "K因子", "C因子", "其他参数"])
         
-        ## 2. 测算结果汇总
-        - **土壤流失总量**: {total_loss:.2f} t
-        - **平均单位流失量**: {avg_unit_loss:.2f} t/hm²
+        st.caption(f"参数版本: {param_revision}")
         
-        ## 3. 分项计算结果
-        {df_summary.to_markdown(index=False)}
+        with param_tabs[0]:
+            st.markdown("### 降雨侵蚀力因子 R (MJ·mm/(hm²·h))")
+            df_r_ref = store.r_factors(param_revision)
+            st.dataframe(pd.DataFrame({
+                "代码": df_r_ref["code"],
+                "地区": df_r_ref["name"],
+                "级别": df_r_ref["level"],
+                "R值范围": [f"{lo:g}-{hi:g}" if pd.notna(lo) else "-" for lo, hi in zip(df_r_ref["min"], df_r_ref["max"])],
+                "典型值": df_r_ref["value"],
+                "适用季节": df_r_ref["season"].fillna("-")
+            }), use_container_width=True, hide_index=True)
+            st.markdown("**计算方法**: R = ∑(Ei × I30)，其中Ei为次降雨动能，I30为最大30分钟雨强。")
         
-        ## 4. 主要计算参数
-        - R因子（降雨侵蚀力）: {R if 'R' in locals() else '未计算'}
-        - K因子（土壤可蚀性）: {K if 'K' in locals() else '未计算'}
-        - 植被覆盖率: {vegetation_coverage}%
+        with param_tabs[1]:
+            st.markdown("### 土壤可蚀性因子 K (t·hm²·h/(hm²·MJ·mm))")
+            df_k_ref = store.k_factors(param_revision)
+            st.dataframe(pd.DataFrame({
+                "土壤类型": df_k_ref["name"],
+                "K值范围": [f"{lo:.2f}-{hi:.2f}" if pd.notna(lo) else "-" for lo, hi in zip(df_k_ref["min"], df_k_ref["max"])],
+                "典型值": df_k_ref["value"],
+                "侵蚀敏感性": df_k_ref["sensitivity"].fillna("-")
+            }), use_container_width=True, hide_index=True)
+            st.markdown("**影响因素**: 有机质含量、土壤结构、渗透性等。")
         
-        ## 5. 报告信息
-        - 生成时间: {report_time}
-        - 测算标准: SL 773-2018
-        - 工具版本: 2.0
+        with param_tabs[2]:
+            st.markdown("### 植被覆盖与管理因子 C")
+            df_c_ref = store.reference("C", param_revision)
+            st.dataframe(df_c_ref.rename(columns={"label": "植被覆盖度", "value_range": "C值", "note": "典型植被类型"}),
+                         use_container_width=True, hide_index=True)
+            st.markdown("**注意**: C因子受植被类型、生长季节、枯落物层等多因素影响。")
         
-        **注意**: 本报告为自动生成的计算结果，实际应用需结合现场勘察数据。
-        """
+        with param_tabs[3]:
+            st.markdown("### 其他关键参数")
+            st.markdown("#### P因子（水土保持措施因子）")
+            st.markdown("\n".join(f"- {label}: {value}" for label, value
+                                  in zip(*store.reference("P", param_revision)[["label", "value_range"]].T.values)))
+            st.markdown("""
+            #### LS因子（坡度坡长因子）
+            - 计算公式: LS = (λ/20)^m × (sinθ/0.3)^n
+            - θ<20°时: m=0.3, n=1.2
+            - θ≥20°时: m=0.5, n=1.3
+            """)
+            st.markdown("#### 开挖面参数")
+            st.markdown("\n".join(f"- {name}: k={value:g}" for name, value in param_tables["excavation_k"].items()))
+
+# ========== 标签页7: 多项目对比 ==========
+with tab7, prof.span("多项目对比"):
+    st.markdown('<h3 class="sub-header">🗂️ 多项目对比</h3>', unsafe_allow_html=True)
+    
+    PORTFOLIO_KEYS = ["pf_regions", "pf_name", "pf_sort", "pf_top", "pf_desc", "pf_selected", "pf_formats",
+                      "pf_workers"]
+    
+    # 对比区为局部片段：筛选、排序只重新执行本片段
+    @st.fragment
+    def portfolio_section():
+        store = project_store()
+        version = store.version()
+        if version[0] == 0:
+            st.info("项目库为空，请在“结果汇总”标签页中保存项目")
+            return
         
-        st.download_button(
-            label="下载报告 (Markdown格式)",
-            data=report,
-            file_name=f"土壤流失测算报告_{project_name}_{calculation_year}.md",
-            mime="text/markdown"
-        )
+        filter_cols = st.columns([2, 2, 2, 1])
+        with filter_cols[0]:
+            regions = st.multiselect("地区", store.regions(), key="pf_regions")
+        with filter_cols[1]:
+            name_like = st.text_input("项目名称包含", key="pf_name")
+        with filter_cols[2]:
+            sort_labels = {projects.PROJECT_COLUMNS[f]: f for f in projects.SORT_FIELDS}
+            order_by = sort_labels[st.selectbox("排序", list(sort_labels), key="pf_sort")]
+        with filter_cols[3]:
+            top_n = st.number_input("图表项目数", min_value=1, value=20, step=5, key="pf_top")
+        descending = st.toggle("降序", value=True, key="pf_desc")
         
-        st.success("报告已生成！点击上方按钮下载。")
-
-# ========== 标签页6: 参数查询 ==========
-with tab6:
-    st.markdown('<h3 class="sub-header">📚 SL 773-2018 参数查询手册</h3>', unsafe_allow_html=True)
-    
-    param_tabs = st.tabs(["R因子", "K因子", "C因子", "其他参数"])
-    
-    with param_tabs[0]:
-        st.markdown("### 降雨侵蚀力因子 R (MJ·mm/(hm²·h))")
-        st.markdown("""
-        | 地区 | R值范围 | 典型值 | 适用季节 |
-        |------|---------|--------|----------|
-        | 华南地区 | 5000-7000 | 5800 | 全年，夏季为主 |
-        | 华东地区 | 3000-4500 | 3500 | 春夏为主 |
-        | 华中地区 | 3500-5000 | 4200 | 夏季集中 |
-        | 西南地区 | 3000-4500 | 3800 | 夏季为主 |
-        | 华北地区 | 1500-2500 | 1800 | 夏季集中 |
-        | 东北地区 | 1800-2800 | 2200 | 夏季为主 |
-        | 西北地区 | 800-1800 | 1200 | 夏季短暂 |
-        
-        **计算方法**: R = ∑(Ei × I30)，其中Ei为次降雨动能，I30为最大30分钟雨强。
-        """)
-    
-    with param_tabs[1]:
-        st.markdown("### 土壤可蚀性因子 K (t·hm²·h/(hm²·MJ·mm))")
-        st.markdown("""
-        | 土壤类型 | K值范围 | 典型值 | 侵蚀敏感性 |
-        |----------|---------|--------|------------|
-        | 砂土 | 0.10-0.15 | 0.12 | 低 |
-        | 砂壤土 | 0.15-0.22 | 0.18 | 较低 |
-        | 轻壤土 | 0.22-0.28 | 0.25 | 中等 |
-        | 中壤土 | 0.28-0.35 | 0.32 | 较高 |
-        | 重壤土 | 0.35-0.40 | 0.38 | 高 |
-        | 黏土 | 0.40-0.45 | 0.42 | 很高 |
-        
-        **影响因素**: 有机质含量、土壤结构、渗透性等。
-        """)
-    
-    with param_tabs[2]:
-        st.markdown("### 植被覆盖与管理因子 C")
-        st.markdown("""
-        | 植被覆盖度 | C值 | 典型植被类型 |
-        |------------|-----|--------------|
-        | >90% | 0.001-0.01 | 茂密森林、成熟草地 |
-        | 70-90% | 0.01-0.05 | 一般林地、灌木丛 |
-        | 50-70% | 0.05-0.10 | 稀疏林地、中度草地 |
-        | 30-50% | 0.10-0.20 | 退化草地、幼林 |
-        | 10-30% | 0.20-0.40 | 严重退化草地 |
-        | <10% | 0.40-1.00 | 裸地、施工区 |
-        
-        **注意**: C因子受植被类型、生长季节、枯落物层等多因素影响。
-        """)
-    
-    with param_tabs[3]:
-        st.markdown("### 其他关键参数")
-        st.markdown("""
-        #### P因子（水土保持措施因子）
-        - 无措施: 1.0
-        - 简易措施: 0.7-0.9
-        - 工程措施: 0.3-0.7
-        - 综合措施: 0.1-0.3
-        
-        #### LS因子（坡度坡长因子）
-        - 计算公式: LS = (λ/20)^m × (sinθ/0.3)^n
-        - θ<20°时: m=0.3, n=1.2
-        - θ≥20°时: m=0.5, n=1.3
-        
-        #### 开挖面参数
-        - 砂土: k=0.12
-        - 壤土: k=0.25
-        - 黏土: k=0.30
-        """)
+        df_projects = cached_portfolio(version, tuple(regions), name_like, order_by, descending)
+        
+        pf_metrics = st.columns(3)
+        with pf_metrics[0]:
+            st.metric("项目数", f"{len(df_projects)}")
+        with pf_metrics[1]:
+            st.metric("总面积", f"{df_projects['总面积(hm²)'].sum():.2f} hm²")
+        with pf_metrics[2]:
+            st.metric("总流失量", f"{df_projects['总流失量(t)'].sum():.2f} t")
+        
+        st.dataframe(df_projects.style.format(precision=2), use_container_width=True, hide_index=True)
+        if df_projects.empty:
+            return
+        
+        fig_projects, fig_regions, df_region = cached_portfolio_charts(
+            version, tuple(regions), name_like, tuple(df_projects["编号"].head(int(top_n))))
+        chart_cols = st.columns(2)
+        with chart_cols[0]:
+            st.plotly_chart(fig_projects, use_container_width=True)
+        with chart_cols[1]:
+            st.plotly_chart(fig_regions, use_container_width=True)
+        with st.expander("按地区 × 扰动类型汇总"):
+            st.dataframe(df_region.style.format(precision=2), use_container_width=True, hide_index=True)
+        
+        # 选定项目并排对比
+        names = dict(zip(df_projects["项目名称"], df_projects["编号"]))
+        selected = st.multiselect("选择项目并排对比", list(names), max_selections=10, key="pf_selected")
+        if selected:
+            ids = [names[name] for name in selected]
+            st.dataframe(store.type_matrix(ids=ids).T.style.format(precision=2), use_container_width=True)
+            with st.expander("保存的输入参数"):
+                st.json({name: store.inputs(names[name]) for name in selected}, expanded=False)
+            if st.button("🗑️ 删除选定项目", key="pf_delete"):
+                store.delete(ids)
+                del st.session_state["pf_selected"]
+                st.rerun()
+        
+        # 批量报告：按当前筛选条件（或选定项目）生成，逐个渲染写入 ZIP
+        st.markdown("#### 📦 批量生成报告")
+        report_cols = st.columns([2, 1, 1])
+        with report_cols[0]:
+            report_formats = st.multiselect("报告格式", list(reports.FORMATS), default=["md", "xlsx"],
+                                            key="pf_formats")
+        with report_cols[1]:
+            report_workers = st.number_input("渲染进程数", min_value=1, value=1, step=1, key="pf_workers")
+        with report_cols[2]:
+            scope_label = f"选定的 {len(selected)} 个项目" if selected else f"筛选出的 {len(df_projects)} 个项目"
+            st.caption(f"范围: {scope_label}")
+            build = st.button("生成 ZIP", key="pf_report", disabled=not report_formats)
+        if build:
+            filters = dict(ids=[names[name] for name in selected]) if selected else \
+                dict(regions=list(regions), name_like=name_like)
+            archive = tempfile.NamedTemporaryFile(suffix=".zip", delete=False)
+            with st.spinner("正在生成报告..."):
+                count = reports.write_zip(reports.reports_from_store(store, parameter_store(), **filters),
+                                          archive, formats=report_formats, workers=int(report_workers))
+            archive.close()
+            with open(archive.name, "rb") as f:
+                st.download_button(f"下载 {count} 个项目的报告 (ZIP)", f.read(),
+                                   file_name=f"土壤流失测算报告_{datetime.now():%Y%m%d_%H%M}.zip",
+                                   mime="application/zip", key="pf_download")
+            os.unlink(archive.name)
+    
+    if is_open(tab7):
+        portfolio_section()
+    else:
+        # 对比区未创建时保留其筛选条件，切回本标签页时恢复
+        for key in PORTFOLIO_KEYS:
+            if key in st.session_state:
+                st.session_state[key] = st.session_state[key]
 
 # ========== 页脚 ==========
 st.divider()
@@ -611,3 +1208,51 @@ with footer_cols[1]:
     st.caption("⚠️ 计算结果需现场验证")
 with footer_cols[2]:
     st.caption(f"🕒 系统时间: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+
+# ========== 性能诊断面板 ==========
+if profiling_on:
+    rerun_record = prof.finish()
+    history = profile_history()
+    history.add(rerun_record)
+    if rerun_record["profile_report"]:
+        st.session_state["prof_report"] = (rerun_record["profiler"], rerun_record["profile_report"])
+    
+    def capture_next_rerun():
+        st.session_state["prof_capture"] = st.session_state["prof_profiler"]
+    
+    with st.sidebar:
+        st.divider()
+        st.header("🩺 性能诊断")
+        st.caption("计时从脚本开始到页脚结束；自身耗时为扣除子段后的部分（控件布局、Markdown 等）")
+        diag_cols = st.columns(2)
+        with diag_cols[0]:
+            st.metric("本次重跑", f"{rerun_record['seconds'] * 1000:.0f} ms")
+        with diag_cols[1]:
+            rss = rerun_record["rss_bytes"]
+            st.metric("常驻内存", f"{rss / 2 ** 20:.0f} MB" if rss else "-")
+        if rerun_record["traced_peak_bytes"] is not None:
+            st.caption(f"tracemalloc 峰值: {rerun_record['traced_peak_bytes'] / 2 ** 20:.1f} MB")
+        
+        st.dataframe(profiling.span_table(rerun_record).style.format(precision=1, na_rep="-"),
+                     use_container_width=True, hide_index=True)
+        
+        st.toggle("统计内存分配 (tracemalloc)", key="prof_memory",
+                  help="下次重跑起生效；开启后脚本明显变慢，耗时仅供相对比较")
+        st.selectbox("采样分析器", profiling.available_profilers(), key="prof_profiler")
+        st.button("采样下一次重跑", key="prof_capture_btn", on_click=capture_next_rerun)
+        if "prof_report" in st.session_state:
+            profiler_name, report_text = st.session_state["prof_report"]
+            with st.expander(f"{profiler_name} 采样结果"):
+                st.code(report_text, language=None)
+        
+        st.markdown(f"**重跑耗时趋势**（进程内最近 {len(history.records)} 次）")
+        st.line_chart(history.latency(), x="时间", y="耗时(ms)", height=160)
+        export_cols = st.columns(2)
+        with export_cols[0]:
+            st.download_button("JSON", history.to_json(indent=2), file_name="soil_loss_profile.json",
+                               mime="application/json", key="prof_json")
+        with export_cols[1]:
+            st.download_button("Prometheus", history.to_prometheus(), file_name="soil_loss_profile.prom",
+                               mime="text/plain", key="prof_prom")
+        if st.button("清空历史", key="prof_clear"):
+            history.clear()
@@ -0,0 +1,113 @@
+"""基准测试公共设置：测试数据生成与基线回归检查
+
+运行:    python -m pytest benchmarks
+更新基线: python -m pytest benchmarks --bench-save-baseline
+每个基准的中位耗时与 baseline.json 中的基线比较，超过 基线 × 阈值 (默认 1.5) 即判为性能回退。
+基线耗时与机器相关，更换测试机器后应在该机器上重新生成。
+"""
+import json
+import platform
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from soil_loss.summary import DISTURBANCE_TYPES
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+DEFAULT_THRESHOLD = 1.5
+SIZES = [1, 10 ** 3, 10 ** 6, 10 ** 7]
+SCALAR_SIZES = [1, 10 ** 3]
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("soil-loss benchmarks")
+    group.addoption("--bench-baseline", default=str(BASELINE_PATH), help="基线文件 (JSON)")
+    group.addoption("--bench-threshold", type=float, default=DEFAULT_THRESHOLD,
+                    help="回退阈值：中位耗时超过 基线×阈值 时失败")
+    group.addoption("--bench-save-baseline", action="store_true", help="以本次结果覆盖基线文件")
+    group.addoption("--bench-max-units", type=int, default=max(SIZES), help="跳过规模大于该值的基准")
+
+
+def pytest_configure(config):
+    config._soil_loss_results = {}
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    if not config.getoption("--bench-save-baseline", default=False) or not config._soil_loss_results:
+        return
+    path = Path(config.getoption("--bench-baseline"))
+    baseline = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+    baseline.setdefault("results", {}).update(config._soil_loss_results)
+    baseline["machine"] = {"python": platform.python_version(), "numpy": np.__version__,
+                           "processor": platform.processor() or platform.machine()}
+    path.write_text(json.dumps(baseline, ensure_ascii=False, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+@pytest.fixture
+def bench(benchmark, request):
+    """benchmark 的包装：运行后按测试名与基线比较中位耗时
+
+    rounds 给定时使用 pedantic 模式（用于单次耗时较长的大规模基准）。
+    """
+    config = request.config
+
+    def run(func, *args, rounds=None, **kwargs):
+        if rounds:
+            result = benchmark.pedantic(func, args=args, kwargs=kwargs, rounds=rounds, iterations=1)
+        else:
+            result = benchmark(func, *args, **kwargs)
+        if benchmark.stats is None:  # --benchmark-disable
+            return result
+        median = benchmark.stats.stats.median
+        name = request.node.nodeid.split("::", 1)[1]
+        config._soil_loss_results[name] = median
+        if not config.getoption("--bench-save-baseline"):
+            path = Path(config.getoption("--bench-baseline"))
+            baseline = json.loads(path.read_text(encoding="utf-8")).get("results", {}) if path.exists() else {}
+            threshold = config.getoption("--bench-threshold")
+            if name in baseline and median > baseline[name] * threshold:
+                pytest.fail(f"性能回退: {name} 中位耗时 {median * 1e3:.3f} ms，"
+                            f"基线 {baseline[name] * 1e3:.3f} ms × {threshold}")
+        return result
+
+    return run
+
+
+def skip_large(config, n):
+    if n > config.getoption("--bench-max-units"):
+        pytest.skip(f"规模 {n} 超过 --bench-max-units")
+
+
+_UNIT_CACHE = {}
+
+
+def make_units(n, seed=0):
+    """n 个随机扰动单元的参数数组（按规模缓存，同一会话内复用）"""
+    if n not in _UNIT_CACHE:
+        rng = np.random.default_rng(seed)
+        _UNIT_CACHE.clear()
+        _UNIT_CACHE[n] = {
+            "R": rng.uniform(800, 7000, n),
+            "K": rng.uniform(0.1, 0.45, n),
+            "C": rng.uniform(0.001, 1.0, n),
+            "P": rng.uniform(0.1, 1.0, n),
+            "T": np.ones(n),
+            "slope_length": rng.uniform(5, 300, n),
+            "slope_angle": rng.uniform(0, 60, n),
+            "slope_height": rng.uniform(1, 30, n),
+            "soil_type": rng.integers(0, 4, n),
+            "saturation": rng.integers(0, 3, n),
+            "pile_height": rng.uniform(1, 20, n),
+            "pile_angle": rng.uniform(10, 40, n),
+            "pile_length": rng.uniform(5, 60, n),
+            "shape": rng.integers(0, 4, n),
+            "material": rng.integers(0, 4, n),
+            "gradation": rng.integers(0, 3, n),
+            "contains_clay": rng.random(n) < 0.5,
+            "compaction": rng.uniform(50, 100, n),
+            "area": rng.uniform(0.01, 10, n),
+            "disturbance_type": np.array(DISTURBANCE_TYPES)[rng.integers(0, 4, n)]
+        }
+    return _UNIT_CACHE[n]
@@ -0,0 +1,40 @@
+"""整页无界面重跑（streamlit.testing.AppTest）"""
+from pathlib import Path
+
+import pytest
+
+testing = pytest.importorskip("streamlit.testing.v1")
+
+APP_PATH = str(Path(__file__).resolve().parents[1] / "app.py")
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("SOIL_LOSS_PARAMS_DB", str(tmp_path / "params.sqlite"))
+    monkeypatch.setenv("SOIL_LOSS_PROJECTS_DB", str(tmp_path / "projects.sqlite"))
+    at = testing.AppTest.from_file(APP_PATH, default_timeout=120)
+    at.run()
+    assert not at.exception
+    return at
+
+
+def test_first_run(bench, tmp_path, monkeypatch):
+    """首次运行（新会话，缓存按函数共享）"""
+    monkeypatch.setenv("SOIL_LOSS_PARAMS_DB", str(tmp_path / "params.sqlite"))
+    monkeypatch.setenv("SOIL_LOSS_PROJECTS_DB", str(tmp_path / "projects.sqlite"))
+    bench(lambda: testing.AppTest.from_file(APP_PATH, default_timeout=120).run(), rounds=5)
+
+
+def test_rerun(bench, app):
+    """输入不变时的整页重跑"""
+    bench(app.run, rounds=10)
+
+
+def test_rerun_after_input(bench, app):
+    """修改一个输入（坡度）后的整页重跑"""
+    angles = iter([float(a % 60) for a in range(1000)])
+
+    def change():
+        app.slider(key="sa_ex").set_value(next(angles) // 5 * 5).run()
+
+    bench(change, rounds=10)
@@ -0,0 +1,30 @@
+"""图表数据准备：分箱、LTTB 降采样、栅格金字塔（不含缓存命中）"""
+import numpy as np
+import pytest
+
+from soil_loss import charts
+
+from conftest import SIZES, make_units, skip_large
+
+
+@pytest.mark.parametrize("n", SIZES[1:])
+def test_histogram_log(bench, request, n):
+    skip_large(request.config, n)
+    u = make_units(n)
+    bench(charts.histogram, u["R"] * u["K"], charts.DEFAULT_BINS, True, rounds=3 if n >= 10 ** 6 else None)
+
+
+@pytest.mark.parametrize("n", [10 ** 4, 10 ** 6])
+def test_lttb(bench, n):
+    y = np.cumsum(np.random.default_rng(0).normal(size=n))
+    bench(charts.lttb_indices, np.arange(n, dtype=float), y, charts.MAX_POINTS, rounds=3)
+
+
+def test_raster_pyramid(bench):
+    array = np.random.default_rng(0).random((2048, 2048)).astype(np.float32)
+
+    def build():
+        charts.CACHE.clear()
+        return charts.raster_pyramid(array)
+
+    bench(build, rounds=3)
@@ -0,0 +1,83 @@
+"""LS、开挖面、堆积体公式：逐单元标量调用与整体向量化调用"""
+import pytest
+
+from soil_loss import engine
+
+from conftest import SCALAR_SIZES, SIZES, make_units, skip_large
+
+SAT_NAMES = list(engine.SATURATION_FACTORS)
+SOIL_NAMES = list(engine.EXCAVATION_K)
+SHAPE_NAMES = list(engine.SHAPE_FACTORS)
+MATERIAL_NAMES = list(engine.MATERIAL_FACTORS)
+GRADATION_NAMES = list(engine.GRADATION_FACTORS)
+
+
+def _rounds(n):
+    return 3 if n >= 10 ** 6 else None
+
+
+# ========== 向量化 ==========
+@pytest.mark.parametrize("n", SIZES)
+def test_ls_vectorized(bench, request, n):
+    skip_large(request.config, n)
+    u = make_units(n)
+    bench(engine.ls_factor, u["slope_length"], u["slope_angle"], rounds=_rounds(n))
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_general_vectorized(bench, request, n):
+    skip_large(request.config, n)
+    u = make_units(n)
+    bench(engine.general_loss, u["R"], u["K"], u["C"], u["P"], u["T"], u["slope_length"], u["slope_angle"],
+          u["area"], rounds=_rounds(n))
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_excavation_vectorized(bench, request, n):
+    skip_large(request.config, n)
+    u = make_units(n)
+    bench(engine.excavation_loss, u["R"], u["soil_type"], u["saturation"], u["slope_height"], u["slope_angle"],
+          u["area"], rounds=_rounds(n))
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_pile_vectorized(bench, request, n):
+    skip_large(request.config, n)
+    u = make_units(n)
+    bench(engine.pile_loss, u["R"], u["pile_height"], u["pile_angle"], u["pile_length"], u["shape"],
+          u["material"], u["gradation"], u["contains_clay"], u["compaction"], u["area"], rounds=_rounds(n))
+
+
+# ========== 逐单元标量调用（页面的计算方式） ==========
+def _scalar_ls(lengths, angles):
+    return [engine.ls_factor(length, angle) for length, angle in zip(lengths, angles)]
+
+
+def _scalar_excavation(u):
+    return [engine.excavation_loss(float(R), SOIL_NAMES[s], SAT_NAMES[t], float(H), float(b), float(a))
+            for R, s, t, H, b, a in zip(u["R"], u["soil_type"], u["saturation"], u["slope_height"],
+                                        u["slope_angle"], u["area"])]
+
+
+def _scalar_pile(u):
+    return [engine.pile_loss(float(R), float(H), float(phi), float(L), SHAPE_NAMES[sh], MATERIAL_NAMES[m],
+                             GRADATION_NAMES[g], bool(c), float(comp), float(a))
+            for R, H, phi, L, sh, m, g, c, comp, a in zip(
+                u["R"], u["pile_height"], u["pile_angle"], u["pile_length"], u["shape"], u["material"],
+                u["gradation"], u["contains_clay"], u["compaction"], u["area"])]
+
+
+@pytest.mark.parametrize("n", SCALAR_SIZES)
+def test_ls_scalar(bench, n):
+    u = make_units(n)
+    bench(_scalar_ls, u["slope_length"].tolist(), u["slope_angle"].tolist())
+
+
+@pytest.mark.parametrize("n", SCALAR_SIZES)
+def test_excavation_scalar(bench, n):
+    bench(_scalar_excavation, make_units(n))
+
+
+@pytest.mark.parametrize("n", SCALAR_SIZES)
+def test_pile_scalar(bench, n):
+    bench(_scalar_pile, make_units(n))
@@ -0,0 +1,116 @@
+"""编译内核与 NumPy 实现：公式、多坡段 LS、D8 坡长的耗时和峰值内存
+
+backend=numpy 为 engine/segments/raster 的原实现，backend=numba 为 kernels 的编译内核
+（未安装 numba 时跳过）。峰值内存由 tracemalloc 统计（NumPy 数组分配计入其中，
+编译内核的输出和工作数组也在 Python 侧分配），记录在 benchmark.extra_info["peak_mb"]。
+"""
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from soil_loss import engine, kernels, raster, segments
+
+from conftest import SIZES, make_units, skip_large
+
+BACKENDS = ["numpy", "numba"]
+PROFILE_SIZES = [10 ** 3, 10 ** 6]
+GRID_SIDES = [100, 1000]
+
+
+def _rounds(n):
+    return 3 if n >= 10 ** 6 else None
+
+
+def _backend(name):
+    if name == "numba" and not kernels.ENABLED:
+        pytest.skip("未安装 numba 或 SOIL_LOSS_KERNELS=numpy")
+    return kernels if name == "numba" else None
+
+
+def _peak_mb(func, *args):
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def _run(bench, benchmark, func, *args, rounds=None):
+    func(*[a[:1] if isinstance(a, np.ndarray) else a for a in args])  # 预先加载编译结果
+    benchmark.extra_info["peak_mb"] = _peak_mb(func, *args)
+    return bench(func, *args, rounds=rounds)
+
+
+def _general_args(n):
+    u = make_units(n)
+    return u["R"], u["K"], u["C"], u["P"], u["T"], u["slope_length"], u["slope_angle"], u["area"]
+
+
+def _excavation_args(n):
+    u = make_units(n)
+    return u["R"], u["soil_type"], u["saturation"], u["slope_height"], u["slope_angle"], u["area"]
+
+
+def _pile_args(n):
+    u = make_units(n)
+    return (u["R"], u["pile_height"], u["pile_angle"], u["pile_length"], u["shape"], u["material"],
+            u["gradation"], u["contains_clay"], u["compaction"], u["area"])
+
+
+# ========== 公式 ==========
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("formula, make_args", [("general_loss", _general_args),
+                                                ("excavation_loss", _excavation_args),
+                                                ("pile_loss", _pile_args)])
+@pytest.mark.parametrize("n", SIZES)
+def test_formula(bench, benchmark, request, n, formula, make_args, backend):
+    skip_large(request.config, n)
+    func = getattr(_backend(backend) or engine, formula)
+    _run(bench, benchmark, func, *make_args(n), rounds=_rounds(n))
+
+
+# ========== 多坡段坡面 LS ==========
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("n", PROFILE_SIZES)
+def test_profile_ls(bench, benchmark, request, n, backend):
+    skip_large(request.config, n)
+    module = _backend(backend) or segments
+    rng = np.random.default_rng(0)
+    offsets = segments.offsets_from_counts(rng.integers(1, 6, n))
+    lengths = rng.uniform(5, 80, offsets[-1])
+    angles = rng.uniform(0, 50, offsets[-1])
+    module.profile_ls(lengths[:offsets[1]], angles[:offsets[1]], offsets[:2])
+    benchmark.extra_info["peak_mb"] = _peak_mb(module.profile_ls, lengths, angles, offsets)
+    bench(module.profile_ls, lengths, angles, offsets, rounds=_rounds(n))
+
+
+# ========== D8 坡长 ==========
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("side", GRID_SIDES)
+def test_flow_length(bench, benchmark, request, side, backend):
+    skip_large(request.config, side * side)
+    module = _backend(backend) or raster
+    rng = np.random.default_rng(0)
+    dem = np.cumsum(rng.normal(0, 1, (side, side)), axis=0) + rng.normal(0, 3, (side, side))
+    direction, step = raster.flow_directions(dem, 10.0)
+    module.flow_length(direction[:2, :2], step[:2, :2], 300.0)
+    benchmark.extra_info["peak_mb"] = _peak_mb(module.flow_length, direction, step, 300.0)
+    bench(module.flow_length, direction, step, 300.0, rounds=3 if side >= 1000 else None)
+
+
+# ========== 峰值内存 ==========
+@pytest.mark.parametrize("formula, make_args", [("general_loss", _general_args),
+                                                ("excavation_loss", _excavation_args),
+                                                ("pile_loss", _pile_args)])
+def test_formula_peak_memory(formula, make_args):
+    """编译内核只分配输出数组，峰值内存不超过 NumPy 实现"""
+    _backend("numba")
+    n = 10 ** 6
+    args = make_args(n)
+    getattr(kernels, formula)(*[a[:1] for a in args])
+    compiled = _peak_mb(getattr(kernels, formula), *args)
+    outputs = len(getattr(kernels, formula)(*[a[:1] for a in args])) * n * 8 / 2 ** 20
+    assert compiled <= outputs * 1.05
+    assert compiled < _peak_mb(getattr(engine, formula), *args)
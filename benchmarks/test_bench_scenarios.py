@@ -0,0 +1,20 @@
+"""措施情景增量重算：耗时与修改单元数相关，与基准单元总数无关"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from soil_loss import scenarios
+
+from conftest import make_units, skip_large
+
+
+@pytest.mark.parametrize("n", [10 ** 4, 10 ** 6])
+def test_scenario_update(bench, request, n):
+    skip_large(request.config, n)
+    baseline = scenarios.Baseline(pd.DataFrame(make_units(n)).assign(project="p"))
+    changed = np.random.default_rng(1).choice(n, 1000, replace=False)
+
+    def update():
+        return baseline.scenario("s").set(changed, "P", 0.5).set(changed[:100], "compaction", 95.0).summary()
+
+    bench(update)
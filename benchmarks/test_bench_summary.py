@@ -0,0 +1,59 @@
+"""结果汇总与 Plotly 图表构建"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from soil_loss import figures
+from soil_loss.batch import BatchTotals, compute_units
+from soil_loss.summary import summary_frame
+
+from conftest import SIZES, make_units, skip_large
+
+DEFAULT_SUMMARY = summary_frame([4, 2, 3, 1], [71.45, 5388.49, 11387.87, 0], [285.80, 10776.99, 34163.61, 0])
+
+
+def test_summary_frame(bench):
+    bench(summary_frame, [4, 2, 3, 1], [71.45, 5388.49, 11387.87, 0], [285.80, 10776.99, 34163.61, 0])
+
+
+@pytest.mark.parametrize("n", SIZES[1:])
+def test_summary_aggregation(bench, request, n):
+    """单元结果按 (项目, 扰动类型) 分组累计并生成汇总表"""
+    skip_large(request.config, n)
+    u = make_units(n)
+    results = pd.DataFrame({
+        "project": (np.arange(n) % 100).astype(str),
+        "disturbance_type": u["disturbance_type"],
+        "area": u["area"],
+        "total_loss": u["area"] * u["R"]
+    })
+
+    def aggregate():
+        totals = BatchTotals()
+        totals.add(results)
+        return totals.summary()
+
+    bench(aggregate, rounds=3 if n >= 10 ** 6 else None)
+
+
+@pytest.mark.parametrize("n", [10 ** 3, 10 ** 5])
+def test_compute_units(bench, n):
+    """混合扰动类型单元表的整体计算（批量/HTTP 接口路径）"""
+    u = make_units(n)
+    chunk = pd.DataFrame({"project": "p", **{k: v for k, v in u.items() if k not in (
+        "soil_type", "saturation", "shape", "material", "gradation")}})
+    bench(compute_units, chunk)
+
+
+FIGURES = {
+    "area_pie": lambda: figures.area_pie(["一般扰动地表", "工程开挖面", "工程堆积体", "其他扰动"], [4, 2, 3, 1]),
+    "excavation_sketch": lambda: figures.excavation_sketch(8.0, 45.0),
+    "pile_sketch": lambda: figures.pile_sketch("锥形", 6.0, 25.0),
+    "loss_pie": lambda: figures.loss_pie(DEFAULT_SUMMARY),
+    "unit_loss_bar": lambda: figures.unit_loss_bar(DEFAULT_SUMMARY)
+}
+
+
+@pytest.mark.parametrize("build", FIGURES.values(), ids=FIGURES.keys())
+def test_figure(bench, build):
+    bench(build)
@@ -0,0 +1 @@
+"""生产建设项目土壤流失量测算（SL 773-2018）计算包"""
@@ -0,0 +1,271 @@
+"""命令行入口: python -m soil_loss <子命令> ..."""
+import argparse
+import os
+import sys
+
+
+def _tables(args):
+    if args.params_db is None and args.revision is None:
+        return None
+    from .params import DEFAULT_REVISION, ParameterStore
+    store = ParameterStore(args.params_db, args.revision or DEFAULT_REVISION)
+    if store.revision not in store.revisions():
+        raise SystemExit(f"参数库中没有版本: {store.revision}")
+    return store.tables()
+
+
+def _batch(args):
+    tables = _tables(args)
+    if args.workers == 1:
+        from .batch import run_batch
+        totals = run_batch(args.input, args.output, chunk_size=args.chunk_size, summary_path=args.summary,
+                           tables=tables)
+    else:
+        from .parallel import run_batch_parallel
+        totals = run_batch_parallel(args.input, args.output, workers=args.workers,
+                                    chunk_size=args.chunk_size, summary_path=args.summary, tables=tables)
+    summary = totals.summary()
+    print(f"单元数: {totals.units}  项目数: {len(totals.projects)}")
+    print(summary.to_string(index=False))
+    print(f"总流失量: {summary['总流失量(t)'].sum():.2f} t")
+
+
+def _raster_input(value):
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def _raster(args):
+    from .raster import run_raster
+    zones = run_raster(args.dem, args.R, args.K, args.C, args.P, output_path=args.output,
+                       zones=args.zones, T=args.T, cell_size=args.cell_size, tile_size=args.tile_size,
+                       max_slope_length=args.max_slope_length, workers=args.workers)
+    if args.zone_summary:
+        zones.to_csv(args.zone_summary, index=False)
+    print(zones.to_string(index=False))
+    print(f"总流失量: {zones['总流失量(t)'].sum():.2f} t")
+
+
+def _report(args):
+    from . import reports
+    if (args.units is None) == (args.projects_db is None):
+        raise SystemExit("请指定 --units 或 --projects-db 之一")
+    if args.units:
+        source = reports.reports_from_units(args.units, _tables(args))
+    else:
+        from .params import ParameterStore
+        from .projects import ProjectStore
+        source = reports.reports_from_store(ProjectStore(args.projects_db), ParameterStore(args.params_db),
+                                            regions=args.region, name_like=args.name_like)
+    count = reports.write_zip(source, args.output, formats=args.format, workers=args.workers)
+    print(f"已生成 {count} 个项目的报告: {args.output}")
+
+
+def _erosivity(args):
+    import numpy as np
+    from .erosivity import run_erosivity
+    interval = np.timedelta64(args.interval, "m") if args.interval else None
+    result = run_erosivity(args.inputs, workers=args.workers, chunk_size=args.chunk_size, interval=interval,
+                           time_format=args.time_format, min_coverage=args.min_coverage)
+    mean = result.mean()
+    if args.output:
+        mean.to_csv(args.output, index=False)
+    if args.annual:
+        result.annual().to_csv(args.annual, index=False)
+    if args.monthly:
+        result.monthly().to_csv(args.monthly, index=False)
+    if args.events:
+        result.events.to_csv(args.events, index=False)
+    print(mean.to_string(index=False))
+
+
+def _spatial(args):
+    from .spatial import run_spatial
+    totals = run_spatial(args.input, args.output, zone_paths=args.zones, layer=args.layer,
+                         output_layer=args.output_layer, tables=_tables(args), project=args.project,
+                         type_column=args.type_column)
+    summary = totals.summary()
+    print(f"多边形数: {totals.units}  项目数: {len(totals.projects)}")
+    print(summary.to_string(index=False))
+    print(f"总流失量: {summary['总流失量(t)'].sum():.2f} t")
+
+
+def _chart(args):
+    from pathlib import Path
+    from . import charts
+    kind = args.kind or ("raster" if Path(args.input).suffix.lower() in (".npy", ".tif", ".tiff") else "distribution")
+    if kind == "raster":
+        fig = charts.raster_figure(args.input, cell_size=args.cell_size, max_pixels=args.max_pixels, log=args.log)
+    elif kind == "profiles":
+        import pandas as pd
+        fig = charts.profile_figure(pd.read_csv(args.input), max_points=args.max_points)
+    else:
+        hists = charts.file_distribution(args.input, column=args.column, by=args.by or None, bins=args.bins,
+                                         log=not args.linear)
+        fig = charts.distribution_figure(hists, title=f"{args.column} 分布", xaxis_title=args.column,
+                                         log=not args.linear)
+    fig.write_html(args.output, include_plotlyjs="cdn")
+    print(f"已生成图表: {args.output}")
+
+
+def _serve(args):
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("HTTP 服务需要安装 uvicorn: pip install uvicorn")
+    from .service import REVISION_ENV, create_app
+    from .params import PATH_ENV
+    # 多进程时各工作进程按环境变量重新创建应用
+    if args.params_db:
+        os.environ[PATH_ENV] = args.params_db
+    if args.revision:
+        os.environ[REVISION_ENV] = args.revision
+    create_app(args.params_db, args.revision)
+    uvicorn.run("soil_loss.service:create_app", factory=True, host=args.host, port=args.port,
+                workers=args.workers, log_level="warning")
+
+
+def _loadtest(args):
+    from . import loadtest
+    levels = [int(n) for n in args.levels.split(",")]
+    think = [float(t) for t in args.think.split(",")]
+    result = loadtest.run_loadtest(levels, args.actions, (think[0], think[-1]), args.seed, args.app or loadtest.APP_PATH,
+                                   progress=lambda level, info: print(f"{level} 个会话完成，用时 {info['wall']:.1f} s",
+                                                                      file=sys.stderr))
+    baseline = loadtest.load_summary(args.baseline) if args.baseline else None
+    memory_limit = args.memory_limit * loadtest.MB if args.memory_limit else None
+    report = result.report(args.target_p90, memory_limit, baseline, args.threshold)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        print(report)
+    if args.json:
+        loadtest.save_summary(result, args.json)
+    if args.records:
+        result.records.to_csv(args.records, index=False)
+    problems = result.regressions(baseline, args.threshold) if baseline else []
+    if problems:
+        raise SystemExit("性能回退:\n" + "\n".join(problems))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m soil_loss", description="土壤流失量测算 (SL 773-2018)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser("batch", help="批量测算扰动单元表 (CSV/Parquet)")
+    batch.add_argument("input", help="输入单元表 (.csv/.parquet)")
+    batch.add_argument("-o", "--output", help="单元结果输出文件 (.csv/.parquet)")
+    batch.add_argument("-s", "--summary", help="按项目汇总的 CSV 输出文件")
+    batch.add_argument("--chunk-size", type=int, default=100_000, help="每块读取的行数")
+    batch.add_argument("-j", "--workers", type=int, default=1, help="并行进程数，0 表示使用全部 CPU 核心")
+    batch.add_argument("--params-db", help="参数库 SQLite 文件 (默认 $SOIL_LOSS_PARAMS_DB 或 ~/.soil_loss/params.sqlite)")
+    batch.add_argument("--revision", help="参数库标准版本 (默认 SL 773-2018)")
+    batch.set_defaults(func=_batch)
+
+    raster = commands.add_parser("raster", help="DEM 栅格逐像元测算 (GeoTIFF/.npy)")
+    raster.add_argument("dem", help="DEM 栅格 (.tif/.npy)")
+    for factor, default in (("R", 2000.0), ("K", 0.25), ("C", 0.3), ("P", 1.0)):
+        raster.add_argument(f"--{factor}", type=_raster_input, default=default,
+                            help=f"{factor} 因子栅格路径或常数 (默认 {default})")
+    raster.add_argument("--T", type=float, default=1.0, help="耕作管理因子")
+    raster.add_argument("--zones", help="整数分区栅格 (.tif/.npy)")
+    raster.add_argument("-o", "--output", help="单位面积流失量栅格输出 (.tif/.npy)")
+    raster.add_argument("--zone-summary", help="分区汇总 CSV 输出文件")
+    raster.add_argument("--cell-size", type=float, help="像元大小 (m)，GeoTIFF 可省略")
+    raster.add_argument("--tile-size", type=int, default=1024, help="分块边长 (像元)")
+    raster.add_argument("--max-slope-length", type=float, default=300.0, help="坡长截断值 (m)")
+    raster.add_argument("-j", "--workers", type=int, default=1, help="并行进程数，0 表示使用全部 CPU 核心")
+    raster.set_defaults(func=_raster)
+
+    report = commands.add_parser("report", help="批量生成测算报告 ZIP (Markdown/HTML/Excel)")
+    report.add_argument("-o", "--output", required=True, help="输出 ZIP 文件")
+    report.add_argument("--units", help="批量单元表 (.csv/.parquet)，按 project 列分项目出报告")
+    report.add_argument("--projects-db", help="项目库 SQLite 文件，对库中项目出报告")
+    report.add_argument("--region", action="append", help="只包含该地区的项目，可重复")
+    report.add_argument("--name-like", help="只包含名称含该字符串的项目")
+    report.add_argument("--format", nargs="+", default=["md", "html", "xlsx"], choices=["md", "html", "xlsx"],
+                        help="报告格式")
+    report.add_argument("-j", "--workers", type=int, default=1, help="渲染进程数，0 表示使用全部 CPU 核心")
+    report.add_argument("--params-db", help="参数库 SQLite 文件")
+    report.add_argument("--revision", help="参数库标准版本 (--units 时使用)")
+    report.set_defaults(func=_report)
+
+    erosivity = commands.add_parser("erosivity", help="由降雨过程记录计算降雨侵蚀力 R (CSV/Parquet)")
+    erosivity.add_argument("inputs", nargs="+",
+                           help="降雨记录文件，列 station, time, rain (mm)，同一站点的记录应在同一文件内并按时间排序")
+    erosivity.add_argument("-o", "--output", help="各站多年平均 R 的 CSV 输出文件")
+    erosivity.add_argument("--annual", help="逐年 R 的 CSV 输出文件")
+    erosivity.add_argument("--monthly", help="逐月多年平均 R 的 CSV 输出文件")
+    erosivity.add_argument("--events", help="侵蚀性降雨事件表 CSV 输出文件")
+    erosivity.add_argument("--interval", type=int, help="记录时段长度 (分钟)，默认由记录推断")
+    erosivity.add_argument("--time-format", help="time 列的日期格式 (如 %%Y-%%m-%%d %%H:%%M)，指定后解析更快")
+    erosivity.add_argument("--min-coverage", type=float, default=0.0,
+                           help="年份参与统计所需的记录覆盖比例 (0-1，记录须含无雨时段)")
+    erosivity.add_argument("--chunk-size", type=int, default=100_000, help="每块读取的行数")
+    erosivity.add_argument("-j", "--workers", type=int, default=1, help="并行进程数，0 表示使用全部 CPU 核心")
+    erosivity.set_defaults(func=_erosivity)
+
+    spatial = commands.add_parser("spatial", help="扰动区多边形图层测算 (GeoPackage/GeoJSON，需安装 geopandas)")
+    spatial.add_argument("input", help="扰动区多边形图层，属性列同批量单元表，面积由多边形计算")
+    spatial.add_argument("-o", "--output", help="逐多边形结果图层输出 (.gpkg/.geojson/.shp)")
+    spatial.add_argument("--layer", help="输入 GeoPackage 图层名 (默认第一个图层)")
+    spatial.add_argument("--output-layer", help="输出 GeoPackage 图层名")
+    spatial.add_argument("-z", "--zones", action="append", default=[],
+                         help="分区图层 (如 R 分区、土壤图)，按最大重叠面积补齐单元缺失的同名参数列，可重复，靠前优先")
+    spatial.add_argument("--type-column", default="disturbance_type", help="扰动类型属性列名")
+    spatial.add_argument("--project", help="图层无 project 列时的项目名 (默认输入文件名)")
+    spatial.add_argument("--params-db", help="参数库 SQLite 文件")
+    spatial.add_argument("--revision", help="参数库标准版本 (默认 SL 773-2018)")
+    spatial.set_defaults(func=_spatial)
+
+    chart = commands.add_parser("chart", help="大数据量结果图表 HTML（服务端分箱/降采样）")
+    chart.add_argument("input", help="单元结果表 (.csv/.parquet)、栅格 (.tif/.npy) 或坡段表 (.csv)")
+    chart.add_argument("-o", "--output", required=True, help="输出 HTML 文件")
+    chart.add_argument("--kind", choices=["distribution", "raster", "profiles"],
+                       help="图表类型 (默认栅格文件为 raster，其余为 distribution)")
+    chart.add_argument("--column", default="unit_loss", help="分布图统计的列")
+    chart.add_argument("--by", default="disturbance_type", help="分布图分组列，空字符串表示不分组")
+    chart.add_argument("--bins", type=int, default=100, help="分箱数")
+    chart.add_argument("--linear", action="store_true", help="分布图按线性等距分箱 (默认对数)")
+    chart.add_argument("--log", action="store_true", help="栅格按 log10 着色")
+    chart.add_argument("--cell-size", type=float, help="像元大小 (m)，GeoTIFF 可省略")
+    chart.add_argument("--max-pixels", type=int, default=250_000, help="栅格最多显示的像元数")
+    chart.add_argument("--max-points", type=int, default=5000, help="剖面图最多显示的点数")
+    chart.set_defaults(func=_chart)
+
+    load = commands.add_parser("loadtest", help="启动本地 Streamlit 实例并模拟多会话并发操作，输出容量报告")
+    load.add_argument("--levels", default="1,10,25,50", help="依次测试的并发会话数，逗号分隔")
+    load.add_argument("--actions", type=int, default=20, help="每个会话的操作次数")
+    load.add_argument("--think", default="1,3", help="两次操作之间的思考时间范围 (秒)，如 1,3")
+    load.add_argument("--seed", type=int, default=0, help="操作序列随机种子")
+    load.add_argument("--app", default=None, help="Streamlit 应用脚本，默认为仓库中的 app.py")
+    load.add_argument("--target-p90", type=float, default=2.0, help="容量估算的 p90 重跑延迟目标 (秒)")
+    load.add_argument("--memory-limit", type=float, help="容器内存上限 (MB)，用于估算可容纳的会话数")
+    load.add_argument("-o", "--output", help="容量报告 Markdown 文件，默认打印")
+    load.add_argument("--json", help="汇总 JSON 文件，可作为后续压测的 --baseline")
+    load.add_argument("--records", help="逐次重跑记录 CSV 文件")
+    load.add_argument("--baseline", help="基线汇总 JSON；p90 延迟或每次重跑 CPU 超过 基线 × 阈值 时返回非零")
+    load.add_argument("--threshold", type=float, default=1.5, help="性能回退阈值")
+    load.set_defaults(func=_loadtest)
+
+    serve = commands.add_parser("serve", help="启动 HTTP 计算服务 (需安装 uvicorn)")
+    serve.add_argument("--host", default="127.0.0.1", help="监听地址")
+    serve.add_argument("--port", type=int, default=8000, help="监听端口")
+    serve.add_argument("-j", "--workers", type=int, default=1, help="工作进程数")
+    serve.add_argument("--params-db", help="参数库 SQLite 文件")
+    serve.add_argument("--revision", help="参数库标准版本")
+    serve.set_defaults(func=_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
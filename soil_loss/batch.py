@@ -0,0 +1,255 @@
+"""批量测算：分块读取扰动单元表（CSV/Parquet），逐块计算并流式写出结果
+
+输入表每行一个扰动单元，列名见 COLUMN_DEFAULTS；缺少的列按页面控件默认值补齐。
+内存占用只与分块大小和项目数量有关，与输入行数无关。
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import engine, kernels
+from .summary import DISTURBANCE_TYPES, GENERAL, EXCAVATION, PILE, summary_from_totals
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+# 输入列及缺省值（与页面控件默认值一致）
+COLUMN_DEFAULTS = {
+    "project": "",
+    "disturbance_type": GENERAL,
+    "area": 0.0,
+    "R": float(engine.R_FACTOR_DEFAULT),
+    "K": 0.12,
+    "C": 0.3,
+    "P": 1.0,
+    "T": 1.0,
+    "slope_length": 50.0,
+    "slope_angle": 15.0,
+    "slope_height": 8.0,
+    "soil_type": "砂土",
+    "saturation": "湿润",
+    "pile_height": 6.0,
+    "pile_angle": 28.0,
+    "pile_length": 25.0,
+    "shape": "锥形",
+    "material": "弃渣",
+    "gradation": "良好",
+    "contains_clay": True,
+    "compaction": 75.0
+}
+REQUIRED_COLUMNS = ["project", "disturbance_type", "area"]
+RESULT_COLUMNS = ["project", "disturbance_type", "area", "LS", "unit_loss", "total_loss"]
+NUMERIC_COLUMNS = ["area", "R", "K", "C", "P", "T", "slope_length", "slope_angle", "slope_height",
+                   "pile_height", "pile_angle", "pile_length", "compaction"]
+# 分类列对应的系数表名 (engine.DEFAULT_TABLES / ParameterStore.tables)
+CATEGORY_TABLES = {
+    "soil_type": "excavation_k",
+    "saturation": "saturation",
+    "shape": "shape",
+    "material": "material",
+    "gradation": "gradation"
+}
+TYPE_TABLE = dict.fromkeys(DISTURBANCE_TYPES)
+
+
+def prepare_chunk(chunk):
+    """校验必需列、补齐缺省列并检查扰动类型"""
+    missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"输入表缺少必需列: {', '.join(missing)}")
+    chunk = chunk.copy()
+    for column, default in COLUMN_DEFAULTS.items():
+        if column not in chunk.columns:
+            chunk[column] = default
+        elif chunk[column].isna().any():
+            chunk[column] = chunk[column].fillna(default)
+    chunk["project"] = chunk["project"].astype(str)
+    unknown = set(chunk["disturbance_type"].unique()) - set(DISTURBANCE_TYPES)
+    if unknown:
+        raise ValueError(f"未知的扰动类型: {', '.join(map(str, unknown))}")
+    return chunk
+
+
+def unit_losses(columns, kind, tables=None):
+    """按扰动类型编码 kind 分组计算 (LS, 单位面积流失量)
+
+    columns 为列名到数组的映射，分类列可为名称或整数编码；其他扰动的流失量记为 0。
+    tables 为分类系数表，缺省为 engine.DEFAULT_TABLES。
+    """
+    n = len(kind)
+    ls = np.full(n, np.nan)
+    unit = np.zeros(n)
+
+    def num(name, mask):
+        return np.asarray(columns[name][mask], dtype=np.float64)
+
+    mask = kind == DISTURBANCE_TYPES.index(GENERAL)
+    if mask.any():
+        ls[mask], unit[mask], _ = kernels.general_loss(
+            num("R", mask), num("K", mask), num("C", mask), num("P", mask), num("T", mask),
+            num("slope_length", mask), num("slope_angle", mask), 1.0)
+
+    mask = kind == DISTURBANCE_TYPES.index(EXCAVATION)
+    if mask.any():
+        unit[mask], _ = kernels.excavation_loss(
+            num("R", mask), columns["soil_type"][mask], columns["saturation"][mask],
+            num("slope_height", mask), num("slope_angle", mask), 1.0, tables=tables)
+
+    mask = kind == DISTURBANCE_TYPES.index(PILE)
+    if mask.any():
+        _, _, unit[mask], _ = kernels.pile_loss(
+            num("R", mask), num("pile_height", mask), num("pile_angle", mask),
+            num("pile_length", mask), columns["shape"][mask], columns["material"][mask],
+            columns["gradation"][mask], np.asarray(columns["contains_clay"][mask], dtype=bool),
+            num("compaction", mask), 1.0, tables=tables)
+    return ls, unit
+
+
+def compute_units(chunk, tables=None):
+    """计算一个数据块内每个单元的 LS、单位面积流失量和总流失量"""
+    chunk = prepare_chunk(chunk)
+    columns = {name: chunk[name].to_numpy() for name in COLUMN_DEFAULTS}
+    kind = engine.encode(TYPE_TABLE, columns["disturbance_type"])
+    ls, unit = unit_losses(columns, kind, tables)
+    area = chunk["area"].to_numpy(dtype=np.float64)
+    return pd.DataFrame({
+        "project": columns["project"],
+        "disturbance_type": columns["disturbance_type"],
+        "area": area,
+        "LS": ls,
+        "unit_loss": unit,
+        "total_loss": unit * area
+    }, index=chunk.index)
+
+
+# ========== 分块读写 ==========
+def _is_parquet(path):
+    return Path(path).suffix.lower() in (".parquet", ".pq")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError("读写 Parquet 需要安装 pyarrow: pip install pyarrow") from exc
+    return pq
+
+
+def iter_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, columns=None):
+    """按固定行数分块读取 CSV 或 Parquet 输入表；columns 指定时只读取这些列"""
+    if _is_parquet(path):
+        pq = _require_pyarrow()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, usecols=columns)
+
+
+class ChunkWriter:
+    """将结果数据块依次追加写入 CSV 或 Parquet 文件"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._parquet = None
+        self._started = False
+
+    def write(self, frame):
+        if _is_parquet(self.path):
+            pq = _require_pyarrow()
+            import pyarrow as pa
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table.cast(self._parquet.schema))
+        else:
+            frame.to_csv(self.path, mode="a" if self._started else "w",
+                         header=not self._started, index=False)
+        self._started = True
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ========== 汇总 ==========
+class BatchTotals:
+    """按项目和扰动类型累计面积与流失量"""
+
+    def __init__(self):
+        self.area = {}
+        self.loss = {}
+        self.units = 0
+
+    def add(self, results):
+        grouped = results.groupby(["project", "disturbance_type"], sort=False)[["area", "total_loss"]].sum()
+        self.add_grouped(grouped.index, grouped["area"], grouped["total_loss"], len(results))
+
+    def add_grouped(self, keys, areas, losses, units):
+        """累加已分组的 (项目, 扰动类型) 面积与流失量"""
+        for key, area, loss in zip(keys, areas, losses):
+            self.area[key] = self.area.get(key, 0.0) + float(area)
+            self.loss[key] = self.loss.get(key, 0.0) + float(loss)
+        self.units += units
+
+    def merge(self, other):
+        for key, value in other.area.items():
+            self.area[key] = self.area.get(key, 0.0) + value
+        for key, value in other.loss.items():
+            self.loss[key] = self.loss.get(key, 0.0) + value
+        self.units += other.units
+        return self
+
+    @property
+    def projects(self):
+        return sorted({project for project, _ in self.area})
+
+    def summary(self, project=None):
+        """返回与 df_summary 布局相同的汇总表；project 为空时汇总全部项目"""
+        area_by_type, loss_by_type = {}, {}
+        for (proj, kind), value in self.area.items():
+            if project is None or proj == project:
+                area_by_type[kind] = area_by_type.get(kind, 0.0) + value
+                loss_by_type[kind] = loss_by_type.get(kind, 0.0) + self.loss[(proj, kind)]
+        return summary_from_totals(area_by_type, loss_by_type)
+
+    def project_table(self):
+        """每个项目一行：各扰动类型总流失量及项目合计"""
+        rows = []
+        for project in self.projects:
+            row = {"project": project}
+            for kind in DISTURBANCE_TYPES:
+                row[kind] = self.loss.get((project, kind), 0.0)
+            row["total_loss"] = sum(row[kind] for kind in DISTURBANCE_TYPES)
+            row["area"] = sum(self.area.get((project, kind), 0.0) for kind in DISTURBANCE_TYPES)
+            rows.append(row)
+        return pd.DataFrame(rows, columns=["project", *DISTURBANCE_TYPES, "total_loss", "area"])
+
+
+def iter_results(path, chunk_size=DEFAULT_CHUNK_SIZE, tables=None):
+    """逐块读取并计算，依次产出每块的单元结果"""
+    for chunk in iter_chunks(path, chunk_size):
+        yield compute_units(chunk, tables)
+
+
+def run_batch(input_path, output_path=None, chunk_size=DEFAULT_CHUNK_SIZE, summary_path=None, tables=None):
+    """批量测算入口：流式写出单元结果，返回累计汇总 BatchTotals"""
+    totals = BatchTotals()
+    writer = ChunkWriter(output_path) if output_path else None
+    try:
+        for results in iter_results(input_path, chunk_size, tables):
+            if writer is not None:
+                writer.write(results[RESULT_COLUMNS])
+            totals.add(results)
+    finally:
+        if writer is not None:
+            writer.close()
+    if summary_path:
+        totals.project_table().to_csv(summary_path, index=False)
+    return totals
@@ -0,0 +1,363 @@
+"""大数据量图表：服务端聚合/降采样后再交给浏览器绘制
+
+批量和栅格结果可达 10^5~10^7 个单元/像元，直接传给 Plotly 会使浏览器卡死，这里先在服务端压缩数据:
+- 分布: 按（对数）等距分箱统计，每个扰动类型只传 bins 个计数；结果文件分块读取、两遍扫描;
+- 序列/坡面剖面: LTTB（Largest-Triangle-Three-Buckets）降采样到 max_points 个点，用 Scattergl (WebGL) 绘制;
+- 栅格: 2×2 均值金字塔，按视窗选取像元数不超过 max_pixels 的最精细层级画热力图
+  （Plotly 6 起已移除 heatmapgl，数据量由金字塔层级控制）。
+准备好的图表数据按输入内容哈希缓存（文件按路径、大小和修改时间），同一输入不重复聚合。
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+
+from . import kernels, segments
+from .raster import RasterSource
+
+DEFAULT_BINS = 100
+MAX_POINTS = 5000
+MAX_PROFILES = 200
+MAX_PIXELS = 250_000
+TILE_SIZE = 256
+DOWNSAMPLE_ROWS = 2048
+CACHE_ENTRIES = 64
+COLORS = ['#3b82f6', '#10b981', '#f59e0b', '#ef4444', '#8b5cf6', '#ec4899', '#14b8a6', '#64748b']
+
+
+# ========== 按内容哈希缓存 ==========
+def content_hash(*arrays, **params):
+    """数组内容（含 dtype、形状）与参数的哈希"""
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.asarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        if array.dtype == object:
+            digest.update("\x00".join(map(str, array.ravel())).encode())
+        else:
+            digest.update(np.ascontiguousarray(array))
+    digest.update(repr(sorted(params.items())).encode())
+    return digest.hexdigest()
+
+
+def file_key(path):
+    """文件缓存键：绝对路径、大小和修改时间"""
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+class PreparedCache:
+    """准备好的图表数据（分箱计数、降采样点、栅格金字塔）的 LRU 缓存，线程安全"""
+
+    def __init__(self, maxsize=CACHE_ENTRIES):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_prepare(self, key, prepare):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key]
+        value = prepare()
+        with self.lock:
+            self.misses += 1
+            self.items[key] = value
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+CACHE = PreparedCache()
+
+
+# ========== 分布（直方图） ==========
+def histogram(values, bins=DEFAULT_BINS, log=False, value_range=None, weights=None):
+    """分箱计数，返回 (边界, 计数)；log 为 True 时按对数等距分箱，只统计正值"""
+    values = np.asarray(values, dtype=np.float64).ravel()
+    mask = np.isfinite(values)
+    if log:
+        mask &= values > 0
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64).ravel()[mask]
+    values = values[mask]
+    if value_range is None:
+        value_range = (values.min(), values.max()) if len(values) else (1.0, 10.0)
+    lo, hi = np.log10(value_range) if log else value_range
+    if hi <= lo:
+        lo, hi = lo - 0.5, hi + 0.5
+    # 等距分箱走 np.histogram 的快速路径（按下标计算，不做二分查找）
+    counts, edges = np.histogram(np.log10(values) if log else values, bins=bins, range=(lo, hi), weights=weights)
+    return (10 ** edges if log else edges), counts.astype(np.float64)
+
+
+def grouped_histogram(values, groups=None, bins=DEFAULT_BINS, log=False):
+    """按分组（如扰动类型）分别分箱，各组共用边界；返回 {组名: (边界, 计数)}，结果按内容哈希缓存"""
+    values = np.asarray(values, dtype=np.float64)
+    groups = np.full(len(values), "全部", dtype=object) if groups is None else np.asarray(groups, dtype=object)
+    key = ("grouped_histogram", content_hash(values, groups, bins=bins, log=log))
+    return CACHE.get_or_prepare(key, lambda: _grouped_histogram(values, groups, bins, log))
+
+
+def _grouped_histogram(values, groups, bins, log):
+    value_range = _value_range(values, log)
+    return {str(name): histogram(values[groups == name], bins, log, value_range) for name in _unique(groups)}
+
+
+def _unique(groups):
+    names, first = np.unique(groups.astype(str), return_index=True)
+    return [groups[i] for i in np.sort(first)]
+
+
+def _value_range(values, log):
+    mask = np.isfinite(values) & (values > 0 if log else True)
+    return (values[mask].min(), values[mask].max()) if mask.any() else None
+
+
+def file_distribution(path, column="unit_loss", by="disturbance_type", bins=DEFAULT_BINS, log=True,
+                      chunk_size=1_000_000):
+    """批量单元结果文件中 column 列的分组分布（分块读取，第一遍取范围、第二遍计数）
+
+    by 为分组列，None 时不分组。返回 {组名: (边界, 计数)}。
+    """
+    key = ("file_distribution", file_key(path), column, by, bins, log)
+    return CACHE.get_or_prepare(key, lambda: _file_distribution(path, column, by, bins, log, chunk_size))
+
+
+def _file_distribution(path, column, by, bins, log, chunk_size):
+    from .batch import iter_chunks
+    columns = [column] if by is None else [column, by]
+    lo, hi = np.inf, -np.inf
+    for chunk in iter_chunks(path, chunk_size, columns=columns):
+        value_range = _value_range(chunk[column].to_numpy(dtype=np.float64), log)
+        if value_range is not None:
+            lo, hi = min(lo, value_range[0]), max(hi, value_range[1])
+    value_range = (lo, hi) if lo <= hi else None
+    result = {}
+    for chunk in iter_chunks(path, chunk_size, columns=columns):
+        values = chunk[column].to_numpy(dtype=np.float64)
+        groups = np.full(len(values), "全部", dtype=object) if by is None else chunk[by].to_numpy(dtype=object)
+        for name in _unique(groups):
+            edges, counts = histogram(values[groups == name], bins, log, value_range)
+            if str(name) in result:
+                result[str(name)][1][:] += counts
+            else:
+                result[str(name)] = (edges, counts)
+    return result
+
+
+def distribution_figure(hists, title="单位面积流失量分布", xaxis_title="单位面积流失量 (t/hm²)", log=True):
+    """分组分布阶梯图（每组 2×bins 个点）"""
+    fig = go.Figure()
+    for i, (name, (edges, counts)) in enumerate(hists.items()):
+        fig.add_trace(go.Scatter(
+            x=np.repeat(edges, 2)[1:-1], y=np.repeat(counts, 2), name=f"{name} ({int(counts.sum())})",
+            mode="lines", line=dict(color=COLORS[i % len(COLORS)], width=1), fill="tozeroy", opacity=0.6
+        ))
+    fig.update_layout(
+        title=title,
+        xaxis=dict(title=xaxis_title, type="log" if log else "linear"),
+        yaxis_title="单元数",
+        height=420,
+        legend=dict(orientation='h', y=-0.2)
+    )
+    return fig
+
+
+# ========== 序列降采样 (LTTB) ==========
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets 降采样，返回保留点的下标（含首末点，x 须递增、y 须为有限值）
+
+    首末点之间均分为 n_out-2 个桶，每桶保留与上一保留点、下一桶均值构成三角形面积最大的点，
+    峰谷等形状特征得以保留。
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    bounds = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        next_lo, next_hi = (bounds[i + 1], bounds[i + 2]) if i + 2 < len(bounds) else (n - 1, n)
+        cx, cy = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def downsample(x, y, max_points=MAX_POINTS):
+    """LTTB 降采样后的 (x, y)，结果按内容哈希缓存"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    key = ("lttb", content_hash(x, y, max_points=max_points))
+    index = CACHE.get_or_prepare(key, lambda: lttb_indices(x, y, max_points))
+    return x[index], y[index]
+
+
+def series_figure(x, y, name="", title="", xaxis_title="", yaxis_title="", max_points=MAX_POINTS):
+    """长序列折线图：LTTB 降采样 + Scattergl"""
+    xs, ys = downsample(x, y, max_points)
+    fig = go.Figure(go.Scattergl(x=xs, y=ys, name=name, mode="lines"))
+    suffix = f"（{len(xs)}/{len(x)} 点）" if len(xs) < len(x) else ""
+    fig.update_layout(title=title + suffix, xaxis_title=xaxis_title, yaxis_title=yaxis_title, height=400)
+    return fig
+
+
+# ========== 坡面剖面 ==========
+def profile_lines(lengths, angles, offsets, max_points=MAX_POINTS, max_profiles=MAX_PROFILES, names=None):
+    """各坡面剖面线（水平距离、相对坡顶高程），坡面之间以 NaN 断开
+
+    坡面多于 max_profiles 时只保留 LS 最大的坡面；单个坡面点数超过平均配额时按 LTTB 降采样。
+    返回 dict: x, z, text（坡面名称）, shown（显示的坡面数）, total（坡面总数）。
+    """
+    lengths = np.asarray(lengths, dtype=np.float64)
+    angles = np.asarray(angles, dtype=np.float64)
+    names = np.arange(len(offsets) - 1).astype(str) if names is None else np.asarray(names).astype(str)
+    key = ("profiles", content_hash(lengths, angles, offsets, names, max_points=max_points,
+                                    max_profiles=max_profiles))
+    return CACHE.get_or_prepare(key, lambda: _profile_lines(lengths, angles, offsets, names, max_points,
+                                                            max_profiles))
+
+
+def _profile_lines(lengths, angles, offsets, names, max_points, max_profiles):
+    radians = np.radians(angles)
+    _, x_end = segments.cumulative_lengths(lengths * np.cos(radians), offsets)
+    _, z_end = segments.cumulative_lengths(lengths * np.sin(radians), offsets)
+    n_profiles = len(offsets) - 1
+    selected = np.arange(n_profiles)
+    if n_profiles > max_profiles:
+        ls = kernels.profile_ls(lengths, angles, offsets)
+        selected = np.sort(np.argsort(-ls, kind="stable")[:max_profiles])
+    quota = max(3, max_points // max(len(selected), 1))
+    xs, zs, texts = [], [], []
+    for i in selected:
+        x = np.concatenate([[0.0], x_end[offsets[i]:offsets[i + 1]]])
+        z = -np.concatenate([[0.0], z_end[offsets[i]:offsets[i + 1]]])
+        if len(x) > quota:
+            keep = lttb_indices(x, z, quota)
+            x, z = x[keep], z[keep]
+        xs += [x, [np.nan]]
+        zs += [z, [np.nan]]
+        texts += [np.full(len(x) + 1, names[i], dtype=object)]
+    if not xs:
+        return {"x": np.array([]), "z": np.array([]), "text": np.array([]), "shown": 0, "total": n_profiles}
+    return {"x": np.concatenate(xs), "z": np.concatenate(zs), "text": np.concatenate(texts),
+            "shown": len(selected), "total": n_profiles}
+
+
+def profile_figure(segment_df, max_points=MAX_POINTS, max_profiles=MAX_PROFILES):
+    """坡段表的坡面剖面图（Scattergl，单条轨迹以 NaN 分隔各坡面）"""
+    profiles, lengths, angles, offsets = segments.profiles_from_frame(segment_df)
+    lines = profile_lines(lengths, angles, offsets, max_points, max_profiles, names=profiles)
+    fig = go.Figure(go.Scattergl(
+        x=lines["x"], y=lines["z"], text=lines["text"], mode="lines+markers" if len(lines["x"]) < 500 else "lines",
+        hovertemplate="%{text}<br>水平距离 %{x:.1f} m<br>相对高程 %{y:.1f} m<extra></extra>",
+        line=dict(color='#8b4513', width=1.5), marker=dict(size=4), connectgaps=False
+    ))
+    title = "坡面剖面"
+    if lines["shown"] < lines["total"]:
+        title += f"（LS 最大的 {lines['shown']}/{lines['total']} 个坡面）"
+    fig.update_layout(title=title, xaxis_title="水平距离 (m)", yaxis_title="相对坡顶高程 (m)", height=350,
+                      margin=dict(t=50, b=40, l=40, r=20), showlegend=False)
+    return fig
+
+
+# ========== 栅格金字塔 ==========
+def _read_rows(level, r0, r1, c0=0, c1=None):
+    if isinstance(level, RasterSource):
+        return level.read(r0, r1, c0, level.shape[1] if c1 is None else c1).astype(np.float32)
+    return np.asarray(level[r0:r1, c0:c1], dtype=np.float32)
+
+
+def downsample2(level, block_rows=DOWNSAMPLE_ROWS):
+    """2×2 像元均值（忽略 NaN），按行块读取，适用于内存映射/GeoTIFF 大栅格"""
+    h, w = level.shape
+    out = np.empty(((h + 1) // 2, (w + 1) // 2), dtype=np.float32)
+    for r0 in range(0, h, block_rows):
+        block = _read_rows(level, r0, min(r0 + block_rows, h))
+        bh, bw = block.shape
+        if bh % 2 or bw % 2:
+            block = np.pad(block, ((0, bh % 2), (0, bw % 2)), constant_values=np.nan)
+        valid = np.isfinite(block)
+        shape = (block.shape[0] // 2, 2, block.shape[1] // 2, 2)
+        total = np.where(valid, block, 0).reshape(shape).sum(axis=(1, 3))
+        count = valid.reshape(shape).sum(axis=(1, 3))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[r0 // 2:r0 // 2 + shape[0]] = np.where(count > 0, total / count, np.nan)
+    return out
+
+
+def raster_pyramid(source, min_size=TILE_SIZE):
+    """栅格金字塔：第 0 层为原栅格（RasterSource，按需读取），其后每层边长减半，直到不超过 min_size
+
+    source 为 .npy/GeoTIFF 路径或数组；结果按文件（或数组内容）缓存。
+    """
+    if isinstance(source, np.ndarray):
+        key = ("pyramid", content_hash(source, min_size=min_size))
+    else:
+        key = ("pyramid", file_key(source), min_size)
+
+    def build():
+        levels = [RasterSource(source)]
+        while max(levels[-1].shape) > min_size:
+            levels.append(downsample2(levels[-1]))
+        return levels
+
+    return CACHE.get_or_prepare(key, build)
+
+
+def pyramid_window(levels, bounds=None, max_pixels=MAX_PIXELS):
+    """视窗内像元数不超过 max_pixels 的最精细层级
+
+    bounds 为原栅格像元坐标 (r0, r1, c0, c1)，缺省为全图。
+    返回 (层级, 数据块, (起始行, 起始列, 每像元对应原像元数))。
+    """
+    h, w = levels[0].shape
+    r0, r1, c0, c1 = bounds or (0, h, 0, w)
+    for level, data in enumerate(levels):
+        factor = 2 ** level
+        lr0, lr1 = r0 // factor, -(-r1 // factor)
+        lc0, lc1 = c0 // factor, -(-c1 // factor)
+        if (lr1 - lr0) * (lc1 - lc0) <= max_pixels or level == len(levels) - 1:
+            return level, _read_rows(data, lr0, lr1, lc0, lc1), (lr0 * factor, lc0 * factor, factor)
+
+
+def raster_figure(source, cell_size=None, bounds=None, max_pixels=MAX_PIXELS, log=False,
+                  title="单位面积流失量", colorbar_title="t/hm²"):
+    """栅格热力图：按视窗从金字塔取像元数不超过 max_pixels 的层级；cell_size 缺省取 GeoTIFF 像元大小或 1"""
+    levels = raster_pyramid(source)
+    cell_size = cell_size or levels[0].cell_size or 1.0
+    level, block, (row0, col0, factor) = pyramid_window(levels, bounds, max_pixels)
+    if log:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            block = np.where(block > 0, np.log10(block), np.nan)
+        colorbar_title = f"log10({colorbar_title})"
+    step = factor * cell_size
+    fig = go.Figure(go.Heatmap(
+        z=block, x0=col0 * cell_size + step / 2, dx=step, y0=row0 * cell_size + step / 2, dy=step,
+        colorscale="YlOrRd", colorbar=dict(title=colorbar_title),
+        hovertemplate="x %{x:.0f} m, y %{y:.0f} m<br>%{z:.2f}<extra></extra>"
+    ))
+    h, w = levels[0].shape
+    fig.update_layout(
+        title=f"{title}（{h}×{w} 像元，显示第 {level} 层 {block.shape[0]}×{block.shape[1]}）",
+        xaxis=dict(title="x (m)", constrain="domain"),
+        yaxis=dict(title="y (m)", autorange="reversed", scaleanchor="x"),
+        height=600
+    )
+    return fig
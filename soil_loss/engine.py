@@ -0,0 +1,219 @@
+"""土壤流失量计算引擎（SL 773-2018）
+
+一般扰动地表、工程开挖面、工程堆积体三类公式的向量化实现。
+所有函数既接受标量也接受 NumPy 数组（按广播规则逐元素计算），
+分类参数（土体类型、饱和度、形状、材料、级配）可传入名称或整数编码。
+"""
+import numpy as np
+
+# ========== 参数库 ==========
+# R因子数据库 MJ·mm/(hm²·h)
+R_FACTOR_DB = {
+    "华北地区": 1800,
+    "东北地区": 2200,
+    "华东地区": 3500,
+    "华中地区": 4200,
+    "华南地区": 5800,
+    "西南地区": 3800,
+    "西北地区": 1200
+}
+R_FACTOR_DEFAULT = 2000
+
+# R因子取值范围（参数查询手册）
+R_FACTOR_RANGES = {
+    "华北地区": (1500, 2500),
+    "东北地区": (1800, 2800),
+    "华东地区": (3000, 4500),
+    "华中地区": (3500, 5000),
+    "华南地区": (5000, 7000),
+    "西南地区": (3000, 4500),
+    "西北地区": (800, 1800)
+}
+
+# R因子典型逐月分配比例 (%)，1-12月
+R_MONTHLY_SHARES = {
+    "华北地区": [0.5, 0.8, 1.5, 3.0, 6.0, 13.0, 30.0, 28.0, 11.0, 4.0, 1.2, 1.0],
+    "东北地区": [0.3, 0.4, 1.0, 2.5, 7.0, 15.0, 32.0, 28.0, 10.0, 2.8, 0.6, 0.4],
+    "华东地区": [2.0, 3.0, 5.5, 8.0, 11.0, 17.0, 16.0, 15.0, 10.0, 6.0, 4.0, 2.5],
+    "华中地区": [1.5, 2.5, 5.0, 9.0, 13.0, 18.0, 19.0, 13.0, 8.0, 6.0, 3.0, 2.0],
+    "华南地区": [1.5, 2.5, 4.5, 9.0, 15.0, 19.0, 16.0, 15.0, 10.0, 4.5, 2.0, 1.0],
+    "西南地区": [0.8, 1.2, 2.5, 5.5, 11.0, 17.0, 22.0, 19.0, 12.0, 6.0, 2.0, 1.0],
+    "西北地区": [0.4, 0.6, 1.5, 3.5, 8.0, 14.0, 28.0, 26.0, 12.0, 4.5, 1.0, 0.5]
+}
+
+# K因子数据库
+K_FACTOR_DB = {
+    "砂土": 0.12,
+    "砂壤土": 0.18,
+    "轻壤土": 0.25,
+    "中壤土": 0.32,
+    "重壤土": 0.38,
+    "黏土": 0.42
+}
+
+# K因子取值范围（参数查询手册）
+K_FACTOR_RANGES = {
+    "砂土": (0.10, 0.15),
+    "砂壤土": (0.15, 0.22),
+    "轻壤土": (0.22, 0.28),
+    "中壤土": (0.28, 0.35),
+    "重壤土": (0.35, 0.40),
+    "黏土": (0.40, 0.45)
+}
+
+# 坡度分级: θ<20° 为缓坡, 否则为陡坡
+SLOPE_CLASS_THRESHOLD = 20.0
+GENTLE_SLOPE_MN = (0.3, 1.2)
+STEEP_SLOPE_MN = (0.5, 1.3)
+
+# 开挖面土体可蚀性及孔隙度
+EXCAVATION_K = {
+    "砂土": 0.12,
+    "壤土": 0.25,
+    "黏土": 0.30,
+    "砾石土": 0.10
+}
+EXCAVATION_POROSITY = {
+    "砂土": "高",
+    "壤土": "中",
+    "黏土": "低",
+    "砾石土": "很高"
+}
+SATURATION_FACTORS = {"湿润": 1.0, "半湿润": 0.85, "干燥": 0.7}
+
+# 堆积体形状、材料、级配系数
+SHAPE_FACTORS = {
+    "锥形": 0.75,
+    "脊形": 1.00,
+    "扇形": 0.80,
+    "不规则形": 0.90
+}
+MATERIAL_FACTORS = {
+    "弃渣": 1.0,
+    "表土": 0.8,
+    "混合料": 0.9,
+    "建筑垃圾": 0.6
+}
+GRADATION_FACTORS = {"良好": 1.0, "一般": 1.2, "不良": 1.5}
+CLAY_FACTOR = 0.9
+
+# 分类系数表，可由参数库 (params.ParameterStore.tables) 按标准版本替换
+DEFAULT_TABLES = {
+    "excavation_k": EXCAVATION_K,
+    "saturation": SATURATION_FACTORS,
+    "shape": SHAPE_FACTORS,
+    "material": MATERIAL_FACTORS,
+    "gradation": GRADATION_FACTORS
+}
+
+EXCAVATION_COEFFICIENT = 4.41
+PILE_COEFFICIENT = 0.21
+
+
+# ========== 分类参数查表 ==========
+def encode(table, keys):
+    """将分类名称转换为参数表中的整数编码（按表内顺序）"""
+    names = list(table)
+    if isinstance(keys, str):
+        if keys not in table:
+            raise KeyError(f"未知的分类值: {keys}")
+        return names.index(keys)
+    keys = np.asarray(keys)
+    if keys.dtype.kind in "iu":
+        return keys
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    missing = [k for k in uniq if k not in table]
+    if missing:
+        raise KeyError(f"未知的分类值: {', '.join(map(str, missing))}")
+    codes = np.array([names.index(k) for k in uniq], dtype=np.int64)
+    return codes[inverse].reshape(keys.shape)
+
+
+def lookup(table, keys):
+    """按名称或整数编码批量查表，返回系数数组"""
+    if isinstance(keys, str):
+        if keys not in table:
+            raise KeyError(f"未知的分类值: {keys}")
+        return table[keys]
+    values = np.fromiter(table.values(), dtype=np.float64, count=len(table))
+    return values[encode(table, keys)]
+
+
+# ========== 一般扰动地表 ==========
+def slope_exponents(slope_angle):
+    """根据坡度确定 m, n 值"""
+    steep = np.asarray(slope_angle) >= SLOPE_CLASS_THRESHOLD
+    m = np.where(steep, STEEP_SLOPE_MN[0], GENTLE_SLOPE_MN[0])[()]
+    n = np.where(steep, STEEP_SLOPE_MN[1], GENTLE_SLOPE_MN[1])[()]
+    return m, n
+
+
+def ls_factor(slope_length, slope_angle):
+    """LS = (λ/20)^m × (sinθ/0.3)^n，坡度单位为度"""
+    m, n = slope_exponents(slope_angle)
+    slope_rad = np.radians(slope_angle)
+    return np.power(np.divide(slope_length, 20), m) * np.power(np.sin(slope_rad) / 0.3, n)
+
+
+def general_unit_loss(R, K, LS, C, P, T):
+    """单位面积流失量 (t/hm²)"""
+    return R * K * LS * C * P * T
+
+
+def general_loss(R, K, C, P, T, slope_length, slope_angle, area):
+    """一般扰动地表：返回 (LS, 单位面积流失量, 总流失量)"""
+    LS = ls_factor(slope_length, slope_angle)
+    unit = general_unit_loss(R, K, LS, C, P, T)
+    return LS, unit, unit * area
+
+
+# ========== 工程开挖面 ==========
+def excavation_unit_loss(R, k, sat_factor, slope_height, slope_angle):
+    """单位面积流失量 = 4.41 × R × k × 饱和系数 × H × sinβ (t/hm²)"""
+    slope_rad = np.radians(slope_angle)
+    return EXCAVATION_COEFFICIENT * R * k * sat_factor * slope_height * np.sin(slope_rad)
+
+
+def excavation_loss(R, soil_type, saturation, slope_height, slope_angle, area, tables=None):
+    """工程开挖面：返回 (单位面积流失量, 总流失量)"""
+    tables = tables or DEFAULT_TABLES
+    k = lookup(tables["excavation_k"], soil_type)
+    sat_factor = lookup(tables["saturation"], saturation)
+    unit = excavation_unit_loss(R, k, sat_factor, slope_height, slope_angle)
+    return unit, unit * area
+
+
+# ========== 工程堆积体 ==========
+def compaction_factor(compaction):
+    """压实度 (%) 对应的调整系数"""
+    return 0.7 + (np.divide(compaction, 100)) * 0.3
+
+
+def clay_factor(contains_clay):
+    return np.where(contains_clay, CLAY_FACTOR, 1.0)[()]
+
+
+def pile_base_loss(R, pile_height, pile_length, shape_factor, pile_angle):
+    """基础计算值 = 0.21 × R × H × L × 形状系数 × sin^1.5 φ (t/hm²)"""
+    slope_rad = np.radians(pile_angle)
+    return PILE_COEFFICIENT * R * pile_height * pile_length * shape_factor * np.power(np.sin(slope_rad), 1.5)
+
+
+def pile_material_adjustment(material_factor, gradation_factor, clay, compaction):
+    """材料调整系数 = 材料 × 级配 × 含黏粒 × 压实度系数"""
+    return material_factor * gradation_factor * clay * compaction
+
+
+def pile_loss(R, pile_height, pile_angle, pile_length, shape, material, gradation,
+              contains_clay, compaction, area, tables=None):
+    """工程堆积体：返回 (基础计算值, 材料调整系数, 单位面积流失量, 总流失量)"""
+    tables = tables or DEFAULT_TABLES
+    base = pile_base_loss(R, pile_height, pile_length, lookup(tables["shape"], shape), pile_angle)
+    adjustment = pile_material_adjustment(
+        lookup(tables["material"], material),
+        lookup(tables["gradation"], gradation),
+        clay_factor(contains_clay),
+        compaction_factor(compaction)
+    )
+    unit = base * adjustment
+    return base, adjustment, unit, base * adjustment * area
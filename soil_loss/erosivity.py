@@ -0,0 +1,273 @@
+"""由降雨过程记录（1 分钟、5 分钟等定时段雨量）计算降雨侵蚀力 R = Σ(E × I30)
+
+- 降雨事件: 相邻有雨时段之间无雨间隔不少于 6 h 即划分为两次降雨；次雨量 ≥ 12 mm 为侵蚀性降雨;
+- 次降雨动能: E = Σ e_r × P_r，单位动能 e_r = 0.29 × [1 - 0.72 × exp(-0.05 i_r)] MJ/(hm²·mm)，
+  i_r 为时段雨强 (mm/h)，P_r 为时段雨量 (mm);
+- I30: 次降雨中任意连续 30 min 的最大雨量 × 2 (mm/h);
+- 年 R 为当年侵蚀性降雨 E×I30 之和（按降雨开始时间归年、月），多年平均 R 为有记录各年之均值，
+  单位 MJ·mm/(hm²·h·a)，可直接作为三类扰动公式的 R 输入。
+
+记录按站点分块流式读取，每个站点只保留未结束的降雨事件及其最后 30 min 的有雨时段，
+内存占用与记录长度无关；块内有雨时段的事件划分、30 min 滑动雨量、事件汇总均为整体向量化计算。
+时间戳表示时段结束时刻，同一站点的记录须按时间排序；多站点多文件按文件分配到进程并行计算。
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .batch import DEFAULT_CHUNK_SIZE, iter_chunks
+from .parallel import resolve_workers
+
+EVENT_GAP = np.timedelta64(6, "h")
+WINDOW = np.timedelta64(30, "m")
+EROSIVE_RAIN = 12.0
+DEFAULT_INTERVAL = np.timedelta64(5, "m")
+RECORD_COLUMNS = ("station", "time", "rain")
+EVENT_COLUMNS = ["station", "start", "end", "rain", "energy", "I30", "EI30"]
+HOUR = np.timedelta64(1, "h")
+
+
+def unit_energy(intensity):
+    """单位降雨动能 e = 0.29 × [1 - 0.72 × exp(-0.05 i)] (MJ/(hm²·mm))，i 为雨强 (mm/h)"""
+    return 0.29 * (1 - 0.72 * np.exp(-0.05 * np.asarray(intensity, dtype=np.float64)))
+
+
+# ========== 单站流式计算 ==========
+class StationErosivity:
+    """一个站点的流式次降雨侵蚀力计算
+
+    依次 add() 按时间排序的记录块，finish() 后 events 为侵蚀性降雨事件表。
+    interval 为记录时段长度（np.timedelta64），缺省由记录中最小的时间间隔推断。
+    """
+
+    def __init__(self, station, interval=None):
+        self.station = station
+        self.interval = interval
+        self.year_records = {}
+        self.records = 0
+        self.last_time = None
+        # 未结束事件的汇总 [开始, 结束, 雨量, 动能, 最大 30 min 雨量] 及其最后 30 min 的有雨时段
+        self.open = None
+        self.tail_times = np.array([], dtype="datetime64[ns]")
+        self.tail_rain = np.array([], dtype=np.float64)
+        self._closed = []
+
+    def add(self, times, rain):
+        times = np.asarray(times, dtype="datetime64[ns]")
+        rain = np.asarray(rain, dtype=np.float64)
+        if not len(times):
+            return
+        if np.any(times[1:] < times[:-1]) or (self.last_time is not None and times[0] < self.last_time):
+            raise ValueError(f"站点 {self.station} 的记录未按时间排序")
+        self.records += len(times)
+        years, counts = np.unique(times.astype("datetime64[Y]").astype(np.int64) + 1970, return_counts=True)
+        for year, count in zip(years.tolist(), counts.tolist()):
+            self.year_records[year] = self.year_records.get(year, 0) + count
+        if self.interval is None and len(times) > 1:
+            steps = np.diff(times)
+            steps = steps[steps > np.timedelta64(0, "ns")]
+            self.interval = steps.min() if len(steps) else None
+        self.last_time = times[-1]
+
+        wet = rain > 0
+        if not wet.any():
+            return
+        interval = self.interval if self.interval is not None else DEFAULT_INTERVAL
+        t, r = times[wet], rain[wet]
+
+        # 与上一块的未结束事件衔接：其最后 30 min 的时段参与滑动雨量和间隔判断
+        n_tail = len(self.tail_times)
+        t_all = np.concatenate([self.tail_times, t])
+        r_all = np.concatenate([self.tail_rain, r])
+        event = np.concatenate([[0], np.cumsum(np.diff(t_all) - interval >= EVENT_GAP)])[n_tail:]
+        # 以各时段结束时刻为终点的 30 min 滑动雨量（事件间隔远大于 30 min，窗口不会跨事件）
+        total = np.cumsum(r_all)
+        first = np.searchsorted(t_all, t_all[n_tail:] - WINDOW, side="right")
+        window = total[n_tail:] - np.where(first > 0, total[first - 1], 0.0)
+
+        energy = unit_energy(r / (interval / HOUR)) * r
+        bounds = np.flatnonzero(np.r_[True, event[1:] != event[:-1]])
+        ends = np.r_[bounds[1:], len(t)] - 1
+        start, end = t[bounds], t[ends]
+        event_rain = np.add.reduceat(r, bounds)
+        event_energy = np.add.reduceat(energy, bounds)
+        event_max = np.maximum.reduceat(window, bounds)
+
+        if self.open is not None:
+            if event[0] == 0:
+                start[0] = self.open[0]
+                event_rain[0] += self.open[2]
+                event_energy[0] += self.open[3]
+                event_max[0] = max(event_max[0], self.open[4])
+            else:
+                self._close(*[np.array([value]) for value in self.open])
+        self._close(start[:-1], end[:-1], event_rain[:-1], event_energy[:-1], event_max[:-1])
+        self.open = (start[-1], end[-1], event_rain[-1], event_energy[-1], event_max[-1])
+        keep = t_all > t_all[-1] - WINDOW
+        self.tail_times, self.tail_rain = t_all[keep], r_all[keep]
+
+    def _close(self, start, end, rain, energy, max30):
+        # 时段雨量多为 0.1 mm 的倍数，累加的舍入误差不应使恰为 12 mm 的降雨落选
+        erosive = rain >= EROSIVE_RAIN - 1e-9
+        if erosive.any():
+            I30 = 2 * max30[erosive]
+            self._closed.append((start[erosive], end[erosive], rain[erosive], energy[erosive], I30,
+                                 energy[erosive] * I30))
+
+    def finish(self):
+        """结束最后一次降雨，返回侵蚀性降雨事件表"""
+        if self.open is not None:
+            self._close(*[np.array([value]) for value in self.open])
+            self.open = None
+            self.tail_times = self.tail_times[:0]
+            self.tail_rain = self.tail_rain[:0]
+        return self.events
+
+    def complete_years(self, min_coverage=0.0):
+        """记录时段覆盖全年比例不低于 min_coverage 的年份（记录须含无雨时段；为 0 时取有记录的全部年份）"""
+        interval = self.interval if self.interval is not None else DEFAULT_INTERVAL
+        years = set()
+        for year, count in self.year_records.items():
+            days = 366 if year % 4 == 0 and (year % 100 != 0 or year % 400 == 0) else 365
+            if count * interval >= min_coverage * days * np.timedelta64(1, "D"):
+                years.add(year)
+        return years
+
+    @property
+    def events(self):
+        if self._closed:
+            columns = [np.concatenate(values) for values in zip(*self._closed)]
+        else:
+            columns = [np.array([], dtype="datetime64[ns]")] * 2 + [np.array([])] * 4
+        frame = pd.DataFrame(dict(zip(EVENT_COLUMNS[1:], columns)))
+        frame.insert(0, "station", self.station)
+        return frame
+
+
+# ========== 汇总 ==========
+class ErosivityResult:
+    """各站点侵蚀性降雨事件及参与统计的年份，按年、月、多年平均汇总 R（不在统计年份内的事件不计）"""
+
+    def __init__(self, events, years):
+        self.events = events
+        self.years = years
+
+    @classmethod
+    def merge(cls, results):
+        results = list(results)
+        events = pd.concat([r.events for r in results], ignore_index=True) if results else \
+            pd.DataFrame(columns=EVENT_COLUMNS)
+        years = {}
+        for result in results:
+            for station, values in result.years.items():
+                years.setdefault(station, set()).update(values)
+        return cls(events, years)
+
+    def _counted(self):
+        years = pd.DatetimeIndex(self.events["start"]).year
+        keep = [year in self.years.get(station, ()) for station, year in zip(self.events["station"], years)]
+        return self.events[np.asarray(keep, dtype=bool)]
+
+    def annual(self):
+        """逐年 R：station, year, events（侵蚀性降雨次数）, R；有记录但无侵蚀性降雨的年份 R 为 0"""
+        frame = self._counted().assign(year=lambda f: pd.DatetimeIndex(f["start"]).year)
+        grouped = frame.groupby(["station", "year"])["EI30"].agg(["size", "sum"])
+        index = pd.MultiIndex.from_tuples(
+            [(station, year) for station in sorted(self.years, key=str) for year in sorted(self.years[station])],
+            names=["station", "year"])
+        grouped = grouped.reindex(index, fill_value=0)
+        return pd.DataFrame({"station": index.get_level_values(0), "year": index.get_level_values(1),
+                             "events": grouped["size"].to_numpy(), "R": grouped["sum"].to_numpy(dtype=float)})
+
+    def monthly(self):
+        """各站逐月多年平均 R（12 个月之和等于多年平均 R）：station, month, R"""
+        n_years = {station: len(years) for station, years in self.years.items()}
+        frame = self._counted().assign(month=lambda f: pd.DatetimeIndex(f["start"]).month)
+        grouped = frame.groupby(["station", "month"])["EI30"].sum()
+        index = pd.MultiIndex.from_product([sorted(self.years, key=str), range(1, 13)], names=["station", "month"])
+        grouped = grouped.reindex(index, fill_value=0.0)
+        divisor = np.array([n_years[station] for station in index.get_level_values(0)], dtype=np.float64)
+        return pd.DataFrame({"station": index.get_level_values(0), "month": index.get_level_values(1),
+                             "R": grouped.to_numpy() / np.maximum(divisor, 1)})
+
+    def mean(self):
+        """各站多年平均 R：station, years, events, R"""
+        annual = self.annual()
+        grouped = annual.groupby("station", sort=False).agg(years=("year", "size"), events=("events", "sum"),
+                                                            R=("R", "mean"))
+        return grouped.reset_index()
+
+    def monthly_shares(self):
+        """各站 R 的逐月分配比例 {站点: 12 个比例}，格式同 engine.R_MONTHLY_SHARES"""
+        monthly = self.monthly()
+        shares = {}
+        for station, group in monthly.groupby("station", sort=False):
+            values = group["R"].to_numpy()
+            shares[station] = (values / values.sum()).tolist() if values.sum() > 0 else [1 / 12] * 12
+        return shares
+
+
+# ========== 记录读取 ==========
+def _stations(frame, columns, stations, interval, time_format):
+    station_col, time_col, rain_col = columns
+    times = pd.to_datetime(frame[time_col], format=time_format).to_numpy("datetime64[ns]")
+    rain = frame[rain_col].to_numpy(dtype=np.float64)
+    codes, names = pd.factorize(frame[station_col])
+    if len(names) == 1:
+        groups = [(names[0], slice(None))]
+    else:
+        order = np.argsort(codes, kind="stable")
+        bounds = np.r_[0, np.cumsum(np.bincount(codes, minlength=len(names)))]
+        groups = [(name, order[bounds[i]:bounds[i + 1]]) for i, name in enumerate(names)]
+    for name, index in groups:
+        if name not in stations:
+            stations[name] = StationErosivity(name, interval)
+        stations[name].add(times[index], rain[index])
+
+
+def _result(stations, min_coverage):
+    events = [station.finish() for station in stations.values()]
+    events = pd.concat(events, ignore_index=True) if events else pd.DataFrame(columns=EVENT_COLUMNS)
+    years = {name: station.complete_years(min_coverage) for name, station in stations.items()}
+    return ErosivityResult(events, years)
+
+
+def erosivity_from_frame(frame, interval=None, columns=RECORD_COLUMNS, time_format=None, min_coverage=0.0):
+    """内存中的记录表（station, time, rain 列）-> ErosivityResult"""
+    stations = {}
+    _stations(frame, columns, stations, interval, time_format)
+    return _result(stations, min_coverage)
+
+
+def erosivity_from_file(path, chunk_size=DEFAULT_CHUNK_SIZE, interval=None, columns=RECORD_COLUMNS,
+                        time_format=None, min_coverage=0.0):
+    """分块读取一个记录文件 (CSV/Parquet) -> ErosivityResult；文件可含多个站点"""
+    stations = {}
+    for chunk in iter_chunks(path, chunk_size, columns=list(columns)):
+        _stations(chunk, columns, stations, interval, time_format)
+    return _result(stations, min_coverage)
+
+
+def run_erosivity(paths, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, interval=None, columns=RECORD_COLUMNS,
+                  time_format=None, min_coverage=0.0):
+    """多个记录文件按文件并行计算并合并（workers 为 0 时使用全部 CPU 核心）
+
+    同一站点的记录应在同一文件内，跨文件的降雨事件会被截断。
+    """
+    paths = list(paths)
+    workers = resolve_workers(workers)
+    args = (chunk_size, interval, columns, time_format, min_coverage)
+    if workers == 1 or len(paths) <= 1:
+        return ErosivityResult.merge(erosivity_from_file(path, *args) for path in paths)
+    results = []
+    inflight = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path in paths:
+            inflight.append(pool.submit(erosivity_from_file, path, *args))
+            if len(inflight) >= 2 * workers:
+                results.append(inflight.popleft().result())
+        while inflight:
+            results.append(inflight.popleft().result())
+    return ErosivityResult.merge(results)
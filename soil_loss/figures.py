@@ -0,0 +1,226 @@
+"""页面图表构建（纯 Plotly，不依赖 Streamlit，便于缓存和报告复用）"""
+import math
+
+import numpy as np
+import plotly.graph_objects as go
+
+from .summary import COL_TYPE, COL_TOTAL, COL_UNIT, DISTURBANCE_TYPES
+
+
+def _express():
+    # plotly.express 首次导入约 70 ms，推迟到首次绘制汇总图时再导入
+    import plotly.express as px
+    return px
+
+
+def area_pie(labels, values):
+    """扰动类型面积分布饼图"""
+    fig = go.Figure(data=[go.Pie(
+        labels=list(labels),
+        values=list(values),
+        hole=.3,
+        marker_colors=['#3b82f6', '#10b981', '#f59e0b', '#ef4444']
+    )])
+    fig.update_layout(
+        title="扰动类型面积分布",
+        height=300,
+        showlegend=True,
+        margin=dict(t=50, b=0, l=0, r=0)
+    )
+    return fig
+
+
+def excavation_sketch(slope_height, slope_angle):
+    """开挖面示意图"""
+    fig = go.Figure()
+
+    # 绘制边坡
+    x = [0, slope_height / math.tan(math.radians(slope_angle)), slope_height / math.tan(math.radians(slope_angle))]
+    y = [0, 0, slope_height]
+
+    fig.add_trace(go.Scatter(x=x, y=y, fill='tozeroy', fillcolor='rgba(139,69,19,0.3)',
+                            line=dict(color='saddlebrown', width=3),
+                            name=f"开挖面 β={slope_angle}°"))
+
+    fig.update_layout(
+        title=f"坡高: {slope_height}m, 坡度: {slope_angle}°",
+        xaxis_title="水平距离 (m)",
+        yaxis_title="高度 (m)",
+        height=250,
+        showlegend=True,
+        margin=dict(t=40, b=20, l=40, r=20)
+    )
+    return fig
+
+
+def pile_sketch(pile_shape, pile_height, pile_length):
+    """堆积体示意图"""
+    fig = go.Figure()
+
+    if pile_shape == "锥形":
+        # 简化锥形表示
+        theta = np.linspace(0, 2*np.pi, 100)
+        r = pile_height
+        x = r * np.cos(theta)
+        y = r * np.sin(theta)
+        fig.add_trace(go.Scatter(x=x, y=y, fill='toself', fillcolor='rgba(210,180,140,0.5)'))
+    elif pile_shape == "脊形":
+        # 脊形表示
+        x = [-pile_length/2, 0, pile_length/2]
+        y = [0, pile_height, 0]
+        fig.add_trace(go.Scatter(x=x, y=y, fill='tozeroy', fillcolor='rgba(210,180,140,0.5)'))
+
+    fig.update_layout(
+        title=f"{pile_shape}堆积体示意图",
+        xaxis_title="距离 (m)",
+        yaxis_title="高度 (m)",
+        height=200,
+        showlegend=False
+    )
+    return fig
+
+
+def loss_pie(df_summary):
+    """流失量构成饼图"""
+    px = _express()
+    fig = px.pie(
+        df_summary,
+        values=COL_TOTAL,
+        names=COL_TYPE,
+        title='土壤流失量构成',
+        color_discrete_sequence=px.colors.sequential.RdBu
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    return fig
+
+
+def unit_loss_bar(df_summary):
+    """单位流失量柱状图"""
+    return _express().bar(
+        df_summary,
+        x=COL_TYPE,
+        y=COL_UNIT,
+        title='单位面积流失量对比',
+        color=COL_UNIT,
+        color_continuous_scale='Viridis'
+    )
+
+
+def sensitivity_bar(df_indices, columns, title):
+    """敏感性指数龙卷风图（按首列降序的水平条形图）"""
+    df = df_indices.sort_values(columns[0])
+    fig = go.Figure([
+        go.Bar(y=df["参数"], x=df[column], name=column, orientation='h')
+        for column in columns
+    ])
+    fig.update_layout(
+        title=title,
+        barmode='group',
+        height=120 + 40 * len(df),
+        margin=dict(t=50, b=20, l=20, r=20)
+    )
+    return fig
+
+
+def monthly_loss_chart(df_monthly):
+    """施工期逐月流失量（按扰动类型堆叠）及累计流失量"""
+    fig = go.Figure()
+    for kind, color in zip(DISTURBANCE_TYPES, ['#3b82f6', '#10b981', '#f59e0b', '#ef4444']):
+        if df_monthly[kind].any():
+            fig.add_trace(go.Bar(x=df_monthly["月份"], y=df_monthly[kind], name=kind, marker_color=color))
+    fig.add_trace(go.Scatter(x=df_monthly["月份"], y=df_monthly["累计(t)"], name="累计流失量",
+                             yaxis="y2", line=dict(color='#1e3a8a', width=2)))
+    fig.update_layout(
+        title="施工期逐月土壤流失量",
+        barmode='stack',
+        xaxis_title="月份",
+        yaxis=dict(title="月流失量 (t)"),
+        yaxis2=dict(title="累计流失量 (t)", overlaying='y', side='right'),
+        height=400,
+        legend=dict(orientation='h', y=-0.2)
+    )
+    return fig
+
+
+def portfolio_bar(df_matrix, title="项目流失量对比"):
+    """项目 × 扰动类型流失量堆叠柱状图（df_matrix 行为项目，列为扰动类型）"""
+    fig = go.Figure()
+    for kind, color in zip(DISTURBANCE_TYPES, ['#3b82f6', '#10b981', '#f59e0b', '#ef4444']):
+        if kind in df_matrix.columns and df_matrix[kind].any():
+            fig.add_trace(go.Bar(x=df_matrix.index, y=df_matrix[kind], name=kind, marker_color=color))
+    fig.update_layout(
+        title=title,
+        barmode='stack',
+        yaxis_title="总流失量 (t)",
+        height=400,
+        legend=dict(orientation='h', y=-0.25)
+    )
+    return fig
+
+
+def region_type_bar(df_region):
+    """按地区、扰动类型汇总的流失量柱状图"""
+    return _express().bar(
+        df_region,
+        x="地区",
+        y=COL_TOTAL,
+        color=COL_TYPE,
+        title='各地区流失量构成',
+        category_orders={COL_TYPE: DISTURBANCE_TYPES},
+        color_discrete_sequence=['#3b82f6', '#10b981', '#f59e0b', '#ef4444']
+    )
+
+
+def pareto_front(df_front, baseline_loss, target=None, chosen=None):
+    """费用-总流失量 Pareto 前沿，标出现状、目标线和选定方案"""
+    fig = go.Figure(go.Scatter(
+        x=df_front["费用(元)"], y=df_front["总流失量(t)"], mode='lines+markers', name='Pareto 前沿',
+        line=dict(color='#3b82f6', shape='hv'), marker=dict(size=5)
+    ))
+    fig.add_trace(go.Scatter(x=[0], y=[baseline_loss], mode='markers', name='现状',
+                             marker=dict(color='#64748b', size=12, symbol='x')))
+    if chosen is not None:
+        fig.add_trace(go.Scatter(x=[chosen["费用(元)"]], y=[chosen["总流失量(t)"]], mode='markers',
+                                 name='最低费用方案', marker=dict(color='#ef4444', size=14, symbol='star')))
+    if target is not None:
+        fig.add_hline(y=target, line_dash='dash', line_color='#ef4444', annotation_text='目标流失量')
+    fig.update_layout(
+        title="措施费用与总流失量",
+        xaxis_title="费用 (元)",
+        yaxis_title="总流失量 (t)",
+        height=420,
+        legend=dict(orientation='h', y=-0.2)
+    )
+    return fig
+
+
+def response_surface(x, y, z, x_label, y_label, title, style="等值线", colorbar_title="t/hm²"):
+    """参数扫描二维剖面：等值线图或热力图（分类轴按选项名称显示）"""
+    x, y = [list(map(str, v)) if np.asarray(v).dtype.kind not in "fiu" else v for v in (x, y)]
+    trace = go.Contour if style == "等值线" else go.Heatmap
+    fig = go.Figure(trace(x=x, y=y, z=z, colorscale='YlOrRd', colorbar=dict(title=colorbar_title),
+                          hovertemplate=f"{x_label} %{{x}}<br>{y_label} %{{y}}<br>%{{z:.2f}}<extra></extra>"))
+    fig.update_layout(title=title, xaxis_title=x_label, yaxis_title=y_label, height=480)
+    return fig
+
+
+def response_profile(x, z, x_label, title, yaxis_title="单位面积流失量 (t/hm²)"):
+    """参数扫描一维曲线（分类轴为柱状图）"""
+    if np.asarray(x).dtype.kind in "fiu":
+        fig = go.Figure(go.Scatter(x=x, y=z, mode='lines', line=dict(color='#3b82f6', width=2)))
+    else:
+        fig = go.Figure(go.Bar(x=list(map(str, x)), y=z, marker_color='#3b82f6'))
+    fig.update_layout(title=title, xaxis_title=x_label, yaxis_title=yaxis_title, height=400)
+    return fig
+
+
+def scenario_change_bar(df_compare):
+    """各情景项目总流失量相对基准的变化（scenarios.compare 的合计行）"""
+    df_total = df_compare[(df_compare[COL_TYPE] == "合计") & (df_compare["情景"] != "基准")]
+    change = df_total["变化量(t)"]
+    fig = go.Figure(go.Bar(
+        x=df_total["情景"], y=change, marker_color=np.where(change <= 0, '#10b981', '#ef4444'),
+        text=[f"{v:+.1f}%" for v in df_total["变化率(%)"]], textposition='outside'
+    ))
+    fig.update_layout(title="各情景总流失量变化", yaxis_title="相对基准变化 (t)", height=400)
+    return fig
@@ -0,0 +1,321 @@
+"""可选的 Numba 编译内核：公式与坡段/栅格循环的融合实现
+
+导入时选择后端：已安装 numba 时使用编译内核 (BACKEND == "numba")，否则退回 NumPy 实现
+(BACKEND == "numpy"，即 engine/segments/raster 中的原有函数)。环境变量 SOIL_LOSS_KERNELS
+可指定 numba/numpy 强制选择后端。
+
+- general_loss / excavation_loss / pile_loss: 与 engine 同名函数参数、返回值相同，
+  每个元素在一次循环内算完，不产生中间数组；分类参数以编码 + 系数表传入内核;
+- profile_ls: 多坡段坡面 LS，逐坡面累计坡长的单次循环（不生成 ids/上下缘等中间数组）;
+- flow_length: D8 汇流坡长，按拓扑顺序一次遍历，代替逐轮松弛迭代。
+
+公式内核与坡面循环按 prange 在多核上并行（线程数由 NUMBA_NUM_THREADS 控制，
+多进程计算时宜设为 1）；flow_length 为串行遍历，栅格按分块多进程并行。
+并行版本只在主线程中调用，其他线程（如 Streamlit 的会话线程）调用同一内核的串行编译版本：
+numba 的 TBB 线程层在工作线程中初始化后进程退出时会挂起，workqueue 线程层不支持多线程并发调用。
+输出与工作数组都在 Python 侧以 np.empty 分配后传入内核，内核本身不分配内存。
+公式结果与 NumPy 实现在舍入误差内一致（相对误差 < 1e-12）；profile_ls 逐坡面累加坡长，
+比 NumPy 实现的全局累加再相减更精确，大规模输入时两者可有 1e-7 量级的相对差。
+"""
+import math
+import os
+import threading
+import types
+
+import numpy as np
+
+from . import engine
+
+BACKEND_ENV = "SOIL_LOSS_KERNELS"
+
+
+def _require_numba():
+    try:
+        import numba
+    except ImportError as exc:
+        raise ImportError("编译内核需要安装 numba: pip install numba") from exc
+    return numba
+
+
+def _load_numba():
+    choice = os.environ.get(BACKEND_ENV, "").strip().lower()
+    if choice == "numpy":
+        return None
+    if choice == "numba":
+        return _require_numba()
+    try:
+        return _require_numba()
+    except ImportError:
+        return None
+
+
+numba = _load_numba()
+BACKEND = "numba" if numba is not None else "numpy"
+ENABLED = numba is not None
+
+# 内核中使用的常数（编译时固化）
+_THRESHOLD = engine.SLOPE_CLASS_THRESHOLD
+_GENTLE_M, _GENTLE_N = engine.GENTLE_SLOPE_MN
+_STEEP_M, _STEEP_N = engine.STEEP_SLOPE_MN
+_STEEP_SQRT = _STEEP_M == 0.5
+_EXCAVATION = engine.EXCAVATION_COEFFICIENT
+_PILE = engine.PILE_COEFFICIENT
+_CLAY = engine.CLAY_FACTOR
+
+
+# ========== 参数整理 ==========
+def _flat(*arrays):
+    """数组 -> (广播后的形状, 一维数组列表)
+
+    与结果同形状的数组按视图展平，单值参数为长度 1 的数组（内核中按下标 0 读取），
+    其余形状才按广播展开复制。
+    """
+    shape = np.broadcast_shapes(*(a.shape for a in arrays))
+    flat = []
+    for a in arrays:
+        if a.size == 1:
+            flat.append(a.reshape(1))
+        elif a.shape == shape:
+            flat.append(a.reshape(-1))
+        else:
+            flat.append(np.broadcast_to(a, shape).reshape(-1))
+    return shape, flat
+
+
+def _floats(*values):
+    return [np.asarray(v, dtype=np.float64) for v in values]
+
+
+def _codes(table, keys):
+    codes = np.asarray(engine.encode(table, keys), dtype=np.int64)
+    values = np.fromiter(table.values(), dtype=np.float64, count=len(table))
+    if codes.size and (codes.min() < 0 or codes.max() >= len(values)):
+        raise KeyError(f"分类编码超出范围: 0-{len(values) - 1}")
+    return codes, values
+
+
+def _outputs(shape, count):
+    size = math.prod(shape)
+    return [np.empty(size) for _ in range(count)]
+
+
+def _shaped(shape, arrays):
+    return [a.reshape(shape)[()] for a in arrays]
+
+
+# ========== 编译内核 ==========
+if ENABLED:
+    _jit = numba.njit(cache=True)
+    prange = numba.prange
+
+    def _pjit(func):
+        """编译并行、串行两个版本，主线程调用并行版本，其他线程调用串行版本
+
+        串行版本复制为另一个函数名，两者的编译缓存互不覆盖。
+        """
+        parallel = numba.njit(parallel=True, cache=True)(func)
+        copy = types.FunctionType(func.__code__, func.__globals__, func.__name__ + "_serial")
+        copy.__qualname__ = func.__qualname__ + "_serial"
+        serial = _jit(copy)
+
+        def run(*args):
+            kernel = parallel if threading.current_thread() is threading.main_thread() else serial
+            return kernel(*args)
+
+        run.parallel, run.serial = parallel, serial
+        return run
+
+    @_jit
+    def _at(a, i):
+        return a[i] if a.shape[0] > 1 else a[0]
+
+    @_jit
+    def _ls(length, angle):
+        slope = math.sin(math.radians(angle)) / 0.3
+        if angle >= _THRESHOLD:
+            # m = 0.5 时以开方代替幂运算（编译时确定分支）
+            length_term = math.sqrt(length / 20) if _STEEP_SQRT else (length / 20) ** _STEEP_M
+            return length_term * slope ** _STEEP_N
+        return (length / 20) ** _GENTLE_M * slope ** _GENTLE_N
+
+    @_jit
+    def _sin15(angle):
+        # sin^1.5 φ = sinφ × √sinφ
+        s = math.sin(math.radians(angle))
+        return s * math.sqrt(s)
+
+    @_pjit
+    def _general_kernel(R, K, C, P, T, length, angle, area, ls_out, unit_out, total_out):
+        for i in prange(ls_out.shape[0]):
+            ls = _ls(_at(length, i), _at(angle, i))
+            unit = _at(R, i) * _at(K, i) * ls * _at(C, i) * _at(P, i) * _at(T, i)
+            ls_out[i] = ls
+            unit_out[i] = unit
+            total_out[i] = unit * _at(area, i)
+
+    @_pjit
+    def _excavation_kernel(R, k_code, k_table, sat_code, sat_table, H, angle, area, unit_out, total_out):
+        for i in prange(unit_out.shape[0]):
+            unit = (_EXCAVATION * _at(R, i) * k_table[_at(k_code, i)] * sat_table[_at(sat_code, i)]
+                    * _at(H, i) * math.sin(math.radians(_at(angle, i))))
+            unit_out[i] = unit
+            total_out[i] = unit * _at(area, i)
+
+    @_pjit
+    def _pile_kernel(R, H, angle, L, shape_code, shape_table, material_code, material_table,
+                     gradation_code, gradation_table, clay, compaction, area,
+                     base_out, adjustment_out, unit_out, total_out):
+        for i in prange(unit_out.shape[0]):
+            base = (_PILE * _at(R, i) * _at(H, i) * _at(L, i) * shape_table[_at(shape_code, i)]
+                    * _sin15(_at(angle, i)))
+            clay_factor = _CLAY if _at(clay, i) else 1.0
+            adjustment = (material_table[_at(material_code, i)] * gradation_table[_at(gradation_code, i)]
+                          * clay_factor * (0.7 + _at(compaction, i) / 100 * 0.3))
+            base_out[i] = base
+            adjustment_out[i] = adjustment
+            unit_out[i] = base * adjustment
+            total_out[i] = base * adjustment * _at(area, i)
+
+    @_pjit
+    def _profile_ls_kernel(lengths, angles, offsets, out):
+        for p in prange(offsets.shape[0] - 1):
+            lower = 0.0
+            weighted = 0.0
+            total = 0.0
+            for j in range(offsets[p], offsets[p + 1]):
+                length = lengths[j]
+                upper = lower
+                lower = upper + length
+                total += length
+                if length > 0:
+                    angle = angles[j]
+                    if angle >= _THRESHOLD:
+                        m, n = _STEEP_M, _STEEP_N
+                    else:
+                        m, n = _GENTLE_M, _GENTLE_N
+                    term = (lower ** (m + 1) - upper ** (m + 1)) / (length * 20 ** m)
+                    weighted += term * (math.sin(math.radians(angle)) / 0.3) ** n * length
+            out[p] = weighted / total if total > 0 else 0.0
+
+    @_jit
+    def _downstream(direction, d_rows, d_cols, r, c):
+        """(r, c) 沿流向的下游像元序号；无出流或流出栅格时为 -1"""
+        rows, cols = direction.shape
+        k = direction[r, c]
+        if k < 0:
+            return -1
+        rr = r + d_rows[k]
+        cc = c + d_cols[k]
+        if 0 <= rr < rows and 0 <= cc < cols:
+            return rr * cols + cc
+        return -1
+
+    @_jit
+    def _flow_length_kernel(direction, step, max_length, d_rows, d_cols, pending, queue, out):
+        # out 先作为各像元上游最大坡长的累加器，像元出队时写入最终坡长
+        rows, cols = direction.shape
+        flat = out.reshape(-1)
+        pending[:] = 0
+        flat[:] = 0.0
+        for r in range(rows):
+            for c in range(cols):
+                d = _downstream(direction, d_rows, d_cols, r, c)
+                if d >= 0:
+                    pending[d] += 1
+        tail = 0
+        for i in range(rows * cols):
+            if pending[i] == 0:
+                queue[tail] = i
+                tail += 1
+        # 上游全部算完的像元出队：λ = min(max_length, 步长 + max λ(上游))
+        head = 0
+        while head < tail:
+            i = queue[head]
+            head += 1
+            r = i // cols
+            c = i - r * cols
+            length = min(step[r, c] + flat[i], max_length)
+            flat[i] = length
+            d = _downstream(direction, d_rows, d_cols, r, c)
+            if d >= 0:
+                if length > flat[d]:
+                    flat[d] = length
+                pending[d] -= 1
+                if pending[d] == 0:
+                    queue[tail] = d
+                    tail += 1
+
+
+# ========== 对外接口 ==========
+def general_loss(R, K, C, P, T, slope_length, slope_angle, area):
+    """一般扰动地表：返回 (LS, 单位面积流失量, 总流失量)，同 engine.general_loss"""
+    if not ENABLED:
+        return engine.general_loss(R, K, C, P, T, slope_length, slope_angle, area)
+    shape, args = _flat(*_floats(R, K, C, P, T, slope_length, slope_angle, area))
+    out = _outputs(shape, 3)
+    _general_kernel(*args, *out)
+    return tuple(_shaped(shape, out))
+
+
+def excavation_loss(R, soil_type, saturation, slope_height, slope_angle, area, tables=None):
+    """工程开挖面：返回 (单位面积流失量, 总流失量)，同 engine.excavation_loss"""
+    if not ENABLED:
+        return engine.excavation_loss(R, soil_type, saturation, slope_height, slope_angle, area, tables=tables)
+    tables = tables or engine.DEFAULT_TABLES
+    k_code, k_table = _codes(tables["excavation_k"], soil_type)
+    sat_code, sat_table = _codes(tables["saturation"], saturation)
+    shape, (R, k_code, sat_code, H, angle, area) = _flat(
+        *_floats(R), k_code, sat_code, *_floats(slope_height, slope_angle, area))
+    out = _outputs(shape, 2)
+    _excavation_kernel(R, k_code, k_table, sat_code, sat_table, H, angle, area, *out)
+    return tuple(_shaped(shape, out))
+
+
+def pile_loss(R, pile_height, pile_angle, pile_length, shape, material, gradation,
+              contains_clay, compaction, area, tables=None):
+    """工程堆积体：返回 (基础计算值, 材料调整系数, 单位面积流失量, 总流失量)，同 engine.pile_loss"""
+    if not ENABLED:
+        return engine.pile_loss(R, pile_height, pile_angle, pile_length, shape, material, gradation,
+                                contains_clay, compaction, area, tables=tables)
+    tables = tables or engine.DEFAULT_TABLES
+    shape_code, shape_table = _codes(tables["shape"], shape)
+    material_code, material_table = _codes(tables["material"], material)
+    gradation_code, gradation_table = _codes(tables["gradation"], gradation)
+    dims, (R, H, angle, L, shape_code, material_code, gradation_code, clay, compaction, area) = _flat(
+        *_floats(R, pile_height, pile_angle, pile_length), shape_code, material_code, gradation_code,
+        np.asarray(contains_clay, dtype=np.bool_), *_floats(compaction, area))
+    out = _outputs(dims, 4)
+    _pile_kernel(R, H, angle, L, shape_code, shape_table, material_code, material_table,
+                 gradation_code, gradation_table, clay, compaction, area, *out)
+    return tuple(_shaped(dims, out))
+
+
+def profile_ls(lengths, angles, offsets):
+    """各坡面的 LS 因子（坡段 LS 按坡长加权平均），同 segments.profile_ls"""
+    if not ENABLED:
+        from .segments import profile_ls
+        return profile_ls(lengths, angles, offsets)
+    out = np.empty(len(offsets) - 1)
+    _profile_ls_kernel(np.ascontiguousarray(lengths, dtype=np.float64),
+                       np.ascontiguousarray(angles, dtype=np.float64),
+                       np.ascontiguousarray(offsets, dtype=np.int64), out)
+    return out
+
+
+def flow_length(direction, step, max_length):
+    """最长上坡汇流路径长度，同 raster.flow_length
+
+    D8 流向只指向更低的像元，流向图无环：先统计各像元的上游像元数，
+    再从没有上游的像元开始按拓扑顺序逐个确定坡长，每个像元只计算一次。
+    """
+    from .raster import D8_OFFSETS, flow_length as numpy_flow_length
+    if not ENABLED:
+        return numpy_flow_length(direction, step, max_length)
+    size = direction.size
+    offsets = np.array(D8_OFFSETS, dtype=np.int64)
+    out = np.empty(direction.shape)
+    # 每个像元至多 8 个上游像元，计数用 int8
+    _flow_length_kernel(np.ascontiguousarray(direction), np.ascontiguousarray(step, dtype=np.float64),
+                        float(max_length), offsets[:, 0].copy(), offsets[:, 1].copy(),
+                        np.empty(size, dtype=np.int8), np.empty(size, dtype=np.int64), out)
+    return out
@@ -0,0 +1,503 @@
+"""并发会话压测：启动本地 Streamlit 实例，模拟多名工程师同时操作页面，输出容量报告
+
+每个模拟会话是一个 WebSocket 客户端，按浏览器前端的协议（/_stcore/stream，BackMsg/ForwardMsg protobuf）
+发送重跑请求和控件取值，等待 script_finished 计时。会话按加权随机顺序执行典型操作：
+切换地区、修改面积、切换标签页、调整坡度等输入、生成报告，两次操作之间有思考时间。
+
+按并发级别（如 1、10、25、50 个会话）依次压测，记录每次重跑的延迟、下行字节数和错误；
+服务进程的 CPU 时间和常驻内存从 /proc 采样（仅 Linux）。每会话内存为全部会话保持连接时
+相对压测前的内存增量除以会话数，含会话期间新增的共享缓存。
+容量估算取三者最小值：延迟 p90 不超过目标的最大并发、单进程 CPU 可支撑的会话数、内存上限可容纳的会话数。
+"""
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .profiling import process_rss
+
+APP_PATH = Path(__file__).resolve().parents[1] / "app.py"
+DEFAULT_LEVELS = (1, 10, 25, 50)
+DEFAULT_ACTIONS = 20
+DEFAULT_THINK = (1.0, 3.0)
+TARGET_P90 = 2.0
+REGRESSION_THRESHOLD = 1.5
+PERCENTILES = (50, 90, 99)
+SAMPLE_INTERVAL = 0.25
+START_TIMEOUT = 60.0
+RERUN_TIMEOUT = 120.0
+MB = 2 ** 20
+
+# 操作及权重
+ACTION_WEIGHTS = {"region": 2, "area": 3, "tab": 4, "input": 3, "report": 1}
+ACTION_LABELS = {
+    "open": "打开页面",
+    "region": "切换地区",
+    "area": "修改面积",
+    "tab": "切换标签页",
+    "input": "调整输入",
+    "report": "生成报告"
+}
+REGION_LABEL = "项目所在地"
+AREA_KEYS = ("area_general", "area_excavation", "area_pile", "area_other")
+INPUT_KEYS = ("c_gen", "sa_ex", "pa_pile")
+TABS_KEY = "main_tabs"
+RESULTS_TAB = "结果汇总"
+REPORT_LABEL = "生成完整测算报告"
+
+
+def _require_protocol():
+    try:
+        from streamlit.proto import BackMsg_pb2, ForwardMsg_pb2, WidgetStates_pb2
+        from websockets.sync.client import connect
+    except ImportError as exc:
+        raise ImportError("压测客户端需要安装 websockets: pip install websockets") from exc
+    return BackMsg_pb2, ForwardMsg_pb2, WidgetStates_pb2, connect
+
+
+def process_cpu(pid):
+    """进程累计 CPU 时间 (秒，用户态 + 内核态)；无法获取时返回 None"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # 第 2 个字段（进程名）可能含空格，从右括号之后开始计数
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ========== 本地实例 ==========
+class AppServer:
+    """在子进程中运行 streamlit run app.py，参数库和项目库使用临时目录（不影响本机数据）"""
+
+    def __init__(self, app_path=APP_PATH, port=None, env=None):
+        self.app_path = str(app_path)
+        self.port = port or _free_port()
+        self.env = env or {}
+        self.process = None
+        self._tmp = None
+        self._log = None
+
+    @property
+    def url(self):
+        return f"ws://127.0.0.1:{self.port}/_stcore/stream"
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def start(self):
+        self._tmp = tempfile.TemporaryDirectory(prefix="soil_loss_load_")
+        self._log = open(os.path.join(self._tmp.name, "server.log"), "w+")
+        env = {**os.environ,
+               "SOIL_LOSS_PARAMS_DB": os.path.join(self._tmp.name, "params.sqlite"),
+               "SOIL_LOSS_PROJECTS_DB": os.path.join(self._tmp.name, "projects.sqlite"),
+               **self.env}
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", self.app_path, "--server.headless", "true",
+             "--server.address", "127.0.0.1", "--server.port", str(self.port),
+             "--server.enableXsrfProtection", "false", "--server.fileWatcherType", "none",
+             "--browser.gatherUsageStats", "false"],
+            env=env, stdout=self._log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Streamlit 进程启动失败:\n{self.log_tail()}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=1) as r:
+                    if r.status == 200:
+                        return self
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"Streamlit 进程 {START_TIMEOUT:.0f} 秒内未就绪")
+
+    def log_tail(self, lines=20):
+        self._log.flush()
+        self._log.seek(0)
+        return "".join(self._log.readlines()[-lines:])
+
+    def stats(self):
+        """(累计 CPU 秒, 常驻内存字节)"""
+        return process_cpu(self.pid), process_rss(self.pid)
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self._log is not None:
+            self._log.close()
+        if self._tmp is not None:
+            self._tmp.cleanup()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# ========== 模拟会话 ==========
+class Session:
+    """一个浏览器会话：保存上次重跑中出现的控件（按 key 和标签索引），按操作名发送新的控件取值"""
+
+    def __init__(self, url, rng):
+        self._backmsg, self._forwardmsg, self._widgets, connect = _require_protocol()
+        self.ws = connect(url, subprotocols=["streamlit"], max_size=None, open_timeout=RERUN_TIMEOUT)
+        self.rng = rng
+        self.widgets = {}
+        self.tabs = {}
+
+    def close(self):
+        self.ws.close()
+
+    def rerun(self, states=()):
+        """发送一次重跑，返回 (延迟秒, 下行字节数, 错误信息或 None)"""
+        msg = self._backmsg.BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.widget_states.widgets.extend(states)
+        widgets, tabs, containers, error, nbytes = {}, {}, {}, None, 0
+        start = time.perf_counter()
+        self.ws.send(msg.SerializeToString())
+        while True:
+            raw = self.ws.recv(timeout=RERUN_TIMEOUT)
+            nbytes += len(raw)
+            forward = self._forwardmsg.ForwardMsg()
+            forward.ParseFromString(raw)
+            kind = forward.WhichOneof("type")
+            if kind == "script_finished":
+                break
+            if kind != "delta":
+                continue
+            path = tuple(forward.metadata.delta_path)
+            delta = forward.delta
+            if delta.WhichOneof("type") == "new_element":
+                element_type = delta.new_element.WhichOneof("type")
+                element = getattr(delta.new_element, element_type)
+                if element_type == "exception" and error is None:
+                    error = f"{element.type}: {element.message}"
+                elif getattr(element, "id", "") and hasattr(element, "label"):
+                    widgets[element.id] = (element_type, element)
+            elif delta.WhichOneof("type") == "add_block":
+                block_type = delta.add_block.WhichOneof("type")
+                if block_type == "tab_container":
+                    containers[path] = delta.add_block.tab_container.id
+                elif block_type == "tab" and path[:-1] in containers:
+                    tabs.setdefault(containers[path[:-1]], []).append(delta.add_block.tab.label)
+        latency = time.perf_counter() - start
+        self.widgets, self.tabs = widgets, tabs
+        return latency, nbytes, error
+
+    def _find(self, key=None, label=None):
+        for widget_id, (element_type, element) in self.widgets.items():
+            if (key and widget_id.endswith(f"-{key}")) or (label and label in element.label):
+                return widget_id, element_type, element
+        return None
+
+    def _state(self, widget_id, **value):
+        state = self._widgets.WidgetState(id=widget_id)
+        for field, v in value.items():
+            if field == "double_array_value":
+                state.double_array_value.data[:] = v
+            else:
+                setattr(state, field, v)
+        return state
+
+    def _tab_state(self, contains=None):
+        tab_id = next((i for i in self.tabs if i.endswith(f"-{TABS_KEY}")), None)
+        if tab_id is None:
+            return []
+        labels = self.tabs[tab_id]
+        label = next((t for t in labels if contains in t), labels[0]) if contains else self.rng.choice(labels)
+        return [self._state(tab_id, string_value=label)]
+
+    def states(self, action):
+        """操作对应的控件取值；页面上找不到对应控件时为空（仅重跑）"""
+        rng = self.rng
+        if action == "region":
+            found = self._find(label=REGION_LABEL)
+            return [self._state(found[0], string_value=rng.choice(list(found[2].options)))] if found else []
+        if action == "area":
+            found = self._find(key=rng.choice(AREA_KEYS))
+            return [self._state(found[0], double_value=round(rng.uniform(0.0, 10.0), 2))] if found else []
+        if action == "tab":
+            return self._tab_state()
+        if action == "input":
+            found = self._find(key=rng.choice(INPUT_KEYS))
+            if not found:
+                return []
+            slider = found[2]
+            steps = int(round((slider.max - slider.min) / slider.step))
+            return [self._state(found[0], double_array_value=[slider.min + rng.randint(0, steps) * slider.step])]
+        if action == "report":
+            found = self._find(label=REPORT_LABEL)
+            return self._tab_state(RESULTS_TAB) + ([self._state(found[0], trigger_value=True)] if found else [])
+        raise ValueError(f"未知的操作: {action}")
+
+
+def _session(url, index, level, actions, think, seed, barrier, records):
+    rng = random.Random(seed * 100_003 + level * 1_009 + index)
+    # 会话错开进入，避免所有会话同时发出第一次请求
+    time.sleep(rng.uniform(0, think[1]))
+    names, weights = list(ACTION_WEIGHTS), list(ACTION_WEIGHTS.values())
+    session = None
+    try:
+        session = Session(url, rng)
+        for step in range(actions + 1):
+            action = "open" if step == 0 else rng.choices(names, weights)[0]
+            states = [] if step == 0 else session.states(action)
+            latency, nbytes, error = session.rerun(states)
+            records.append((level, index, action, latency, nbytes, error))
+            if step < actions:
+                time.sleep(rng.uniform(*think))
+    except Exception as exc:  # 连接失败、断开或超时
+        records.append((level, index, "open" if session is None else action, np.nan, 0,
+                        f"{type(exc).__name__}: {exc}"))
+    finally:
+        # 出错的会话也参加两次同步：全部会话结束操作、仍保持连接时由主线程测量内存
+        for _ in range(2):
+            try:
+                barrier.wait(timeout=RERUN_TIMEOUT * 2)
+            except threading.BrokenBarrierError:
+                break
+        if session is not None:
+            session.close()
+
+
+def _sampler(server, level, samples, stop):
+    start = time.perf_counter()
+    while not stop.wait(SAMPLE_INTERVAL):
+        cpu, rss = server.stats()
+        samples.append((level, time.perf_counter() - start, cpu, rss))
+
+
+def run_level(server, level, actions=DEFAULT_ACTIONS, think=DEFAULT_THINK, seed=0):
+    """以 level 个并发会话压测一轮，返回 (重跑记录列表, 采样列表, 本轮汇总字典)"""
+    records, samples = [], []
+    barrier = threading.Barrier(level + 1)
+    stop = threading.Event()
+    sampler = threading.Thread(target=_sampler, args=(server, level, samples, stop), daemon=True)
+    cpu_start, rss_start = server.stats()
+    wall_start = time.perf_counter()
+    sampler.start()
+    rss_connected = None
+    with ThreadPoolExecutor(max_workers=level) as pool:
+        for i in range(level):
+            pool.submit(_session, server.url, i, level, actions, think, seed, barrier, records)
+        try:
+            barrier.wait(timeout=RERUN_TIMEOUT * (actions + 2))
+            rss_connected = server.stats()[1]
+            barrier.wait(timeout=RERUN_TIMEOUT)
+        except threading.BrokenBarrierError:
+            barrier.abort()
+    wall = time.perf_counter() - wall_start
+    stop.set()
+    sampler.join()
+    cpu_end, _ = server.stats()
+    rss_values = [s[3] for s in samples if s[3] is not None]
+    info = {
+        "wall": wall,
+        "cpu": cpu_end - cpu_start if cpu_start is not None and cpu_end is not None else None,
+        "rss_start": rss_start,
+        "rss_connected": rss_connected,
+        "rss_peak": max(rss_values) if rss_values else None
+    }
+    return records, samples, info
+
+
+def run_loadtest(levels=DEFAULT_LEVELS, actions=DEFAULT_ACTIONS, think=DEFAULT_THINK, seed=0, app_path=APP_PATH,
+                 warmup=True, progress=None):
+    """依次按各并发级别压测同一个本地实例，返回 LoadResult
+
+    warmup 为 True 时先用一个会话执行每种操作各一次（填充缓存），不计入结果。
+    progress(level, info) 在每轮结束后调用。
+    """
+    all_records, all_samples, levels_info = [], [], {}
+    with AppServer(app_path) as server:
+        if warmup:
+            session = Session(server.url, random.Random(seed))
+            try:
+                session.rerun()
+                for action in ACTION_WEIGHTS:
+                    session.rerun(session.states(action))
+            finally:
+                session.close()
+        idle_rss = server.stats()[1]
+        for level in levels:
+            records, samples, info = run_level(server, int(level), actions, think, seed)
+            all_records += records
+            all_samples += samples
+            levels_info[int(level)] = info
+            if progress is not None:
+                progress(int(level), info)
+    config = dict(levels=[int(n) for n in levels], actions=actions, think=list(think), seed=seed,
+                  app=str(app_path), idle_rss=idle_rss, cpu_count=os.cpu_count())
+    return LoadResult(
+        pd.DataFrame(all_records, columns=["level", "session", "action", "latency", "bytes", "error"]),
+        pd.DataFrame(all_samples, columns=["level", "time", "cpu", "rss"]), levels_info, config)
+
+
+# ========== 结果与容量报告 ==========
+def _percentiles(values):
+    values = values.dropna()
+    if not len(values):
+        return {f"p{p}": np.nan for p in PERCENTILES}
+    return dict(zip((f"p{p}" for p in PERCENTILES), np.percentile(values, PERCENTILES)))
+
+
+class LoadResult:
+    """压测结果：records 为逐次重跑记录，samples 为服务进程采样，levels 为各轮汇总"""
+
+    def __init__(self, records, samples, levels, config):
+        self.records = records
+        self.samples = samples
+        self.levels = levels
+        self.config = config
+
+    def level_table(self):
+        """每个并发级别一行：延迟分位数 (s)、吞吐量、错误数、CPU 和内存"""
+        rows = []
+        for level, info in self.levels.items():
+            rec = self.records[self.records["level"] == level]
+            reruns = int(rec["latency"].notna().sum())
+            connected = info["rss_connected"]
+            cpu = info["cpu"]
+            rows.append({
+                "sessions": level,
+                "reruns": reruns,
+                "errors": int(rec["error"].notna().sum()),
+                **_percentiles(rec["latency"]),
+                "throughput": reruns / info["wall"] if info["wall"] > 0 else 0.0,
+                "kb_per_rerun": rec["bytes"].sum() / max(reruns, 1) / 1024,
+                "cpu_cores": cpu / info["wall"] if cpu is not None and info["wall"] > 0 else np.nan,
+                "cpu_ms_per_rerun": cpu / max(reruns, 1) * 1e3 if cpu is not None else np.nan,
+                "rss_peak_mb": info["rss_peak"] / MB if info["rss_peak"] else np.nan,
+                "mb_per_session": ((connected - info["rss_start"]) / MB / level
+                                   if connected and info["rss_start"] else np.nan)
+            })
+        return pd.DataFrame(rows)
+
+    def action_table(self):
+        """各操作的重跑次数和延迟分位数 (s)，所有并发级别合并"""
+        rows = []
+        for action, rec in self.records.groupby("action", sort=False):
+            rows.append({"action": ACTION_LABELS.get(action, action), "reruns": int(rec["latency"].notna().sum()),
+                         **_percentiles(rec["latency"])})
+        return pd.DataFrame(rows)
+
+    def capacity(self, target_p90=TARGET_P90, memory_limit=None):
+        """单个服务进程的容量估算 (会话数)，memory_limit 为容器内存上限 (字节)"""
+        table = self.level_table()
+        passed = table[(table["p90"] <= target_p90) & (table["errors"] == 0)]
+        latency_bound = int(passed["sessions"].max()) if len(passed) else 0
+        result = {"target_p90": target_p90, "latency_bound": latency_bound,
+                  "latency_bound_exceeded": latency_bound == int(table["sessions"].max()),
+                  "cpu_bound": None, "memory_bound": None}
+        largest = table.iloc[-1]
+        think = float(np.mean(self.config["think"]))
+        if np.isfinite(largest["cpu_ms_per_rerun"]) and np.isfinite(largest["p50"]):
+            # 每会话平均每 (思考时间 + 重跑延迟) 发起一次重跑；单进程 Python 代码受 GIL 限制约 1 个核心
+            demand = largest["cpu_ms_per_rerun"] / 1e3 / (think + largest["p50"])
+            result["cpu_bound"] = int(1.0 / demand) if demand > 0 else None
+        idle = self.config.get("idle_rss")
+        if memory_limit and idle and np.isfinite(largest["mb_per_session"]) and largest["mb_per_session"] > 0:
+            result["memory_bound"] = max(int((memory_limit - idle) / MB / largest["mb_per_session"]), 0)
+        bounds = [b for b in (latency_bound, result["cpu_bound"], result["memory_bound"]) if b is not None]
+        result["sessions"] = min(bounds) if bounds else 0
+        return result
+
+    def summary(self):
+        """用于与后续压测比较的汇总（可写为 JSON）"""
+        table = self.level_table()
+        return {"config": self.config,
+                "levels": {str(int(row["sessions"])): {k: (None if pd.isna(v) else float(v)) for k, v in row.items()}
+                           for _, row in table.iterrows()}}
+
+    def regressions(self, baseline, threshold=REGRESSION_THRESHOLD):
+        """与基线汇总比较，各并发级别 p90 延迟或每次重跑 CPU 时间超过 基线 × threshold 的条目"""
+        problems = []
+        current = self.summary()["levels"]
+        for level, base in baseline.get("levels", {}).items():
+            if level not in current:
+                continue
+            for field in ("p90", "cpu_ms_per_rerun"):
+                new, old = current[level].get(field), base.get(field)
+                if new is not None and old and new > old * threshold:
+                    problems.append(f"{level} 个会话 {field}: {new:.3f}，基线 {old:.3f} × {threshold}")
+        return problems
+
+    def report(self, target_p90=TARGET_P90, memory_limit=None, baseline=None, threshold=REGRESSION_THRESHOLD):
+        """Markdown 容量报告"""
+        config = self.config
+        capacity = self.capacity(target_p90, memory_limit)
+        levels = self.level_table()
+        lines = [
+            "# 并发会话压测报告",
+            "",
+            f"- 应用: `{config['app']}`",
+            f"- 并发级别: {', '.join(map(str, config['levels']))}；每会话 {config['actions']} 次操作，"
+            f"思考时间 {config['think'][0]:g}–{config['think'][1]:g} s",
+            f"- 主机 CPU 核心数: {config['cpu_count']}；空闲常驻内存: "
+            + (f"{config['idle_rss'] / MB:.0f} MB" if config.get("idle_rss") else "不可用"),
+            "",
+            "## 各并发级别",
+            "",
+            "| 会话数 | 重跑次数 | 错误 | p50 (s) | p90 (s) | p99 (s) | 吞吐 (次/s) | 下行 (KB/次) "
+            "| CPU 核心 | CPU (ms/次) | 峰值内存 (MB) | 内存 (MB/会话) |",
+            "|---|---|---|---|---|---|---|---|---|---|---|---|"
+        ]
+        for _, row in levels.iterrows():
+            lines.append(f"| {int(row['sessions'])} | {int(row['reruns'])} | {int(row['errors'])} | {row['p50']:.3f} "
+                         f"| {row['p90']:.3f} | {row['p99']:.3f} | {row['throughput']:.2f} | {row['kb_per_rerun']:.1f} "
+                         f"| {row['cpu_cores']:.2f} | {row['cpu_ms_per_rerun']:.1f} | {row['rss_peak_mb']:.0f} "
+                         f"| {row['mb_per_session']:.2f} |")
+        lines += ["", "## 各操作延迟", "", "| 操作 | 次数 | p50 (s) | p90 (s) | p99 (s) |", "|---|---|---|---|---|"]
+        for _, row in self.action_table().iterrows():
+            lines.append(f"| {row['action']} | {int(row['reruns'])} | {row['p50']:.3f} | {row['p90']:.3f} "
+                         f"| {row['p99']:.3f} |")
+        exceeded = "（已达测试的最大并发，实际可能更高）" if capacity["latency_bound_exceeded"] else ""
+        lines += [
+            "", "## 容量估算（单个服务进程）", "",
+            f"- 延迟: p90 ≤ {target_p90:g} s 且无错误的最大并发为 {capacity['latency_bound']} 个会话{exceeded}",
+            f"- CPU: 单进程约可支撑 {capacity['cpu_bound']} 个活跃会话" if capacity["cpu_bound"] is not None
+            else "- CPU: 无法采样进程 CPU 时间",
+            f"- 内存: {memory_limit / MB:.0f} MB 上限约可容纳 {capacity['memory_bound']} 个会话"
+            if capacity["memory_bound"] is not None else "- 内存: 未指定上限或无法采样",
+            f"- 建议每个容器（单进程）不超过 **{capacity['sessions']}** 个并发会话；"
+            "更多用户按此数量水平扩展副本"
+        ]
+        errors = self.records["error"].dropna()
+        if len(errors):
+            lines += ["", "## 错误", ""] + [f"- {e} ×{n}" for e, n in errors.value_counts().head(10).items()]
+        if baseline is not None:
+            problems = self.regressions(baseline, threshold)
+            lines += ["", "## 与基线比较", ""] + ([f"- 回退: {p}" for p in problems] or ["- 无性能回退"])
+        return "\n".join(lines) + "\n"
+
+
+def load_summary(path):
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def save_summary(result, path):
+    Path(path).write_text(json.dumps(result.summary(), ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
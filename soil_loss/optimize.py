@@ -0,0 +1,258 @@
+"""反算设计：求满足流失量目标、措施费用最低的 C、P、几何参数与堆积体选项组合
+
+决策变量取自三类扰动公式的输入（见 CONTINUOUS、CATEGORICAL），未列入 bounds/options 的输入保持现状值。
+费用按相对现状输入的改变计:
+    费用 = Σ 所在扰动类型面积 × 单价 × |x - x0|（连续变量） + Σ 面积 × 换用选项单价（分类变量）
+搜索为向量化的进化算法：每代把整个种群（population 组方案）一次代入公式计算项目总流失量和费用，
+保留费用-流失量的非支配解（Pareto 前沿），从前沿抽取父代变异产生下一代，变异步长逐代缩小。
+"""
+import numpy as np
+import pandas as pd
+
+from . import engine
+from .summary import EXCAVATION, GENERAL, PILE
+
+DEFAULT_POPULATION = 4096
+DEFAULT_GENERATIONS = 40
+MAX_FRONT = 400
+# 每代中重新随机抽样的比例，避免前沿过早收敛
+EXPLORE_FRACTION = 0.1
+SIGMA_START = 0.25
+SIGMA_END = 0.01
+COL_COST = "费用(元)"
+COL_LOSS = "总流失量(t)"
+
+# 连续决策变量: 名称 -> (扰动类型, 公式输入名, 说明, 取值上限, 单价 元/hm²/单位)
+CONTINUOUS = {
+    "C": (GENERAL, "C", "C 植被覆盖", 1.0, 60_000.0),
+    "P": (GENERAL, "P", "P 水保措施", 1.0, 80_000.0),
+    "slope_length": (GENERAL, "slope_length", "一般扰动坡长 (m)", None, 300.0),
+    "slope_angle": (GENERAL, "slope_angle", "一般扰动坡度 (°)", 90.0, 2_000.0),
+    "excavation_height": (EXCAVATION, "slope_height", "开挖面坡高 (m)", None, 5_000.0),
+    "excavation_angle": (EXCAVATION, "slope_angle", "开挖面坡度 (°)", 90.0, 3_000.0),
+    "pile_height": (PILE, "pile_height", "堆高 (m)", None, 6_000.0),
+    "pile_angle": (PILE, "pile_angle", "堆积坡度 (°)", 90.0, 4_000.0),
+    "pile_length": (PILE, "pile_length", "堆积坡长 (m)", None, 1_000.0),
+    "compaction": (PILE, "compaction", "压实度 (%)", 100.0, 500.0)
+}
+# 分类决策变量: 名称 -> (扰动类型, 系数表名, 说明, 换用其他选项的默认单价 元/hm²)
+CATEGORICAL = {
+    "shape": (PILE, "shape", "堆积体形状", 20_000.0),
+    "material": (PILE, "material", "堆积材料", 30_000.0),
+    "gradation": (PILE, "gradation", "级配", 15_000.0)
+}
+LABELS = {name: spec[2] for name, spec in {**CONTINUOUS, **CATEGORICAL}.items()}
+
+
+def default_bounds(general=None, excavation=None, pile=None, names=None):
+    """连续变量默认范围: C、P 为 [0.05, 现状值]，几何参数为 [现状值的一半, 现状值]，压实度为 [0, 100]"""
+    inputs = {GENERAL: general, EXCAVATION: excavation, PILE: pile}
+    bounds = {}
+    for name in names or CONTINUOUS:
+        kind, key, _, upper, _ = CONTINUOUS[name]
+        if not inputs[kind] or key not in inputs[kind]:
+            continue
+        value = float(inputs[kind][key])
+        if name in ("C", "P"):
+            bounds[name] = (min(0.05, value), value)
+        elif name == "compaction":
+            bounds[name] = (0.0, upper)
+        else:
+            bounds[name] = (value / 2, value)
+    return bounds
+
+
+def default_costs():
+    """各连续变量默认单价 (元/hm²/单位)"""
+    return {name: spec[4] for name, spec in CONTINUOUS.items()}
+
+
+def default_option_costs(tables=None):
+    """各分类变量每个选项的默认单价 (元/hm²)，现状选项在计费时按 0 计"""
+    tables = tables or engine.DEFAULT_TABLES
+    return {name: dict.fromkeys(tables[table], cost) for name, (_, table, _, cost) in CATEGORICAL.items()}
+
+
+class DesignProblem:
+    """项目级反算问题：现状输入、可调变量范围与单价
+
+    general/excavation/pile 同 uncertainty.simulate 的确定性输入（含 area）；
+    bounds 为 {连续变量: (下限, 上限)}，options 为 {分类变量: 可选选项列表}；
+    costs/option_costs 缺省取 default_costs/default_option_costs。
+    """
+
+    def __init__(self, general=None, excavation=None, pile=None, bounds=None, options=None, costs=None,
+                 option_costs=None, tables=None):
+        self.inputs = {GENERAL: general or {}, EXCAVATION: excavation or {}, PILE: pile or {}}
+        self.tables = tables or engine.DEFAULT_TABLES
+        self.bounds = dict(bounds or {})
+        self.options = {name: list(values) for name, values in (options or {}).items()}
+        self.costs = {**default_costs(), **(costs or {})}
+        self.option_costs = default_option_costs(self.tables)
+        for name, values in (option_costs or {}).items():
+            self.option_costs[name].update(values)
+        for name in self.bounds:
+            kind, key = CONTINUOUS[name][:2]
+            if key not in self.inputs[kind]:
+                raise ValueError(f"{LABELS[name]} 不是当前输入的参数，无法优化")
+        for name, values in self.options.items():
+            kind, table = CATEGORICAL[name][:2]
+            if not self.inputs[kind]:
+                raise ValueError(f"没有{kind}输入，无法优化{LABELS[name]}")
+            unknown = [v for v in values if v not in self.tables[table]]
+            if unknown or not values:
+                raise ValueError(f"{LABELS[name]} 的可选项无效: {', '.join(map(str, unknown)) or '空'}")
+        self.continuous = list(self.bounds)
+        self.categorical = list(self.options)
+        self.lower = np.array([self.bounds[name][0] for name in self.continuous], dtype=np.float64)
+        self.upper = np.array([self.bounds[name][1] for name in self.continuous], dtype=np.float64)
+
+    # ========== 方案编码 ==========
+    def baseline(self):
+        """现状方案: 连续变量的单位区间坐标、分类变量的选项序号（现状不在可选项中时为 -1）"""
+        x0 = np.array([self.inputs[CONTINUOUS[name][0]][CONTINUOUS[name][1]] for name in self.continuous],
+                      dtype=np.float64)
+        span = np.where(self.upper > self.lower, self.upper - self.lower, 1.0)
+        unit = np.clip((x0 - self.lower) / span, 0.0, 1.0)
+        codes = np.array([self._current_option(name) for name in self.categorical], dtype=np.int64)
+        return unit, codes
+
+    def _current_option(self, name):
+        current = self.inputs[CATEGORICAL[name][0]][CATEGORICAL[name][1]]
+        return self.options[name].index(current) if current in self.options[name] else -1
+
+    def decode(self, unit, codes):
+        """单位区间坐标 (N×d) 与选项序号 (N×m) -> {变量: 取值数组}"""
+        values = {name: self.lower[i] + unit[:, i] * (self.upper[i] - self.lower[i])
+                  for i, name in enumerate(self.continuous)}
+        for j, name in enumerate(self.categorical):
+            values[name] = np.asarray(self.options[name], dtype=object)[codes[:, j]]
+        return values
+
+    def current_loss(self):
+        """现状输入的项目总流失量 (t)"""
+        current = DesignProblem(*self.inputs.values(), tables=self.tables)
+        return float(current.evaluate(np.zeros((1, 0)), np.zeros((1, 0), dtype=np.int64))[0][0])
+
+    # ========== 目标函数 ==========
+    def evaluate(self, unit, codes):
+        """整组方案的 (项目总流失量 t, 措施费用 元)"""
+        n = len(unit)
+        values = self.decode(unit, codes)
+        params = {kind: dict(inputs) for kind, inputs in self.inputs.items()}
+        for name, value in values.items():
+            kind, key = (CONTINUOUS.get(name) or CATEGORICAL[name])[:2]
+            params[kind][key] = value
+
+        loss = np.zeros(n)
+        g, e, p = params[GENERAL], params[EXCAVATION], params[PILE]
+        if g:
+            LS = g["LS"] if "LS" in g else engine.ls_factor(g["slope_length"], g["slope_angle"])
+            loss += engine.general_unit_loss(g["R"], g["K"], LS, g["C"], g["P"], g["T"]) * g["area"]
+        if e:
+            loss += engine.excavation_loss(e["R"], e["soil_type"], e["saturation"], e["slope_height"],
+                                           e["slope_angle"], e["area"], self.tables)[1]
+        if p:
+            loss += engine.pile_loss(p["R"], p["pile_height"], p["pile_angle"], p["pile_length"], p["shape"],
+                                     p["material"], p["gradation"], p["contains_clay"], p["compaction"],
+                                     p["area"], self.tables)[3]
+
+        cost = np.zeros(n)
+        for name in self.continuous:
+            kind, key = CONTINUOUS[name][:2]
+            inputs = self.inputs[kind]
+            cost += inputs["area"] * self.costs[name] * np.abs(values[name] - inputs[key])
+        for j, name in enumerate(self.categorical):
+            kind, key = CATEGORICAL[name][:2]
+            prices = np.array([0.0 if option == self.inputs[kind][key] else self.option_costs[name][option]
+                               for option in self.options[name]])
+            cost += self.inputs[kind]["area"] * prices[codes[:, j]]
+        return loss, cost
+
+    def table(self, unit, codes, loss, cost):
+        """方案表: 费用、总流失量及各变量取值，按费用升序"""
+        values = self.decode(unit, codes)
+        frame = pd.DataFrame({COL_COST: cost, COL_LOSS: loss,
+                              **{LABELS[name]: value for name, value in values.items()}})
+        return frame.sort_values(COL_COST, ignore_index=True)
+
+
+# ========== 搜索 ==========
+def pareto_mask(loss, cost):
+    """费用-流失量非支配解（两目标均越小越好）的布尔掩码"""
+    order = np.lexsort((loss, cost))
+    sorted_loss = loss[order]
+    best = np.minimum.accumulate(sorted_loss)
+    keep = np.empty(len(order), dtype=bool)
+    keep[order] = np.r_[True, sorted_loss[1:] < best[:-1]]
+    return keep
+
+
+def _thin(index, cost, size):
+    """前沿过大时沿费用方向等间隔保留 size 个解（含两端）"""
+    if len(index) <= size:
+        return index
+    order = index[np.argsort(cost[index], kind="stable")]
+    return order[np.linspace(0, len(order) - 1, size).round().astype(np.int64)]
+
+
+class OptimizationResult:
+    """搜索结果：Pareto 前沿方案表、累计计算方案数及现状总流失量"""
+
+    def __init__(self, front, evaluations, baseline_loss, target=None):
+        self.front = front
+        self.evaluations = evaluations
+        self.baseline_loss = baseline_loss
+        self.target = target
+
+    def cheapest(self, target=None):
+        """总流失量不超过 target 的最低费用方案（pd.Series）；无可行方案时返回 None"""
+        target = self.target if target is None else target
+        feasible = self.front[self.front[COL_LOSS] <= target]
+        return feasible.iloc[0] if len(feasible) else None
+
+
+def optimize(problem, target=None, population=DEFAULT_POPULATION, generations=DEFAULT_GENERATIONS, seed=None):
+    """进化搜索费用-流失量 Pareto 前沿，返回 OptimizationResult
+
+    第 0 代为现状方案加随机方案；之后每代从前沿均匀抽取父代，连续变量加高斯扰动，
+    分类变量按概率换用随机选项，另有 EXPLORE_FRACTION 的全新随机方案。
+    共计算 population × (generations + 1) 组方案。
+    """
+    rng = np.random.default_rng(seed)
+    d, m = len(problem.continuous), len(problem.categorical)
+    n_options = np.array([len(problem.options[name]) for name in problem.categorical], dtype=np.int64)
+
+    def random(size):
+        return rng.random((size, d)), (rng.random((size, m)) * n_options).astype(np.int64)
+
+    base_unit, base_codes = problem.baseline()
+    base_loss = problem.current_loss()
+    unit, codes = random(population)
+    unit[0] = base_unit
+    codes[0] = np.where(base_codes >= 0, base_codes, codes[0])
+    loss, cost = problem.evaluate(unit, codes)
+    evaluations = population
+
+    for generation in range(generations):
+        front = _thin(np.flatnonzero(pareto_mask(loss, cost)), cost, MAX_FRONT)
+        unit, codes, loss, cost = unit[front], codes[front], loss[front], cost[front]
+        sigma = SIGMA_START * (SIGMA_END / SIGMA_START) ** (generation / max(generations - 1, 1))
+        parents = rng.integers(0, len(front), population)
+        child_unit = np.clip(unit[parents] + rng.normal(0.0, sigma, (population, d)), 0.0, 1.0)
+        child_codes = codes[parents].copy()
+        if m:
+            mutate = rng.random((population, m)) < max(sigma, 0.05)
+            child_codes[mutate] = (rng.random((population, m)) * n_options).astype(np.int64)[mutate]
+        explore = int(population * EXPLORE_FRACTION)
+        child_unit[:explore], child_codes[:explore] = random(explore)
+        child_loss, child_cost = problem.evaluate(child_unit, child_codes)
+        evaluations += population
+        unit = np.concatenate([unit, child_unit])
+        codes = np.concatenate([codes, child_codes])
+        loss = np.concatenate([loss, child_loss])
+        cost = np.concatenate([cost, child_cost])
+
+    front = np.flatnonzero(pareto_mask(loss, cost))
+    table = problem.table(unit[front], codes[front], loss[front], cost[front])
+    return OptimizationResult(table, evaluations, base_loss, target)
@@ -0,0 +1,190 @@
+"""多进程并行测算
+
+单元参数按字段编码为 float64 矩阵（行=字段，列=单元）放入共享内存，
+工作进程只接收共享内存名称和列区间，直接在原地读参数、写结果，
+返回各 (项目, 扰动类型) 的面积与流失量小计，由主进程合并为 BatchTotals。
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from . import engine
+from .batch import (CATEGORY_TABLES, COLUMN_DEFAULTS, DEFAULT_CHUNK_SIZE, NUMERIC_COLUMNS,
+                    RESULT_COLUMNS, TYPE_TABLE, BatchTotals, ChunkWriter, iter_chunks,
+                    prepare_chunk, unit_losses)
+from .summary import DISTURBANCE_TYPES
+
+FIELDS = ["project", "disturbance_type", *NUMERIC_COLUMNS, *CATEGORY_TABLES, "contains_clay"]
+OUTPUT_FIELDS = ["LS", "unit_loss"]
+ROWS = {name: i for i, name in enumerate(FIELDS + OUTPUT_FIELDS)}
+N_TYPES = len(DISTURBANCE_TYPES)
+
+
+def resolve_workers(workers=None):
+    """workers 为空或 0 时使用全部 CPU 核心"""
+    return workers if workers else (os.cpu_count() or 1)
+
+
+class SharedBlock:
+    """共享内存中的单元参数矩阵，末两行存放 LS 与单位面积流失量"""
+
+    def __init__(self, n_units, name=None):
+        shape = (len(ROWS), n_units)
+        nbytes = max(int(np.prod(shape)) * 8, 1)
+        self.owner = name is None
+        self.shm = SharedMemory(create=True, size=nbytes) if self.owner else SharedMemory(name=name)
+        self.array = np.ndarray(shape, dtype=np.float64, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def row(self, field):
+        return self.array[ROWS[field]]
+
+    def close(self):
+        del self.array
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _compute_view(view, tables):
+    columns = {name: view[ROWS[name]] for name in FIELDS}
+    for name in CATEGORY_TABLES:
+        columns[name] = columns[name].astype(np.int64)
+    kind = columns["disturbance_type"].astype(np.int64)
+    ls, unit = unit_losses(columns, kind, tables)
+    view[ROWS["LS"]] = ls
+    view[ROWS["unit_loss"]] = unit
+    keys, inverse = np.unique(columns["project"].astype(np.int64) * N_TYPES + kind, return_inverse=True)
+    area = columns["area"]
+    return keys, np.bincount(inverse, weights=area), np.bincount(inverse, weights=unit * area)
+
+
+def _compute_slice(shm_name, n_units, start, stop, tables=None):
+    """工作进程：计算共享矩阵 [start, stop) 列，返回分组小计"""
+    block = SharedBlock(n_units, name=shm_name)
+    try:
+        keys, areas, losses = _compute_view(block.array[:, start:stop], tables)
+    finally:
+        block.close()
+    return keys, areas, losses, stop - start
+
+
+class _ProjectCodes:
+    def __init__(self):
+        self.codes = {}
+        self.names = []
+
+    def encode(self, projects):
+        codes, uniques = pd.factorize(np.asarray(projects))
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, project in enumerate(uniques):
+            if project not in self.codes:
+                self.codes[project] = len(self.names)
+                self.names.append(project)
+            mapping[i] = self.codes[project]
+        return mapping[codes]
+
+    def decode(self, keys):
+        return [(self.names[key // N_TYPES], DISTURBANCE_TYPES[key % N_TYPES]) for key in keys.tolist()]
+
+
+def _fill(block, columns, projects, tables):
+    tables = tables or engine.DEFAULT_TABLES
+    block.row("project")[:] = projects.encode(columns["project"])
+    block.row("disturbance_type")[:] = engine.encode(TYPE_TABLE, columns["disturbance_type"])
+    for name in NUMERIC_COLUMNS:
+        block.row(name)[:] = columns[name]
+    for name, table in CATEGORY_TABLES.items():
+        block.row(name)[:] = engine.encode(tables[table], columns[name])
+    block.row("contains_clay")[:] = np.asarray(columns["contains_clay"], dtype=bool)
+
+
+def run_batch_parallel(input_path, output_path=None, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                       summary_path=None, tables=None):
+    """与 run_batch 相同的批量测算，按数据块分发到进程池
+
+    同时在途的数据块不超过 2×workers，内存占用与输入行数无关；结果按输入顺序写出。
+    """
+    workers = resolve_workers(workers)
+    totals = BatchTotals()
+    projects = _ProjectCodes()
+    writer = ChunkWriter(output_path) if output_path else None
+    inflight = deque()
+
+    def finish(future, block, chunk):
+        try:
+            keys, areas, losses, units = future.result()
+            if writer is not None:
+                writer.write(pd.DataFrame({
+                    "project": chunk["project"].to_numpy(),
+                    "disturbance_type": chunk["disturbance_type"].to_numpy(),
+                    "area": block.row("area").copy(),
+                    "LS": block.row("LS").copy(),
+                    "unit_loss": block.row("unit_loss").copy(),
+                    "total_loss": block.row("unit_loss") * block.row("area")
+                })[RESULT_COLUMNS])
+            totals.add_grouped(projects.decode(keys), areas, losses, units)
+        finally:
+            block.close()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in iter_chunks(input_path, chunk_size):
+                chunk = prepare_chunk(chunk)
+                block = SharedBlock(len(chunk))
+                try:
+                    _fill(block, {name: chunk[name].to_numpy() for name in COLUMN_DEFAULTS}, projects, tables)
+                    future = pool.submit(_compute_slice, block.name, len(chunk), 0, len(chunk), tables)
+                except BaseException:
+                    block.close()
+                    raise
+                inflight.append((future, block, chunk))
+                if len(inflight) >= 2 * workers:
+                    finish(*inflight.popleft())
+            while inflight:
+                finish(*inflight.popleft())
+    finally:
+        for future, block, _ in inflight:
+            future.cancel()
+            block.close()
+        if writer is not None:
+            writer.close()
+    if summary_path:
+        totals.project_table().to_csv(summary_path, index=False)
+    return totals
+
+
+def compute_arrays(columns, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, tables=None):
+    """对内存中的参数数组（如参数扫描）并行计算
+
+    columns 为列名到数组或标量的映射，缺少的列取 COLUMN_DEFAULTS，分类列可为名称或编码。
+    参数只写入共享内存一次，各进程按 chunk_size 列区间计算。
+    返回 (LS, 单位面积流失量, BatchTotals)。
+    """
+    workers = resolve_workers(workers)
+    n = max(int(np.size(value)) for value in columns.values())
+    merged = {}
+    for name, default in COLUMN_DEFAULTS.items():
+        value = columns.get(name, default)
+        merged[name] = np.broadcast_to(np.asarray(value), (n,))
+    totals = BatchTotals()
+    projects = _ProjectCodes()
+    block = SharedBlock(n)
+    try:
+        _fill(block, merged, projects, tables)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_compute_slice, block.name, n, start, min(start + chunk_size, n), tables)
+                       for start in range(0, n, chunk_size)]
+            for future in futures:
+                keys, areas, losses, units = future.result()
+                totals.add_grouped(projects.decode(keys), areas, losses, units)
+        return block.row("LS").copy(), block.row("unit_loss").copy(), totals
+    finally:
+        block.close()
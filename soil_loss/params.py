@@ -0,0 +1,384 @@
+"""参数库：按标准版本管理的 R、K 因子及分类系数（SQLite）
+
+表结构:
+    revision     标准版本（如 SL 773-2018），可复制出新版本后修改
+    r_factor     R 因子：地区/县级/站点，含代码、名称、经纬度、典型值、范围、逐月分配比例
+    k_factor     K 因子：土壤类型及细分土类
+    coefficient  开挖面 k、饱和度、堆积体形状/材料/级配等分类系数
+    reference    参数查询手册中的 C、P 等分级参考表
+
+按版本 + 代码、名称、经纬度建立索引。查询结果在进程内缓存，写入后清空。
+库为空或缺少默认版本时由 engine 中的内置参数表初始化。
+"""
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from . import engine
+
+DEFAULT_REVISION = "SL 773-2018"
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".soil_loss", "params.sqlite")
+PATH_ENV = "SOIL_LOSS_PARAMS_DB"
+NEAREST_CHUNK = 4096
+EARTH_RADIUS_KM = 6371.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS revision (
+    name TEXT PRIMARY KEY,
+    note TEXT,
+    created TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS r_factor (
+    revision TEXT NOT NULL,
+    code TEXT NOT NULL,
+    name TEXT NOT NULL,
+    level TEXT NOT NULL,
+    parent TEXT,
+    lon REAL,
+    lat REAL,
+    value REAL NOT NULL,
+    min REAL,
+    max REAL,
+    season TEXT,
+    monthly TEXT,
+    PRIMARY KEY (revision, code)
+);
+CREATE INDEX IF NOT EXISTS r_factor_name ON r_factor (revision, name);
+CREATE INDEX IF NOT EXISTS r_factor_coord ON r_factor (revision, lat, lon);
+CREATE TABLE IF NOT EXISTS k_factor (
+    revision TEXT NOT NULL,
+    code TEXT NOT NULL,
+    name TEXT NOT NULL,
+    parent TEXT,
+    value REAL NOT NULL,
+    min REAL,
+    max REAL,
+    sensitivity TEXT,
+    PRIMARY KEY (revision, code)
+);
+CREATE INDEX IF NOT EXISTS k_factor_name ON k_factor (revision, name);
+CREATE TABLE IF NOT EXISTS coefficient (
+    revision TEXT NOT NULL,
+    category TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value REAL NOT NULL,
+    note TEXT,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (revision, category, name)
+);
+CREATE TABLE IF NOT EXISTS reference (
+    revision TEXT NOT NULL,
+    factor TEXT NOT NULL,
+    label TEXT NOT NULL,
+    value_range TEXT,
+    note TEXT,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (revision, factor, label)
+);
+"""
+
+# ========== 内置参数（初始化默认版本） ==========
+# 地区代码、代表站点经纬度及适用季节
+REGION_INFO = {
+    "华北地区": ("NC", 116.40, 39.90, "夏季集中"),
+    "东北地区": ("NE", 125.32, 43.90, "夏季为主"),
+    "华东地区": ("EC", 121.47, 31.23, "春夏为主"),
+    "华中地区": ("CC", 114.31, 30.59, "夏季集中"),
+    "华南地区": ("SC", 113.26, 23.13, "全年，夏季为主"),
+    "西南地区": ("SW", 104.07, 30.67, "夏季为主"),
+    "西北地区": ("NW", 108.94, 34.34, "夏季短暂")
+}
+K_SENSITIVITY = {
+    "砂土": "低",
+    "砂壤土": "较低",
+    "轻壤土": "中等",
+    "中壤土": "较高",
+    "重壤土": "高",
+    "黏土": "很高"
+}
+REFERENCE_ROWS = [
+    ("C", ">90%", "0.001-0.01", "茂密森林、成熟草地"),
+    ("C", "70-90%", "0.01-0.05", "一般林地、灌木丛"),
+    ("C", "50-70%", "0.05-0.10", "稀疏林地、中度草地"),
+    ("C", "30-50%", "0.10-0.20", "退化草地、幼林"),
+    ("C", "10-30%", "0.20-0.40", "严重退化草地"),
+    ("C", "<10%", "0.40-1.00", "裸地、施工区"),
+    ("P", "无措施", "1.0", ""),
+    ("P", "简易措施", "0.7-0.9", ""),
+    ("P", "工程措施", "0.3-0.7", ""),
+    ("P", "综合措施", "0.1-0.3", "")
+]
+COEFFICIENT_TABLES = {
+    "excavation_k": engine.EXCAVATION_K,
+    "saturation": engine.SATURATION_FACTORS,
+    "shape": engine.SHAPE_FACTORS,
+    "material": engine.MATERIAL_FACTORS,
+    "gradation": engine.GRADATION_FACTORS
+}
+
+R_COLUMNS = ["code", "name", "level", "parent", "lon", "lat", "value", "min", "max", "season", "monthly"]
+K_COLUMNS = ["code", "name", "parent", "value", "min", "max", "sensitivity"]
+
+
+def _builtin_rows(revision):
+    r_rows = []
+    for name, value in engine.R_FACTOR_DB.items():
+        code, lon, lat, season = REGION_INFO[name]
+        lo, hi = engine.R_FACTOR_RANGES[name]
+        r_rows.append((revision, code, name, "region", None, lon, lat, value, lo, hi, season,
+                       json.dumps(engine.R_MONTHLY_SHARES[name])))
+    k_rows = []
+    for i, (name, value) in enumerate(engine.K_FACTOR_DB.items()):
+        lo, hi = engine.K_FACTOR_RANGES[name]
+        k_rows.append((revision, f"K{i + 1:02d}", name, None, value, lo, hi, K_SENSITIVITY[name]))
+    c_rows = []
+    for category, table in COEFFICIENT_TABLES.items():
+        for seq, (name, value) in enumerate(table.items()):
+            note = engine.EXCAVATION_POROSITY.get(name) if category == "excavation_k" else None
+            c_rows.append((revision, category, name, value, note, seq))
+    ref_rows = [(revision, *row, seq) for seq, row in enumerate(REFERENCE_ROWS)]
+    return r_rows, k_rows, c_rows, ref_rows
+
+
+class ParameterStore:
+    """参数库，可在多线程间共享（内部加锁）
+
+    path 缺省取环境变量 SOIL_LOSS_PARAMS_DB，否则为 ~/.soil_loss/params.sqlite；
+    path=":memory:" 时为仅在进程内有效的临时库。
+    """
+
+    def __init__(self, path=None, revision=DEFAULT_REVISION):
+        path = path or os.environ.get(PATH_ENV) or DEFAULT_PATH
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.revision = revision
+        self._lock = threading.RLock()
+        self._cache = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+        if DEFAULT_REVISION not in self.revisions():
+            self.seed(DEFAULT_REVISION)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---------- 读写基础 ----------
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _write(self, statements):
+        """statements: [(sql, rows)]，在一个事务中执行并清空缓存"""
+        with self._lock, self._conn:
+            for sql, rows in statements:
+                self._conn.executemany(sql, rows)
+            self._cache.clear()
+
+    def _cached(self, key, loader):
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = loader()
+            return self._cache[key]
+
+    def _rev(self, revision):
+        return revision or self.revision
+
+    # ---------- 版本 ----------
+    def revisions(self):
+        return [row[0] for row in self._query("SELECT name FROM revision ORDER BY created, rowid")]
+
+    def seed(self, revision=DEFAULT_REVISION, note="内置参数"):
+        """以 engine 中的内置参数表初始化一个版本"""
+        r_rows, k_rows, c_rows, ref_rows = _builtin_rows(revision)
+        self._write([
+            ("INSERT OR REPLACE INTO revision (name, note) VALUES (?, ?)", [(revision, note)]),
+            ("INSERT OR REPLACE INTO r_factor VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", r_rows),
+            ("INSERT OR REPLACE INTO k_factor VALUES (?, ?, ?, ?, ?, ?, ?, ?)", k_rows),
+            ("INSERT OR REPLACE INTO coefficient VALUES (?, ?, ?, ?, ?, ?)", c_rows),
+            ("INSERT OR REPLACE INTO reference VALUES (?, ?, ?, ?, ?, ?)", ref_rows)
+        ])
+
+    def copy_revision(self, source, target, note=None):
+        """复制整个版本，用于在新标准版本中修订部分参数"""
+        if target in self.revisions():
+            raise ValueError(f"版本已存在: {target}")
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO revision (name, note) VALUES (?, ?)", (target, note))
+            for table in ("r_factor", "k_factor", "coefficient", "reference"):
+                columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+                others = ", ".join(columns[1:])
+                self._conn.execute(f"INSERT INTO {table} (revision, {others}) "
+                                   f"SELECT ?, {others} FROM {table} WHERE revision = ?", (target, source))
+            self._cache.clear()
+
+    # ---------- R 因子 ----------
+    def r_factors(self, revision=None, level=None):
+        """R 因子表 DataFrame，level 为 region/county/station 之一时只取该级"""
+        revision = self._rev(revision)
+
+        def load():
+            with self._lock:
+                frame = pd.read_sql_query(
+                    f"SELECT {', '.join(R_COLUMNS)} FROM r_factor WHERE revision = ? ORDER BY rowid",
+                    self._conn, params=(revision,))
+            return frame
+
+        frame = self._cached(("r", revision), load)
+        return frame if level is None else frame[frame["level"] == level].reset_index(drop=True)
+
+    def r_value(self, name_or_code, revision=None, default=None):
+        """按名称或代码查 R 典型值"""
+        frame = self.r_factors(revision)
+        hit = frame[(frame["code"] == name_or_code) | (frame["name"] == name_or_code)]
+        return float(hit["value"].iloc[0]) if len(hit) else default
+
+    def r_ranges(self, revision=None):
+        frame = self.r_factors(revision)
+        return {name: (lo, hi) for name, lo, hi in zip(frame["name"], frame["min"], frame["max"])}
+
+    def monthly_shares(self, revision=None):
+        """{名称: 12 个月 R 分配比例}，只含有逐月数据的条目"""
+        frame = self.r_factors(revision)
+        return {name: json.loads(monthly) for name, monthly in zip(frame["name"], frame["monthly"]) if monthly}
+
+    def _stations(self, revision, level):
+        def load():
+            frame = self.r_factors(revision, level).dropna(subset=["lon", "lat"])
+            lat = np.radians(frame["lat"].to_numpy(dtype=np.float64))
+            lon = np.radians(frame["lon"].to_numpy(dtype=np.float64))
+            xyz = np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+            return frame["code"].to_numpy(), frame["value"].to_numpy(dtype=np.float64), xyz
+
+        return self._cached(("stations", self._rev(revision), level), load)
+
+    def nearest_r(self, lon, lat, revision=None, level=None):
+        """按经纬度查最近的 R 站点/县，返回 (代码, R 值, 距离 km)
+
+        lon/lat 可为标量或数组；数组按 NEAREST_CHUNK 分块计算，内存与站点数×分块大小成正比。
+        """
+        codes, values, xyz = self._stations(revision, level)
+        if len(codes) == 0:
+            raise LookupError("参数库中没有带坐标的 R 因子记录")
+        scalar = np.ndim(lon) == 0 and np.ndim(lat) == 0
+        lon, lat = np.broadcast_arrays(np.radians(np.atleast_1d(lon).astype(np.float64)),
+                                       np.radians(np.atleast_1d(lat).astype(np.float64)))
+        index = np.empty(lon.shape, dtype=np.int64)
+        chord = np.empty(lon.shape)
+        for start in range(0, len(lon), NEAREST_CHUNK):
+            part = slice(start, start + NEAREST_CHUNK)
+            q = np.column_stack([np.cos(lat[part]) * np.cos(lon[part]),
+                                 np.cos(lat[part]) * np.sin(lon[part]), np.sin(lat[part])])
+            # 单位球面上点积最大即大圆距离最小
+            dots = q @ xyz.T
+            index[part] = np.argmax(dots, axis=1)
+            chord[part] = dots[np.arange(len(q)), index[part]]
+        distance = EARTH_RADIUS_KM * np.arccos(np.clip(chord, -1.0, 1.0))
+        if scalar:
+            return codes[index[0]], float(values[index[0]]), float(distance[0])
+        return codes[index], values[index], distance
+
+    def import_r(self, frame, revision=None, level="station"):
+        """导入县级/站点 R 因子表，列: code, name, lon, lat, value，可选 parent, min, max, season, monthly"""
+        revision = self._rev(revision)
+        frame = frame.copy()
+        for column in R_COLUMNS:
+            if column not in frame.columns:
+                frame[column] = level if column == "level" else None
+        frame["monthly"] = [m if m is None or isinstance(m, str) else json.dumps(list(m))
+                            for m in frame["monthly"]]
+        rows = [(revision, *row) for row in frame[R_COLUMNS].astype(object).where(frame[R_COLUMNS].notna(), None)
+                .itertuples(index=False, name=None)]
+        self._write([("INSERT OR REPLACE INTO r_factor VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)])
+        return len(rows)
+
+    # ---------- K 因子 ----------
+    def k_factors(self, revision=None):
+        revision = self._rev(revision)
+
+        def load():
+            with self._lock:
+                return pd.read_sql_query(
+                    f"SELECT {', '.join(K_COLUMNS)} FROM k_factor WHERE revision = ? ORDER BY rowid",
+                    self._conn, params=(revision,))
+
+        return self._cached(("k", revision), load)
+
+    def k_value(self, name_or_code, revision=None, default=None):
+        frame = self.k_factors(revision)
+        hit = frame[(frame["code"] == name_or_code) | (frame["name"] == name_or_code)]
+        return float(hit["value"].iloc[0]) if len(hit) else default
+
+    def k_ranges(self, revision=None):
+        frame = self.k_factors(revision)
+        return {name: (lo, hi) for name, lo, hi in zip(frame["name"], frame["min"], frame["max"])}
+
+    def import_k(self, frame, revision=None):
+        """导入细分土类 K 因子表，列: code, name, value，可选 parent, min, max, sensitivity"""
+        revision = self._rev(revision)
+        frame = frame.copy()
+        for column in K_COLUMNS:
+            if column not in frame.columns:
+                frame[column] = None
+        rows = [(revision, *row) for row in frame[K_COLUMNS].astype(object).where(frame[K_COLUMNS].notna(), None)
+                .itertuples(index=False, name=None)]
+        self._write([("INSERT OR REPLACE INTO k_factor VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)])
+        return len(rows)
+
+    # ---------- 分类系数 ----------
+    def coefficients(self, revision=None):
+        revision = self._rev(revision)
+
+        def load():
+            with self._lock:
+                return pd.read_sql_query(
+                    "SELECT category, name, value, note FROM coefficient WHERE revision = ? "
+                    "ORDER BY category, seq", self._conn, params=(revision,))
+
+        return self._cached(("coefficient", revision), load)
+
+    def tables(self, revision=None):
+        """与 engine.DEFAULT_TABLES 结构相同的分类系数表 {类别: {名称: 系数}}"""
+        revision = self._rev(revision)
+
+        def load():
+            frame = self.coefficients(revision)
+            tables = {category: {} for category in COEFFICIENT_TABLES}
+            for category, name, value in zip(frame["category"], frame["name"], frame["value"]):
+                tables.setdefault(category, {})[name] = float(value)
+            return tables
+
+        return self._cached(("tables", revision), load)
+
+    def notes(self, category, revision=None):
+        """分类系数备注 {名称: 备注}（如开挖面土体孔隙度）"""
+        frame = self.coefficients(revision)
+        frame = frame[frame["category"] == category]
+        return dict(zip(frame["name"], frame["note"]))
+
+    def set_coefficient(self, category, name, value, revision=None, note=None):
+        revision = self._rev(revision)
+        seq = self._query("SELECT COALESCE(MAX(seq) + 1, 0) FROM coefficient WHERE revision = ? AND category = ?",
+                          (revision, category))[0][0]
+        self._write([("INSERT INTO coefficient VALUES (?, ?, ?, ?, ?, ?) "
+                      "ON CONFLICT (revision, category, name) DO UPDATE SET value = excluded.value, "
+                      "note = COALESCE(excluded.note, note)",
+                      [(revision, category, name, value, note, seq)])])
+
+    # ---------- 参考表 ----------
+    def reference(self, factor, revision=None):
+        revision = self._rev(revision)
+
+        def load():
+            with self._lock:
+                return pd.read_sql_query(
+                    "SELECT label, value_range, note FROM reference WHERE revision = ? AND factor = ? ORDER BY seq",
+                    self._conn, params=(revision, factor))
+
+        return self._cached(("reference", revision, factor), load)
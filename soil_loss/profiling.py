@@ -0,0 +1,256 @@
+"""页面运行诊断：分段计时、单次重跑采样分析、内存计数，导出 JSON / Prometheus 文本
+
+每次脚本重跑创建一个 RerunProfile，用 span() 包住各标签页的计算与渲染段；
+未启用时 span() 返回共享的空上下文，几乎没有开销。结果累计到进程级 ProfileHistory。
+"""
+import contextlib
+import cProfile
+import importlib.util
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+HISTORY = 500
+PROFILE_ENV = "SOIL_LOSS_PROFILE"
+METRIC_PREFIX = "soil_loss_app"
+SPAN_KINDS = ("section", "compute", "render")
+PROFILERS = ("cProfile", "pyinstrument")
+QUANTILES = (0.5, 0.9, 0.99)
+PSTATS_LINES = 40
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def enabled_by_env():
+    return os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+def available_profilers():
+    """本机可用的采样分析器（pyinstrument 为可选依赖）"""
+    return [name for name in PROFILERS
+            if name == "cProfile" or importlib.util.find_spec(name.lower()) is not None]
+
+
+def process_rss(pid=None):
+    """进程常驻内存 (字节)，pid 缺省为当前进程；无法获取时返回 None"""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if pid is not None and pid != os.getpid():
+        return None
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss 为峰值常驻内存，Linux 单位 KB，macOS 单位字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# ========== 单次重跑 ==========
+class _Span:
+    __slots__ = ("profile", "name", "kind", "start", "memory")
+
+    def __init__(self, profile, name, kind):
+        self.profile = profile
+        self.name = name
+        self.kind = kind
+
+    def __enter__(self):
+        profile = self.profile
+        profile._stack.append(self.name)
+        self.memory = tracemalloc.get_traced_memory()[0] if profile.memory else None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        profile = self.profile
+        path = "/".join(profile._stack)
+        profile._stack.pop()
+        allocated = tracemalloc.get_traced_memory()[0] - self.memory if self.memory is not None else None
+        profile.spans.append({"name": path, "kind": self.kind, "depth": len(profile._stack),
+                              "offset": self.start - profile.start, "seconds": seconds,
+                              "allocated": allocated})
+        return False
+
+
+class RerunProfile:
+    """一次脚本重跑的分段耗时记录
+
+    memory 为 True 时用 tracemalloc 统计各段净分配和本次重跑峰值（会使脚本变慢约 2~3 倍）；
+    capture 为 "cProfile" 或 "pyinstrument" 时对本次重跑做函数级采样。
+    """
+
+    def __init__(self, enabled=True, memory=False, capture=None):
+        self.enabled = enabled
+        self.memory = enabled and memory
+        self.capture = capture if enabled else None
+        self.spans = []
+        self._stack = []
+        self._profiler = None
+        self.started_at = time.time()
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        if self.capture == "cProfile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.capture == "pyinstrument":
+            from pyinstrument import Profiler
+            self._profiler = Profiler()
+            self._profiler.start()
+        self.start = time.perf_counter()
+
+    def span(self, name, kind="section"):
+        """计时段；kind 为 section（整段，含控件布局）、compute（计算）或 render（图表/表格序列化）"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, kind)
+
+    def finish(self):
+        """结束计时，返回本次重跑记录（dict）；未启用时返回 None"""
+        if not self.enabled:
+            return None
+        seconds = time.perf_counter() - self.start
+        report = None
+        if self.capture == "cProfile":
+            self._profiler.disable()
+            stream = io.StringIO()
+            pstats.Stats(self._profiler, stream=stream).sort_stats("cumulative").print_stats(PSTATS_LINES)
+            report = stream.getvalue()
+        elif self.capture == "pyinstrument":
+            self._profiler.stop()
+            report = self._profiler.output_text(unicode=True, color=False)
+        record = {
+            "started_at": self.started_at,
+            "seconds": seconds,
+            "spans": self.spans,
+            "rss_bytes": process_rss(),
+            "traced_peak_bytes": tracemalloc.get_traced_memory()[1] if self.memory else None,
+            "profiler": self.capture,
+            "profile_report": report
+        }
+        return record
+
+
+def span_table(record):
+    """重跑记录的分段表：总耗时、扣除子段后的自身耗时（控件布局等）及占比"""
+    rows = []
+    for span in record["spans"]:
+        prefix = span["name"] + "/"
+        children = sum(s["seconds"] for s in record["spans"]
+                       if s["depth"] == span["depth"] + 1 and s["name"].startswith(prefix))
+        rows.append({
+            "分段": span["name"],
+            "类型": span["kind"],
+            "开始(ms)": span["offset"] * 1000,
+            "耗时(ms)": span["seconds"] * 1000,
+            "自身(ms)": (span["seconds"] - children) * 1000,
+            "占比(%)": span["seconds"] / record["seconds"] * 100 if record["seconds"] else 0.0,
+            "净分配(KB)": span["allocated"] / 1024 if span["allocated"] is not None else None
+        })
+    # 子段在父段之前结束，按开始时间排序使父段在前
+    order = np.argsort([span["offset"] for span in record["spans"]], kind="stable")
+    return pd.DataFrame([rows[i] for i in order],
+                        columns=["分段", "类型", "开始(ms)", "耗时(ms)", "自身(ms)", "占比(%)", "净分配(KB)"])
+
+
+# ========== 进程级历史 ==========
+class ProfileHistory:
+    """最近 maxlen 次重跑记录及按分段的累计耗时（跨会话共享，线程安全）"""
+
+    def __init__(self, maxlen=HISTORY):
+        self.lock = threading.Lock()
+        self.records = deque(maxlen=maxlen)
+        self.reruns = 0
+        self.rerun_seconds = 0.0
+        self.span_totals = {}
+
+    def add(self, record):
+        if record is None:
+            return
+        with self.lock:
+            # 采样报告只保留在会话中，不进入历史
+            self.records.append({k: v for k, v in record.items() if k != "profile_report"})
+            self.reruns += 1
+            self.rerun_seconds += record["seconds"]
+            for span in record["spans"]:
+                totals = self.span_totals.setdefault((span["name"], span["kind"]), [0, 0.0])
+                totals[0] += 1
+                totals[1] += span["seconds"]
+
+    def clear(self):
+        with self.lock:
+            self.records.clear()
+            self.reruns = 0
+            self.rerun_seconds = 0.0
+            self.span_totals.clear()
+
+    def latency(self):
+        """最近各次重跑的时间与耗时表"""
+        with self.lock:
+            records = list(self.records)
+        return pd.DataFrame({
+            "时间": pd.to_datetime([r["started_at"] for r in records], unit="s"),
+            "耗时(ms)": [r["seconds"] * 1000 for r in records],
+            "常驻内存(MB)": [r["rss_bytes"] / 2 ** 20 if r["rss_bytes"] else None for r in records]
+        })
+
+    def to_json(self, indent=None):
+        with self.lock:
+            payload = {
+                "reruns": self.reruns,
+                "rerun_seconds_total": self.rerun_seconds,
+                "spans": [{"name": name, "kind": kind, "count": count, "seconds_total": seconds}
+                          for (name, kind), (count, seconds) in sorted(self.span_totals.items())],
+                "recent": list(self.records)
+            }
+        return json.dumps(payload, ensure_ascii=False, indent=indent)
+
+    def to_prometheus(self):
+        """Prometheus 文本格式：重跑耗时 summary（最近窗口分位数）、各分段累计耗时、内存"""
+        with self.lock:
+            latency = np.array([r["seconds"] for r in self.records])
+            last = self.records[-1] if self.records else {}
+            totals = sorted(self.span_totals.items())
+            reruns, rerun_seconds = self.reruns, self.rerun_seconds
+        p = METRIC_PREFIX
+        lines = [f"# HELP {p}_rerun_seconds 脚本整页重跑耗时",
+                 f"# TYPE {p}_rerun_seconds summary"]
+        if len(latency):
+            for q, value in zip(QUANTILES, np.quantile(latency, QUANTILES)):
+                lines.append(f'{p}_rerun_seconds{{quantile="{q}"}} {value:.6f}')
+        lines += [f"{p}_rerun_seconds_sum {rerun_seconds:.6f}",
+                  f"{p}_rerun_seconds_count {reruns}",
+                  f"# HELP {p}_span_seconds 各计时段累计耗时",
+                  f"# TYPE {p}_span_seconds summary"]
+        for (name, kind), (count, seconds) in totals:
+            labels = f'span="{_escape(name)}",kind="{kind}"'
+            lines.append(f"{p}_span_seconds_sum{{{labels}}} {seconds:.6f}")
+            lines.append(f"{p}_span_seconds_count{{{labels}}} {count}")
+        if last.get("rss_bytes") is not None:
+            lines += [f"# HELP {p}_resident_memory_bytes 最近一次重跑结束时的进程常驻内存",
+                      f"# TYPE {p}_resident_memory_bytes gauge",
+                      f"{p}_resident_memory_bytes {last['rss_bytes']}"]
+        if last.get("traced_peak_bytes") is not None:
+            lines += [f"# HELP {p}_traced_peak_bytes 最近一次重跑的 tracemalloc 峰值",
+                      f"# TYPE {p}_traced_peak_bytes gauge",
+                      f"{p}_traced_peak_bytes {last['traced_peak_bytes']}"]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
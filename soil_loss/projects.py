@@ -0,0 +1,208 @@
+"""多项目结果库（SQLite）
+
+每个项目保存一行概要（名称、地区、年份、参数版本、总面积、总流失量、输入参数 JSON）
+和按扰动类型的汇总行。对比、排名和按地区/扰动类型的统计直接在库内用 SQL 聚合，
+不重新计算各项目。
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from .summary import COL_AREA, COL_TOTAL, COL_TYPE, COL_UNIT, DISTURBANCE_TYPES
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".soil_loss", "projects.sqlite")
+PATH_ENV = "SOIL_LOSS_PROJECTS_DB"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS project (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    region TEXT,
+    year INTEGER,
+    revision TEXT,
+    saved_at TEXT NOT NULL,
+    total_area REAL NOT NULL,
+    total_loss REAL NOT NULL,
+    inputs TEXT
+);
+CREATE INDEX IF NOT EXISTS project_region ON project (region);
+CREATE INDEX IF NOT EXISTS project_loss ON project (total_loss);
+CREATE TABLE IF NOT EXISTS result (
+    project_id INTEGER NOT NULL REFERENCES project (id) ON DELETE CASCADE,
+    type TEXT NOT NULL,
+    area REAL NOT NULL,
+    unit REAL NOT NULL,
+    total REAL NOT NULL,
+    PRIMARY KEY (project_id, type)
+);
+CREATE INDEX IF NOT EXISTS result_type ON result (type);
+"""
+
+# 项目列表的列名及可排序字段
+PROJECT_COLUMNS = {
+    "id": "编号",
+    "name": "项目名称",
+    "region": "地区",
+    "year": "测算年份",
+    "revision": "参数版本",
+    "saved_at": "保存时间",
+    "total_area": "总面积(hm²)",
+    "total_loss": "总流失量(t)",
+    "unit_loss": "平均单位流失量(t/hm²)"
+}
+SORT_FIELDS = ["total_loss", "unit_loss", "total_area", "year", "saved_at", "name"]
+
+
+def _json_default(value):
+    # NumPy 标量等
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+class ProjectStore:
+    """项目结果库，可在多线程间共享（内部加锁）
+
+    path 缺省取环境变量 SOIL_LOSS_PROJECTS_DB，否则为 ~/.soil_loss/projects.sqlite。
+    """
+
+    def __init__(self, path=None):
+        path = path or os.environ.get(PATH_ENV) or DEFAULT_PATH
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA foreign_keys = ON")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _frame(self, sql, params=()):
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    # ---------- 写入 ----------
+    def save(self, name, df_summary, region=None, year=None, revision=None, inputs=None):
+        """保存（同名则覆盖）一个项目的汇总表，返回项目编号"""
+        return self.save_many([dict(name=name, df_summary=df_summary, region=region, year=year,
+                                    revision=revision, inputs=inputs)])[0]
+
+    def save_many(self, records):
+        """批量保存，records 为 save 参数字典的列表，在一个事务中写入"""
+        ids = []
+        saved_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock, self._conn:
+            for record in records:
+                df = record["df_summary"]
+                areas = df[COL_AREA].astype(float)
+                totals = df[COL_TOTAL].astype(float)
+                inputs = record.get("inputs")
+                row = (record["name"], record.get("region"), record.get("year"), record.get("revision"),
+                       saved_at, float(areas.sum()), float(totals.sum()),
+                       None if inputs is None else json.dumps(inputs, ensure_ascii=False, default=_json_default))
+                project_id = self._conn.execute(
+                    "INSERT INTO project (name, region, year, revision, saved_at, total_area, total_loss, inputs) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET "
+                    "region = excluded.region, year = excluded.year, revision = excluded.revision, "
+                    "saved_at = excluded.saved_at, total_area = excluded.total_area, "
+                    "total_loss = excluded.total_loss, inputs = excluded.inputs RETURNING id", row).fetchone()[0]
+                self._conn.execute("DELETE FROM result WHERE project_id = ?", (project_id,))
+                self._conn.executemany(
+                    "INSERT INTO result VALUES (?, ?, ?, ?, ?)",
+                    zip([project_id] * len(df), df[COL_TYPE], areas, df[COL_UNIT].astype(float), totals))
+                ids.append(project_id)
+        return ids
+
+    def delete(self, ids):
+        ids = [int(i) for i in ids]
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM project WHERE id = ?", [(i,) for i in ids])
+
+    # ---------- 查询 ----------
+    @staticmethod
+    def _where(regions=None, name_like=None, min_loss=None, max_loss=None, ids=None):
+        clauses, params = [], []
+        if regions:
+            clauses.append(f"p.region IN ({', '.join('?' * len(regions))})")
+            params += list(regions)
+        if name_like:
+            clauses.append("p.name LIKE ?")
+            params.append(f"%{name_like}%")
+        if min_loss is not None:
+            clauses.append("p.total_loss >= ?")
+            params.append(min_loss)
+        if max_loss is not None:
+            clauses.append("p.total_loss <= ?")
+            params.append(max_loss)
+        if ids is not None:
+            clauses.append(f"p.id IN ({', '.join('?' * len(ids)) or 'NULL'})")
+            params += [int(i) for i in ids]
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def version(self):
+        """库内容标识（项目数, 最后保存时间, 最大编号），用于按内容缓存查询结果"""
+        with self._lock:
+            return tuple(self._conn.execute("SELECT COUNT(*), MAX(saved_at), MAX(id) FROM project").fetchone())
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM project").fetchone()[0]
+
+    def regions(self):
+        with self._lock:
+            return [r[0] for r in self._conn.execute(
+                "SELECT DISTINCT region FROM project WHERE region IS NOT NULL ORDER BY region")]
+
+    def projects(self, order_by="total_loss", descending=True, limit=None, **filters):
+        """项目列表（含排名），filters: regions, name_like, min_loss, max_loss, ids"""
+        if order_by not in SORT_FIELDS:
+            raise ValueError(f"不支持的排序字段: {order_by}")
+        where, params = self._where(**filters)
+        direction = "DESC" if descending else "ASC"
+        sql = (f"SELECT p.id, p.name, p.region, p.year, p.revision, p.saved_at, p.total_area, p.total_loss, "
+               f"CASE WHEN p.total_area > 0 THEN p.total_loss / p.total_area ELSE 0 END AS unit_loss "
+               f"FROM project p{where} ORDER BY {order_by} {direction}, p.id")
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        frame = self._frame(sql, params)
+        frame.insert(0, "rank", range(1, len(frame) + 1))
+        return frame.rename(columns={"rank": "排名", **PROJECT_COLUMNS})
+
+    def type_matrix(self, value="total", **filters):
+        """项目 × 扰动类型矩阵，value 为 area/unit/total"""
+        if value not in ("area", "unit", "total"):
+            raise ValueError(f"不支持的汇总字段: {value}")
+        where, params = self._where(**filters)
+        frame = self._frame(f"SELECT p.name, r.type, r.{value} AS value FROM result r "
+                            f"JOIN project p ON p.id = r.project_id{where}", params)
+        matrix = frame.pivot_table(index="name", columns="type", values="value", aggfunc="sum", fill_value=0.0)
+        return matrix.reindex(columns=[t for t in DISTURBANCE_TYPES if t in matrix.columns])
+
+    def region_summary(self, **filters):
+        """按地区 × 扰动类型的项目数、面积、流失量合计及面积加权单位流失量"""
+        where, params = self._where(**filters)
+        frame = self._frame(
+            f"SELECT p.region AS 地区, r.type AS {COL_TYPE}, COUNT(DISTINCT p.id) AS 项目数, "
+            f"SUM(r.area) AS '{COL_AREA}', SUM(r.total) AS '{COL_TOTAL}', "
+            f"CASE WHEN SUM(r.area) > 0 THEN SUM(r.total) / SUM(r.area) ELSE 0 END AS '{COL_UNIT}' "
+            f"FROM result r JOIN project p ON p.id = r.project_id{where} GROUP BY p.region, r.type", params)
+        order = {t: i for i, t in enumerate(DISTURBANCE_TYPES)}
+        return frame.sort_values(["地区", COL_TYPE], key=lambda s: s.map(order) if s.name == COL_TYPE else s,
+                                 ignore_index=True)
+
+    def summary(self, project_id):
+        """单个项目的汇总表（与 summary_frame 列相同）"""
+        frame = self._frame(f"SELECT type AS {COL_TYPE}, area AS '{COL_AREA}', unit AS '{COL_UNIT}', "
+                            f"total AS '{COL_TOTAL}' FROM result WHERE project_id = ?", (int(project_id),))
+        return frame.set_index(COL_TYPE).reindex(DISTURBANCE_TYPES).dropna().reset_index()
+
+    def inputs(self, project_id):
+        with self._lock:
+            row = self._conn.execute("SELECT inputs FROM project WHERE id = ?", (int(project_id),)).fetchone()
+        return json.loads(row[0]) if row and row[0] else {}
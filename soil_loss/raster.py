@@ -0,0 +1,280 @@
+"""栅格（DEM）模式：逐像元计算 LS 因子和土壤流失量
+
+输入 DEM 及 R/K/C/P 栅格（GeoTIFF 或 .npy，也可为常数），按坡度公式
+    A = R × K × LS × C × P × T
+逐像元计算单位面积流失量 (t/hm²)，并按分区栅格汇总流失总量。
+
+- 坡度: Horn 3×3 差分;
+- 坡长: D8 流向下的最长上坡汇流路径长度，截断于 max_slope_length;
+- 分块: 栅格按 tile_size 分块处理，每块外扩 halo 像元读取。由于坡长被截断，
+  halo ≥ max_slope_length/像元大小 时分块结果与整幅计算完全一致。
+
+坡长与逐像元流失量经 kernels 计算（安装 numba 时为编译内核，否则为本模块及 engine 的 NumPy 实现）。
+.npy 以内存映射方式读写，GeoTIFF 通过 rasterio 按窗口读写，内存占用只与分块大小有关。
+"""
+import math
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import kernels
+
+DEFAULT_TILE_SIZE = 1024
+DEFAULT_MAX_SLOPE_LENGTH = 300.0
+
+# D8 邻域 (行偏移, 列偏移)
+D8_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+# ========== 栅格读写 ==========
+def _is_geotiff(path):
+    return Path(path).suffix.lower() in (".tif", ".tiff")
+
+
+def _require_rasterio():
+    try:
+        import rasterio
+    except ImportError as exc:
+        raise ImportError("读写 GeoTIFF 需要安装 rasterio: pip install rasterio") from exc
+    return rasterio
+
+
+class RasterSource:
+    """栅格数据源：.npy/GeoTIFF 路径、内存数组或常数，按窗口读取为 float64
+
+    只保存路径，在各进程内按需打开，可安全地传给进程池。
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._data = None
+        self.nodata = None
+        self.cell_size = None
+        self.profile = None
+        if isinstance(source, (int, float)):
+            self.shape = None
+        elif isinstance(source, np.ndarray):
+            self.shape = source.shape
+        elif _is_geotiff(source):
+            rasterio = _require_rasterio()
+            with rasterio.open(source) as ds:
+                self.shape = (ds.height, ds.width)
+                self.nodata = ds.nodata
+                self.cell_size = abs(ds.transform.a)
+                self.profile = ds.profile.copy()
+        else:
+            self.shape = np.load(source, mmap_mode="r").shape
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_data"] = None
+        return state
+
+    def _open(self):
+        if self._data is None:
+            if isinstance(self.source, np.ndarray):
+                self._data = self.source
+            elif _is_geotiff(self.source):
+                self._data = _require_rasterio().open(self.source)
+            else:
+                self._data = np.load(self.source, mmap_mode="r")
+        return self._data
+
+    def read(self, r0, r1, c0, c1):
+        if self.shape is None:
+            return np.full((r1 - r0, c1 - c0), float(self.source))
+        data = self._open()
+        if isinstance(data, np.ndarray):
+            block = np.array(data[r0:r1, c0:c1], dtype=np.float64)
+        else:
+            from rasterio.windows import Window
+            block = data.read(1, window=Window(c0, r0, c1 - c0, r1 - r0)).astype(np.float64)
+        if self.nodata is not None:
+            block[block == self.nodata] = np.nan
+        return block
+
+
+class RasterSink:
+    """逐块写入输出栅格 (.npy 内存映射或 GeoTIFF)"""
+
+    def __init__(self, path, shape, profile=None):
+        self.path = path
+        if _is_geotiff(path):
+            rasterio = _require_rasterio()
+            profile = dict(profile or {}, driver="GTiff", count=1, dtype="float32",
+                           nodata=np.nan, height=shape[0], width=shape[1])
+            self._dataset = rasterio.open(path, "w", **profile)
+            self._array = None
+        else:
+            self._dataset = None
+            self._array = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=shape)
+
+    def write(self, r0, c0, block):
+        if self._array is not None:
+            self._array[r0:r0 + block.shape[0], c0:c0 + block.shape[1]] = block
+        else:
+            from rasterio.windows import Window
+            self._dataset.write(block.astype(np.float32), 1,
+                                window=Window(c0, r0, block.shape[1], block.shape[0]))
+
+    def close(self):
+        if self._array is not None:
+            self._array.flush()
+            self._array = None
+        if self._dataset is not None:
+            self._dataset.close()
+            self._dataset = None
+
+
+# ========== 地形分析 ==========
+def _neighbour(padded, dr, dc, shape):
+    return padded[1 + dr:1 + dr + shape[0], 1 + dc:1 + dc + shape[1]]
+
+
+def slope_angle(dem, cell_size):
+    """Horn 法坡度 (°)"""
+    p = np.pad(dem, 1, mode="edge")
+    z = lambda dr, dc: _neighbour(p, dr, dc, dem.shape)
+    dzdx = ((z(-1, 1) + 2 * z(0, 1) + z(1, 1)) - (z(-1, -1) + 2 * z(0, -1) + z(1, -1))) / (8 * cell_size)
+    dzdy = ((z(1, -1) + 2 * z(1, 0) + z(1, 1)) - (z(-1, -1) + 2 * z(-1, 0) + z(-1, 1))) / (8 * cell_size)
+    return np.degrees(np.arctan(np.hypot(dzdx, dzdy)))
+
+
+def flow_directions(dem, cell_size):
+    """D8 流向：返回 (流向编号 0-7，无出流为 -1；沿流向的步长 m)"""
+    p = np.pad(dem, 1, mode="edge")
+    direction = np.full(dem.shape, -1, dtype=np.int8)
+    best = np.zeros(dem.shape)
+    step = np.full(dem.shape, float(cell_size))
+    for k, (dr, dc) in enumerate(D8_OFFSETS):
+        distance = cell_size * math.sqrt(2) if dr and dc else cell_size
+        drop = (dem - _neighbour(p, dr, dc, dem.shape)) / distance
+        steeper = drop > best
+        direction[steeper] = k
+        best[steeper] = drop[steeper]
+        step[steeper] = distance
+    return direction, step
+
+
+def _shift_slices(dr, dc, shape):
+    rows, cols = shape
+    src = (slice(max(0, -dr), rows - max(0, dr)), slice(max(0, -dc), cols - max(0, dc)))
+    dst = (slice(max(0, dr), rows - max(0, -dr)), slice(max(0, dc), cols - max(0, -dc)))
+    return src, dst
+
+
+def flow_length(direction, step, max_length):
+    """最长上坡汇流路径长度 λ(c) = min(max_length, 步长(c) + max λ(上游))
+
+    以逐轮松弛迭代求解，迭代次数不超过 max_length/最小步长 + 1。
+    """
+    length = np.minimum(step, max_length)
+    max_iter = int(math.ceil(max_length / step.min())) + 1 if step.size else 0
+    for _ in range(max_iter):
+        inflow = np.zeros_like(length)
+        for k, (dr, dc) in enumerate(D8_OFFSETS):
+            src, dst = _shift_slices(dr, dc, length.shape)
+            np.maximum(inflow[dst], np.where(direction[src] == k, length[src], 0.0), out=inflow[dst])
+        updated = np.minimum(step + inflow, max_length)
+        if np.array_equal(updated, length):
+            break
+        length = updated
+    return length
+
+
+# ========== 分块计算 ==========
+def iter_tiles(shape, tile_size):
+    for r0 in range(0, shape[0], tile_size):
+        for c0 in range(0, shape[1], tile_size):
+            yield r0, min(r0 + tile_size, shape[0]), c0, min(c0 + tile_size, shape[1])
+
+
+def halo_size(cell_size, max_slope_length):
+    """保证分块结果与整幅计算一致所需的外扩像元数"""
+    return int(math.ceil(max_slope_length / cell_size)) + 2
+
+
+def _compute_tile(sources, tile, cell_size, max_slope_length, T):
+    dem, R, K, C, P, zones = sources
+    r0, r1, c0, c1 = tile
+    halo = halo_size(cell_size, max_slope_length)
+    wr0, wr1 = max(0, r0 - halo), min(dem.shape[0], r1 + halo)
+    wc0, wc1 = max(0, c0 - halo), min(dem.shape[1], c1 + halo)
+    window = dem.read(wr0, wr1, wc0, wc1)
+
+    angle = slope_angle(window, cell_size)
+    direction, step = flow_directions(window, cell_size)
+    length = kernels.flow_length(direction, step, max_slope_length)
+    inner = (slice(r0 - wr0, r1 - wr0), slice(c0 - wc0, c1 - wc0))
+
+    _, unit, _ = kernels.general_loss(R.read(r0, r1, c0, c1), K.read(r0, r1, c0, c1), C.read(r0, r1, c0, c1),
+                                      P.read(r0, r1, c0, c1), T, length[inner], angle[inner], 1.0)
+    cell_area = cell_size * cell_size / 10000
+    valid = np.isfinite(unit)
+    if zones is None:
+        zone_ids = np.zeros(int(valid.sum()), dtype=np.int64)
+    else:
+        zone_ids = zones.read(r0, r1, c0, c1)[valid].astype(np.int64)
+    keys, inverse = np.unique(zone_ids, return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(keys))
+    losses = np.bincount(inverse, weights=unit[valid] * cell_area, minlength=len(keys))
+    return tile, unit, keys, counts * cell_area, losses
+
+
+def run_raster(dem, R, K, C, P, output_path=None, zones=None, T=1.0, cell_size=None,
+               tile_size=DEFAULT_TILE_SIZE, max_slope_length=DEFAULT_MAX_SLOPE_LENGTH, workers=1):
+    """栅格模式入口
+
+    dem/R/K/C/P/zones 可为 .npy/GeoTIFF 路径、数组或常数（zones 为整数分区编号，可省略）。
+    返回按分区汇总的 DataFrame: 分区、面积(hm²)、单位流失量(t/hm²)、总流失量(t)。
+    """
+    dem = RasterSource(dem)
+    sources = [dem, *(RasterSource(s) for s in (R, K, C, P))]
+    sources.append(RasterSource(zones) if zones is not None else None)
+    for source in sources[1:]:
+        if source is not None and source.shape is not None and source.shape != dem.shape:
+            raise ValueError(f"栅格尺寸 {source.shape} 与 DEM {dem.shape} 不一致")
+    cell_size = cell_size or dem.cell_size
+    if not cell_size:
+        raise ValueError("无法从 DEM 获取像元大小，请指定 cell_size")
+
+    sink = RasterSink(output_path, dem.shape, dem.profile) if output_path else None
+    area, loss = {}, {}
+
+    def collect(result):
+        (r0, _, c0, _), unit, keys, areas, losses = result
+        if sink is not None:
+            sink.write(r0, c0, unit)
+        for key, a, l in zip(keys.tolist(), areas, losses):
+            area[key] = area.get(key, 0.0) + a
+            loss[key] = loss.get(key, 0.0) + l
+
+    args = (cell_size, max_slope_length, T)
+    try:
+        if workers == 1:
+            for tile in iter_tiles(dem.shape, tile_size):
+                collect(_compute_tile(sources, tile, *args))
+        else:
+            from .parallel import resolve_workers
+            workers = resolve_workers(workers)
+            inflight = deque()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for tile in iter_tiles(dem.shape, tile_size):
+                    inflight.append(pool.submit(_compute_tile, sources, tile, *args))
+                    if len(inflight) >= 2 * workers:
+                        collect(inflight.popleft().result())
+                while inflight:
+                    collect(inflight.popleft().result())
+    finally:
+        if sink is not None:
+            sink.close()
+
+    zone_ids = sorted(area)
+    areas = np.array([area[z] for z in zone_ids])
+    totals = np.array([loss[z] for z in zone_ids])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        units = np.where(areas > 0, totals / areas, 0.0)
+    return pd.DataFrame({"分区": zone_ids, "面积(hm²)": areas, "单位流失量(t/hm²)": units, "总流失量(t)": totals})
@@ -0,0 +1,413 @@
+"""测算报告：Markdown / HTML / Excel 模板化输出与批量 ZIP 打包
+
+每个项目先整理为 ProjectReport（项目信息、汇总表、各扰动类型的全部计算参数），
+再按模板渲染。批量生成时由进程池渲染，渲染完成的文件依次写入 ZIP，
+同时在途的项目不超过 2×workers，内存占用与项目数无关。
+Excel 报告需要 xlsxwriter（pip install xlsxwriter），图表为 Excel 原生图表。
+"""
+import io
+import os
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from string import Template
+
+import numpy as np
+import pandas as pd
+
+from . import engine, figures
+from .batch import COLUMN_DEFAULTS, compute_units
+from .summary import (COL_AREA, COL_TOTAL, COL_TYPE, COL_UNIT, DISTURBANCE_TYPES, EXCAVATION, GENERAL,
+                      PILE, summary_frame, summary_from_totals)
+
+FORMATS = ("md", "html", "xlsx")
+TOOL_VERSION = "2.0"
+STANDARD = "SL 773-2018"
+
+# 各扰动类型的计算参数及报告中的列名
+PARAMETER_LABELS = {
+    GENERAL: {
+        "area": "面积(hm²)", "R": "R因子", "K": "K因子", "C": "C因子", "P": "P因子", "T": "T因子",
+        "slope_length": "坡长λ(m)", "slope_angle": "坡度θ(°)", "LS": "LS因子",
+        "unit_loss": "单位流失量(t/hm²)", "total_loss": "总流失量(t)"
+    },
+    EXCAVATION: {
+        "area": "面积(hm²)", "R": "R因子", "soil_type": "土体类型", "saturation": "饱和度",
+        "slope_height": "坡高H(m)", "slope_angle": "坡度β(°)",
+        "unit_loss": "单位流失量(t/hm²)", "total_loss": "总流失量(t)"
+    },
+    PILE: {
+        "area": "面积(hm²)", "R": "R因子", "pile_height": "堆高H(m)", "pile_angle": "堆积坡度φ(°)",
+        "pile_length": "坡长L(m)", "shape": "形状", "material": "材料", "gradation": "级配",
+        "contains_clay": "含黏粒", "compaction": "压实度(%)",
+        "unit_loss": "单位流失量(t/hm²)", "total_loss": "总流失量(t)"
+    }
+}
+
+MARKDOWN_TEMPLATE = Template("""# 生产建设项目土壤流失量测算报告
+
+## 1. 项目基本信息
+$info
+
+## 2. 测算结果汇总
+- **土壤流失总量**: $total_loss t
+- **平均单位流失量**: $avg_unit_loss t/hm²
+
+## 3. 分项计算结果
+$summary_table
+
+## 4. 主要计算参数
+$parameters
+
+## 5. 报告信息
+- 生成时间: $report_time
+- 测算标准: $standard
+- 工具版本: $version
+
+**注意**: 本报告为自动生成的计算结果，实际应用需结合现场勘察数据。
+""")
+
+HTML_TEMPLATE = Template("""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>土壤流失量测算报告 - $title</title>
+<style>
+body { font-family: sans-serif; max-width: 1100px; margin: 2rem auto; color: #1f2937; }
+h1 { color: #1e3a8a; }
+h2 { border-bottom: 2px solid #e5e7eb; padding-bottom: .3rem; }
+table { border-collapse: collapse; margin: .5rem 0 1rem; }
+th, td { border: 1px solid #d1d5db; padding: 4px 10px; text-align: right; }
+th { background: #f1f5f9; }
+.charts { display: flex; flex-wrap: wrap; }
+.charts > div { flex: 1 1 480px; }
+</style>
+</head>
+<body>
+<h1>生产建设项目土壤流失量测算报告</h1>
+<h2>1. 项目基本信息</h2>
+$info
+<h2>2. 测算结果汇总</h2>
+<ul>
+<li><b>土壤流失总量</b>: $total_loss t</li>
+<li><b>平均单位流失量</b>: $avg_unit_loss t/hm²</li>
+</ul>
+<h2>3. 分项计算结果</h2>
+$summary_table
+<div class="charts">$charts</div>
+<h2>4. 主要计算参数</h2>
+$parameters
+<h2>5. 报告信息</h2>
+<ul>
+<li>生成时间: $report_time</li>
+<li>测算标准: $standard</li>
+<li>工具版本: $version</li>
+</ul>
+<p><b>注意</b>: 本报告为自动生成的计算结果，实际应用需结合现场勘察数据。</p>
+</body>
+</html>
+""")
+
+
+class ProjectReport:
+    """一个项目的报告数据
+
+    info: 项目信息 {标签: 值}；summary: 与 df_summary 相同布局的汇总表；
+    parameters: {扰动类型: 参数表 DataFrame（每行一个单元，列名见 PARAMETER_LABELS）}；
+    report_time 为空时取渲染时间。
+    """
+
+    def __init__(self, name, info, summary, parameters, report_time=None):
+        self.name = name
+        self.info = info
+        self.summary = summary
+        self.parameters = parameters
+        self.report_time = report_time
+
+    @property
+    def total_loss(self):
+        return float(self.summary[COL_TOTAL].sum())
+
+    @property
+    def avg_unit_loss(self):
+        return float(self.summary[COL_UNIT].mean())
+
+
+# ========== 报告数据 ==========
+def _parameter_tables(units):
+    """单元结果表（含参数列及 LS/unit_loss/total_loss）→ 各扰动类型参数表"""
+    tables = {}
+    for kind, labels in PARAMETER_LABELS.items():
+        rows = units[units["disturbance_type"] == kind]
+        if len(rows):
+            columns = [c for c in labels if c in rows.columns]
+            tables[kind] = rows[columns].rename(columns=labels).reset_index(drop=True)
+    return tables
+
+
+def report_from_inputs(name, inputs, df_summary=None, report_time=None, tables=None):
+    """由页面输入（或项目库中保存的输入）生成报告数据
+
+    inputs: region, year, revision, soil_type, areas, general, excavation, pile
+            （general/excavation/pile 为各标签页的参数字典，同项目库保存格式）。
+    df_summary 为空时按输入重新计算；tables 为该参数版本的分类系数表。
+    """
+    rows = []
+    for key, kind in (("general", GENERAL), ("excavation", EXCAVATION), ("pile", PILE)):
+        if inputs.get(key):
+            rows.append({**inputs[key], "disturbance_type": kind})
+    units = pd.DataFrame.from_records(rows) if rows else pd.DataFrame(columns=["disturbance_type", "area"])
+    if len(units):
+        units["project"] = name
+        results = compute_units(units, tables)
+        ls = units["LS"].fillna(results["LS"]) if "LS" in units.columns else results["LS"]
+        unit = results["unit_loss"].copy()
+        # 多坡段模式只保存平均 LS，一般扰动地表按该 LS 计算
+        if "LS" in units.columns:
+            given = (units["disturbance_type"] == GENERAL) & units["LS"].notna()
+            g = results.loc[given].index
+            filled = units.loc[g].fillna({c: COLUMN_DEFAULTS[c] for c in ("R", "K", "C", "P", "T")})
+            unit[g] = engine.general_unit_loss(filled["R"], filled["K"], filled["LS"], filled["C"],
+                                               filled["P"], filled["T"]).astype(float)
+        units = units.assign(LS=ls.where(units["disturbance_type"] == GENERAL), unit_loss=unit,
+                             total_loss=unit * results["area"])
+    if df_summary is None:
+        areas = list(inputs.get("areas") or [0.0] * len(DISTURBANCE_TYPES))
+        unit_by_type = dict(zip(units["disturbance_type"], units["unit_loss"])) if len(units) else {}
+        units_col = [float(unit_by_type.get(kind, 0.0)) for kind in DISTURBANCE_TYPES]
+        df_summary = summary_frame(areas, units_col, [a * u for a, u in zip(areas, units_col)])
+    info = {
+        "项目名称": name,
+        "项目地点": inputs.get("region", "-"),
+        "测算年份": inputs.get("year", "-"),
+        "参数版本": inputs.get("revision") or STANDARD,
+        "总扰动面积": f"{df_summary[COL_AREA].sum():.2f} hm²",
+        "主要土壤类型": inputs.get("soil_type", "-")
+    }
+    for label, key in (("植被覆盖率", "vegetation_coverage"), ("建设工期", "construction_period")):
+        if key in inputs:
+            info[label] = inputs[key]
+    return ProjectReport(name, info, df_summary, _parameter_tables(units), report_time)
+
+
+def reports_from_store(store, param_store=None, **filters):
+    """逐个产出项目库中（按 filters 筛选的）项目报告数据
+
+    param_store 为参数库时按各项目保存的参数版本取分类系数表。
+    """
+    df_projects = store.projects(order_by="name", descending=False, **filters)
+    for project_id, name in zip(df_projects["编号"], df_projects["项目名称"]):
+        inputs = store.inputs(project_id)
+        tables = None
+        if param_store is not None and inputs.get("revision") in param_store.revisions():
+            tables = param_store.tables(inputs["revision"])
+        yield report_from_inputs(name, inputs, store.summary(project_id), tables=tables)
+
+
+def reports_from_units(path, tables=None):
+    """由批量单元表（CSV/Parquet，列同 batch.COLUMN_DEFAULTS）按项目产出报告数据"""
+    frame = pd.read_parquet(path) if str(path).lower().endswith((".parquet", ".pq")) else pd.read_csv(path)
+    results = compute_units(frame, tables)
+    units = frame.reindex(columns=[c for c in COLUMN_DEFAULTS if c in frame.columns]).copy()
+    for column, default in COLUMN_DEFAULTS.items():
+        if column not in units.columns:
+            units[column] = default
+    units["project"] = results["project"]
+    units = units.assign(LS=results["LS"], unit_loss=results["unit_loss"], total_loss=results["total_loss"])
+    for name, group in units.groupby("project", sort=True):
+        grouped = group.groupby("disturbance_type")[["area", "total_loss"]].sum()
+        df_summary = summary_from_totals(grouped["area"].to_dict(), grouped["total_loss"].to_dict())
+        info = {"项目名称": name, "单元数": len(group), "总扰动面积": f"{df_summary[COL_AREA].sum():.2f} hm²"}
+        yield ProjectReport(name, info, df_summary, _parameter_tables(group))
+
+
+# ========== 渲染 ==========
+def _fmt(value):
+    if isinstance(value, (bool, np.bool_)):
+        return "是" if value else "否"
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.4g}" if abs(value) < 1 else f"{value:.2f}"
+    return str(value)
+
+
+def _display(frame):
+    return pd.DataFrame({column: [_fmt(v) for v in frame[column]] for column in frame.columns})
+
+
+def _template_values(report):
+    return dict(
+        title=report.name,
+        total_loss=f"{report.total_loss:.2f}",
+        avg_unit_loss=f"{report.avg_unit_loss:.2f}",
+        report_time=report.report_time or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        standard=STANDARD,
+        version=TOOL_VERSION
+    )
+
+
+def render_markdown(report, template=None):
+    parameters = []
+    for kind, table in report.parameters.items():
+        parameters.append(f"### {kind}\n\n{_display(table).to_markdown(index=False)}")
+    return (template or MARKDOWN_TEMPLATE).safe_substitute(
+        info="\n".join(f"- **{label}**: {_fmt(value)}" for label, value in report.info.items()),
+        summary_table=report.summary.to_markdown(index=False, floatfmt=".2f"),
+        parameters="\n\n".join(parameters) or "无",
+        **_template_values(report)
+    )
+
+
+def render_html(report, template=None, include_plotlyjs="cdn"):
+    """HTML 报告，图表为 Plotly（include_plotlyjs 同 plotly.io.to_html，默认从 CDN 加载）"""
+    charts = ""
+    if report.summary[COL_TOTAL].any():
+        charts = "".join(
+            f"<div>{fig.to_html(full_html=False, include_plotlyjs=include_plotlyjs if i == 0 else False)}</div>"
+            for i, fig in enumerate((figures.loss_pie(report.summary), figures.unit_loss_bar(report.summary))))
+    parameters = "".join(f"<h3>{kind}</h3>{_display(table).to_html(index=False, border=0)}"
+                         for kind, table in report.parameters.items())
+    info = "<ul>" + "".join(f"<li><b>{label}</b>: {_fmt(value)}</li>"
+                            for label, value in report.info.items()) + "</ul>"
+    return (template or HTML_TEMPLATE).safe_substitute(
+        info=info,
+        summary_table=report.summary.to_html(index=False, border=0, float_format="{:.2f}".format),
+        charts=charts,
+        parameters=parameters or "<p>无</p>",
+        **_template_values(report)
+    )
+
+
+def _require_xlsxwriter():
+    try:
+        import xlsxwriter
+    except ImportError as exc:
+        raise ImportError("生成 Excel 报告需要安装 xlsxwriter: pip install xlsxwriter") from exc
+    return xlsxwriter
+
+
+def render_xlsx(report):
+    """Excel 报告：“汇总”表含项目信息、汇总表及原生饼图/柱状图，“参数”表为各扰动类型参数"""
+    xlsxwriter = _require_xlsxwriter()
+    buffer = io.BytesIO()
+    book = xlsxwriter.Workbook(buffer, {"in_memory": True, "nan_inf_to_errors": True})
+    bold = book.add_format({"bold": True})
+    header = book.add_format({"bold": True, "bg_color": "#F1F5F9", "border": 1})
+    number = book.add_format({"num_format": "0.00", "border": 1})
+    cell = book.add_format({"border": 1})
+
+    sheet = book.add_worksheet("汇总")
+    sheet.set_column(0, 0, 16)
+    sheet.set_column(1, 3, 18)
+    sheet.write(0, 0, "生产建设项目土壤流失量测算报告", book.add_format({"bold": True, "font_size": 14}))
+    row = 2
+    for label, value in report.info.items():
+        sheet.write(row, 0, label, bold)
+        sheet.write(row, 1, _fmt(value))
+        row += 1
+    sheet.write(row, 0, "土壤流失总量 (t)", bold)
+    sheet.write_number(row, 1, report.total_loss, number)
+    sheet.write(row + 1, 0, "平均单位流失量 (t/hm²)", bold)
+    sheet.write_number(row + 1, 1, report.avg_unit_loss, number)
+
+    top = row + 3
+    columns = [COL_TYPE, COL_AREA, COL_UNIT, COL_TOTAL]
+    sheet.write_row(top, 0, columns, header)
+    for i, values in enumerate(report.summary[columns].itertuples(index=False), start=top + 1):
+        sheet.write(i, 0, values[0], cell)
+        for j, value in enumerate(values[1:], start=1):
+            sheet.write_number(i, j, float(value), number)
+    first, last = top + 1, top + len(report.summary)
+
+    pie = book.add_chart({"type": "pie"})
+    pie.add_series({"name": "土壤流失量构成", "categories": ["汇总", first, 0, last, 0],
+                    "values": ["汇总", first, 3, last, 3], "data_labels": {"percentage": True}})
+    pie.set_title({"name": "土壤流失量构成"})
+    sheet.insert_chart(top, 5, pie, {"x_scale": 0.9, "y_scale": 0.9})
+    bar = book.add_chart({"type": "column"})
+    bar.add_series({"name": COL_UNIT, "categories": ["汇总", first, 0, last, 0],
+                    "values": ["汇总", first, 2, last, 2]})
+    bar.set_title({"name": "单位面积流失量对比"})
+    bar.set_legend({"none": True})
+    sheet.insert_chart(last + 2, 0, bar, {"x_scale": 0.9, "y_scale": 0.9})
+
+    params = book.add_worksheet("参数")
+    row = 0
+    for kind, table in report.parameters.items():
+        params.write(row, 0, kind, bold)
+        params.write_row(row + 1, 0, list(table.columns), header)
+        for i, values in enumerate(table.itertuples(index=False), start=row + 2):
+            for j, value in enumerate(values):
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and pd.notna(value):
+                    params.write_number(i, j, float(value), number)
+                else:
+                    params.write(i, j, _fmt(value), cell)
+        row += len(table) + 3
+    params.set_column(0, 12, 14)
+    book.close()
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    "md": lambda report: render_markdown(report).encode("utf-8"),
+    "html": lambda report: render_html(report).encode("utf-8"),
+    "xlsx": render_xlsx
+}
+
+
+def _safe_name(name):
+    return re.sub(r'[\\/:*?"<>|\s]+', "_", str(name)).strip("_") or "project"
+
+
+def render_files(report, formats=FORMATS):
+    """渲染一个项目的全部格式，返回 [(文件名, 内容 bytes)]"""
+    stem = f"土壤流失测算报告_{_safe_name(report.name)}"
+    return [(f"{stem}.{fmt}", RENDERERS[fmt](report)) for fmt in formats]
+
+
+def write_zip(reports, target, formats=FORMATS, workers=1):
+    """将报告逐个渲染并写入 ZIP（路径或可写文件对象），返回项目数
+
+    workers>1 时由进程池渲染，结果按输入顺序写入；workers 为 0 表示使用全部 CPU 核心。
+    """
+    unknown = [fmt for fmt in formats if fmt not in RENDERERS]
+    if unknown:
+        raise ValueError(f"不支持的报告格式: {', '.join(unknown)}")
+    if "xlsx" in formats:
+        _require_xlsxwriter()
+    formats = tuple(formats)
+    workers = workers if workers else (os.cpu_count() or 1)
+    count = 0
+    used = set()
+
+    def add(archive, files):
+        for name, data in files:
+            # 项目名经转换后可能重名
+            stem, ext = os.path.splitext(name)
+            candidate, i = name, 1
+            while candidate in used:
+                i += 1
+                candidate = f"{stem}_{i}{ext}"
+            used.add(candidate)
+            archive.writestr(candidate, data)
+
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        if workers == 1:
+            for report in reports:
+                add(archive, render_files(report, formats))
+                count += 1
+            return count
+        inflight = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for report in reports:
+                inflight.append(pool.submit(render_files, report, formats))
+                if len(inflight) >= 2 * workers:
+                    add(archive, inflight.popleft().result())
+                    count += 1
+            while inflight:
+                add(archive, inflight.popleft().result())
+                count += 1
+    return count
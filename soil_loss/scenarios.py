@@ -0,0 +1,254 @@
+"""减缓措施情景：在基准单元结果上按稀疏覆盖值增量重算
+
+Baseline 保存各扰动单元（批量单元表布局，见 batch.COLUMN_DEFAULTS；可另带 LS 列给定一般扰动地表的 LS）
+的输入列和 LS、单位面积流失量、总流失量数组，以及按扰动类型的面积、流失量合计。
+Scenario 只记录被修改单元的覆盖值，每次修改只重算涉及的单元，并把这些单元新旧结果之差计入
+按类型的累计合计，汇总表的更新量与修改的单元数成正比，与单元总数无关。
+情景汇总、逐单元对比表和对比图都由同一份基准数组和覆盖值生成。
+"""
+import numpy as np
+import pandas as pd
+
+from . import engine
+from .batch import CATEGORY_TABLES, COLUMN_DEFAULTS, NUMERIC_COLUMNS, TYPE_TABLE, prepare_chunk, \
+    unit_losses
+from .summary import COL_AREA, COL_TOTAL, COL_TYPE, COL_UNIT, DISTURBANCE_TYPES, GENERAL, summary_from_totals
+
+BASELINE_LABEL = "基准"
+TOTAL_LABEL = "合计"
+# 情景可修改的单元输入
+SCENARIO_COLUMNS = [c for c in COLUMN_DEFAULTS if c != "project"]
+GENERAL_CODE = DISTURBANCE_TYPES.index(GENERAL)
+TRUE_TEXT = ("true", "1", "是", "yes", "y")
+
+
+def parse_value(column, value):
+    """把情景表中的取值（可为文本）转换为该输入列的类型"""
+    if column not in SCENARIO_COLUMNS:
+        raise ValueError(f"情景不能修改的输入: {column}")
+    if column in NUMERIC_COLUMNS:
+        return float(value)
+    if column == "contains_clay":
+        return str(value).strip().lower() in TRUE_TEXT if isinstance(value, str) else bool(value)
+    return str(value).strip()
+
+
+def _check(column, values, tables):
+    # 在写入覆盖值之前检查分类取值，出错时情景保持不变
+    if column in CATEGORY_TABLES:
+        engine.encode(tables[CATEGORY_TABLES[column]], np.asarray(values, dtype=object).astype(str))
+    elif column == "disturbance_type":
+        engine.encode(TYPE_TABLE, np.asarray(values, dtype=object).astype(str))
+
+
+class Baseline:
+    """基准单元结果，units 的索引为单元标签"""
+
+    def __init__(self, units, tables=None):
+        self.tables = tables or engine.DEFAULT_TABLES
+        self.labels = pd.Index(units.index)
+        if not self.labels.is_unique:
+            raise ValueError("单元标签（表索引）不能重复")
+        chunk = prepare_chunk(units.reset_index(drop=True))
+        self.columns = {name: chunk[name].to_numpy() for name in COLUMN_DEFAULTS}
+        self.fixed_ls = (chunk["LS"].to_numpy(dtype=np.float64) if "LS" in chunk.columns
+                         else np.full(len(chunk), np.nan))
+        self.kind = engine.encode(TYPE_TABLE, self.columns["disturbance_type"])
+        self.area = chunk["area"].to_numpy(dtype=np.float64)
+        self.ls, self.unit = self.losses(self.columns, self.kind, self.fixed_ls)
+        self.total = self.unit * self.area
+        self.area_by_type = np.bincount(self.kind, weights=self.area, minlength=len(DISTURBANCE_TYPES))
+        self.loss_by_type = np.bincount(self.kind, weights=self.total, minlength=len(DISTURBANCE_TYPES))
+
+    def __len__(self):
+        return len(self.labels)
+
+    def losses(self, columns, kind, fixed_ls):
+        """(LS, 单位面积流失量)；一般扰动地表给定 LS 时按给定值计算"""
+        ls, unit = unit_losses(columns, kind, self.tables)
+        given = np.isfinite(fixed_ls) & (kind == GENERAL_CODE)
+        if given.any():
+            ls[given] = fixed_ls[given]
+            factors = [np.asarray(columns[name][given], dtype=np.float64) for name in ("R", "K", "C", "P", "T")]
+            unit[given] = engine.general_unit_loss(*factors[:2], ls[given], *factors[2:])
+        return ls, unit
+
+    def positions(self, units):
+        """单元标签（单个或序列）-> 位置数组"""
+        keys = [units] if np.isscalar(units) or isinstance(units, tuple) else list(units)
+        positions = self.labels.get_indexer(keys)
+        if (positions < 0).any():
+            missing = [str(k) for k, p in zip(keys, positions) if p < 0]
+            raise KeyError(f"未知的单元: {', '.join(missing)}")
+        return positions
+
+    def summary(self):
+        return summary_from_totals(dict(zip(DISTURBANCE_TYPES, self.area_by_type)),
+                                   dict(zip(DISTURBANCE_TYPES, self.loss_by_type)))
+
+    @property
+    def total_loss(self):
+        return float(self.loss_by_type.sum())
+
+    def scenario(self, name=""):
+        return Scenario(self, name)
+
+
+class Scenario:
+    """基准上的一个情景：overrides 为 {输入列: {单元位置: 覆盖值}}，合计随修改增量更新"""
+
+    def __init__(self, baseline, name=""):
+        self.baseline = baseline
+        self.name = name
+        self.overrides = {}
+        # 被修改单元的当前结果: 位置 -> (扰动类型编码, 面积, LS, 单位面积流失量)
+        self.state = {}
+        self.area_by_type = baseline.area_by_type.copy()
+        self.loss_by_type = baseline.loss_by_type.copy()
+        self.evaluated = 0
+
+    def set(self, units, column, value):
+        """把 units（单元标签或标签序列）的 column 改为 value（标量或逐单元序列），只重算这些单元"""
+        if column not in SCENARIO_COLUMNS:
+            raise ValueError(f"情景不能修改的输入: {column}")
+        positions = self.baseline.positions(units)
+        values = np.broadcast_to(np.asarray(value, dtype=object), positions.shape)
+        _check(column, values, self.baseline.tables)
+        previous = dict(self.overrides.get(column, {}))
+        self.overrides.setdefault(column, {}).update(zip(positions.tolist(), values.tolist()))
+        try:
+            self._refresh(positions)
+        except Exception:
+            self.overrides[column] = previous
+            if not previous:
+                del self.overrides[column]
+            raise
+        return self
+
+    def reset(self, units=None, column=None):
+        """撤销覆盖值：units 缺省为全部单元，column 缺省为全部输入"""
+        columns = [column] if column else list(self.overrides)
+        touched = set()
+        for name in columns:
+            values = self.overrides.get(name, {})
+            if units is None:
+                keys = list(values)
+            else:
+                keys = [p for p in self.baseline.positions(units).tolist() if p in values]
+            for p in keys:
+                del values[p]
+            touched.update(keys)
+        self.overrides = {name: values for name, values in self.overrides.items() if values}
+        if touched:
+            self._refresh(np.fromiter(touched, dtype=np.int64))
+        return self
+
+    def _gather(self, positions):
+        base = self.baseline
+        columns = {name: base.columns[name][positions] for name in COLUMN_DEFAULTS}
+        for name, values in self.overrides.items():
+            column = columns[name].astype(object)
+            for i, p in enumerate(positions.tolist()):
+                if p in values:
+                    column[i] = values[p]
+            columns[name] = column
+        return columns
+
+    def _refresh(self, positions):
+        base = self.baseline
+        positions = np.unique(positions)
+        columns = self._gather(positions)
+        kind = engine.encode(TYPE_TABLE, columns["disturbance_type"].astype(str))
+        area = np.asarray(columns["area"], dtype=np.float64)
+        ls, unit = base.losses(columns, kind, base.fixed_ls[positions])
+        old = [self.state.get(p, (base.kind[p], base.area[p], base.ls[p], base.unit[p]))
+               for p in positions.tolist()]
+        old_kind = np.array([s[0] for s in old], dtype=np.int64)
+        old_area = np.array([s[1] for s in old])
+        old_total = np.array([s[3] for s in old]) * old_area
+        n_types = len(DISTURBANCE_TYPES)
+        self.area_by_type += (np.bincount(kind, weights=area, minlength=n_types)
+                              - np.bincount(old_kind, weights=old_area, minlength=n_types))
+        self.loss_by_type += (np.bincount(kind, weights=unit * area, minlength=n_types)
+                              - np.bincount(old_kind, weights=old_total, minlength=n_types))
+        for i, p in enumerate(positions.tolist()):
+            if any(p in values for values in self.overrides.values()):
+                self.state[p] = (int(kind[i]), float(area[i]), float(ls[i]), float(unit[i]))
+            else:
+                self.state.pop(p, None)
+        self.evaluated += len(positions)
+
+    # ========== 结果 ==========
+    @property
+    def changed(self):
+        """被修改单元的位置（升序）"""
+        return np.array(sorted(self.state), dtype=np.int64)
+
+    @property
+    def total_loss(self):
+        return float(self.loss_by_type.sum())
+
+    def summary(self):
+        """与 df_summary 布局相同的情景汇总表"""
+        return summary_from_totals(dict(zip(DISTURBANCE_TYPES, self.area_by_type)),
+                                   dict(zip(DISTURBANCE_TYPES, self.loss_by_type)))
+
+    def describe(self, position):
+        """单元的修改内容，如 "P: 1 → 0.6" """
+        base = self.baseline
+        return "；".join(f"{name}: {base.columns[name][position]} → {values[position]}"
+                        for name, values in self.overrides.items() if position in values)
+
+    def changes(self):
+        """逐个被修改单元的基准与情景结果对比表"""
+        base = self.baseline
+        positions = self.changed
+        state = [self.state[p] for p in positions.tolist()]
+        area = np.array([s[1] for s in state])
+        unit = np.array([s[3] for s in state])
+        frame = pd.DataFrame({
+            "单元": base.labels[positions].astype(str) if len(positions) else [],
+            COL_TYPE: [DISTURBANCE_TYPES[s[0]] for s in state],
+            "修改内容": [self.describe(p) for p in positions.tolist()],
+            COL_AREA: area,
+            "基准单位流失量(t/hm²)": base.unit[positions],
+            "情景单位流失量(t/hm²)": unit,
+            "基准总流失量(t)": base.total[positions],
+            "情景总流失量(t)": unit * area
+        })
+        frame["变化量(t)"] = frame["情景总流失量(t)"] - frame["基准总流失量(t)"]
+        return frame
+
+
+def scenarios_from_table(baseline, table):
+    """由情景表（列: scenario, unit, column, value）构建 {情景名: Scenario}，同一情景的各行依次应用"""
+    missing = [c for c in ("scenario", "unit", "column", "value") if c not in table.columns]
+    if missing:
+        raise ValueError(f"情景表缺少列: {', '.join(missing)}")
+    result = {}
+    for row in table.itertuples(index=False):
+        scenario = result.get(row.scenario)
+        if scenario is None:
+            scenario = result[row.scenario] = baseline.scenario(row.scenario)
+        scenario.set(row.unit, row.column, parse_value(row.column, row.value))
+    return result
+
+
+def compare(baseline, scenarios):
+    """基准及各情景按扰动类型的面积、总流失量和相对基准的变化（长表，另含各情景合计行）"""
+    base = np.append(baseline.loss_by_type, baseline.loss_by_type.sum())
+    frames = []
+    for name, area_by_type, loss_by_type in [(BASELINE_LABEL, baseline.area_by_type, baseline.loss_by_type)] + \
+            [(s.name, s.area_by_type, s.loss_by_type) for s in scenarios]:
+        area = np.append(area_by_type, area_by_type.sum())
+        loss = np.append(loss_by_type, loss_by_type.sum())
+        frames.append(pd.DataFrame({
+            "情景": name,
+            COL_TYPE: DISTURBANCE_TYPES + [TOTAL_LABEL],
+            COL_AREA: area,
+            COL_UNIT: np.divide(loss, area, out=np.zeros_like(loss), where=area > 0),
+            COL_TOTAL: loss,
+            "变化量(t)": loss - base,
+            "变化率(%)": np.divide(loss - base, base, out=np.zeros_like(loss), where=base > 0) * 100
+        }))
+    return pd.concat(frames, ignore_index=True)
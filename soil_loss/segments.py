@@ -0,0 +1,94 @@
+"""多坡段坡面 LS 因子计算
+
+坡面按自上而下的坡段序列描述。所有坡面的坡段首尾相接存放在一维数组中，
+offsets[i]:offsets[i+1] 为第 i 个坡面的坡段（不等长数组的偏移量布局）。
+
+第 j 个坡段的 LS 贡献按累计上坡坡长计算:
+    LS_j = (λ_j^(m+1) - λ_(j-1)^(m+1)) / ((λ_j - λ_(j-1)) × 20^m) × (sinθ_j/0.3)^n
+其中 λ_j 为坡面顶端到该坡段下缘的累计坡长，m, n 按坡段坡度取值。
+坡面 LS 为各坡段 LS 按坡长加权平均；单一坡段时与 engine.ls_factor 一致。
+"""
+import numpy as np
+import pandas as pd
+
+from . import engine, kernels
+
+
+def offsets_from_counts(counts):
+    """由各坡面坡段数生成偏移量数组"""
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+
+def profile_ids(offsets):
+    """每个坡段所属坡面的序号"""
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+def cumulative_lengths(lengths, offsets):
+    """各坡段上缘、下缘距坡顶的累计坡长"""
+    lengths = np.asarray(lengths, dtype=np.float64)
+    lower = np.cumsum(lengths)
+    starts = offsets[:-1]
+    base = np.zeros(len(starts))
+    nonempty = np.diff(offsets) > 0
+    base[nonempty] = lower[starts[nonempty]] - lengths[starts[nonempty]]
+    lower -= np.repeat(base, np.diff(offsets))
+    return lower - lengths, lower
+
+
+def segment_ls(lengths, angles, offsets):
+    """所有坡面全部坡段的 LS 贡献（一次向量化计算）"""
+    lengths = np.asarray(lengths, dtype=np.float64)
+    upper, lower = cumulative_lengths(lengths, offsets)
+    # 全局累加后相减有舍入误差，坡顶处的累计坡长可能略小于 0（分数次幂得 NaN），截断为 0
+    np.maximum(upper, 0.0, out=upper)
+    np.maximum(lower, 0.0, out=lower)
+    m, n = engine.slope_exponents(angles)
+    exponent = m + 1
+    slope_term = np.power(np.sin(np.radians(angles)) / 0.3, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        length_term = (np.power(lower, exponent) - np.power(upper, exponent)) / (lengths * np.power(20, m))
+    return np.where(lengths > 0, length_term, 0.0) * slope_term
+
+
+def profile_ls(lengths, angles, offsets):
+    """各坡面的 LS 因子（坡段 LS 按坡长加权平均）"""
+    lengths = np.asarray(lengths, dtype=np.float64)
+    n_profiles = len(offsets) - 1
+    ids = profile_ids(offsets)
+    weighted = np.bincount(ids, weights=segment_ls(lengths, angles, offsets) * lengths, minlength=n_profiles)
+    total = np.bincount(ids, weights=lengths, minlength=n_profiles)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total > 0, weighted / total, 0.0)
+
+
+def profiles_from_frame(frame, profile_col="profile", length_col="segment_length", angle_col="segment_angle"):
+    """将坡段表（每行一个坡段，按坡面内自上而下顺序）转换为偏移量布局
+
+    返回 (坡面编号, 坡长数组, 坡度数组, offsets)。
+    """
+    missing = [c for c in (profile_col, length_col, angle_col) if c not in frame.columns]
+    if missing:
+        raise ValueError(f"坡段表缺少必需列: {', '.join(missing)}")
+    codes, profiles = pd.factorize(frame[profile_col])
+    if (codes < 0).any():
+        raise ValueError(f"坡段表的 {profile_col} 列存在空值")
+    order = np.argsort(codes, kind="stable")
+    offsets = offsets_from_counts(np.bincount(codes, minlength=len(profiles)))
+    lengths = frame[length_col].to_numpy(dtype=np.float64)[order]
+    angles = frame[angle_col].to_numpy(dtype=np.float64)[order]
+    return np.asarray(profiles), lengths, angles, offsets
+
+
+def profile_table(frame, **columns):
+    """坡段表 -> 每个坡面一行: 坡段数、总坡长、LS"""
+    profiles, lengths, angles, offsets = profiles_from_frame(frame, **columns)
+    total = np.bincount(profile_ids(offsets), weights=lengths, minlength=len(profiles))
+    return pd.DataFrame({
+        "坡面": profiles,
+        "坡段数": np.diff(offsets),
+        "总坡长(m)": total,
+        "LS因子": kernels.profile_ls(lengths, angles, offsets)
+    })
@@ -0,0 +1,367 @@
+"""无界面 HTTP 计算服务（ASGI）
+
+接口（请求体为 JSON 或 Arrow IPC 流，Content-Type: application/vnd.apache.arrow.stream）:
+    GET  /health                      存活检查
+    GET  /metrics                     各接口请求数、单元数、延迟分位数和吞吐量
+    POST /v1/units/general            一般扰动地表
+    POST /v1/units/excavation         工程开挖面
+    POST /v1/units/pile               工程堆积体
+    POST /v1/batch                    混合扰动单元（逐行 disturbance_type），附汇总表与项目表
+    POST /v1/summary                  结果汇总（与“结果汇总”标签页 df_summary 相同）
+
+单元参数列名及缺省值同 batch.COLUMN_DEFAULTS，缺少 area 时按 1 hm² 计算。JSON 请求体可为
+单个对象、对象数组或 {"columns": {列名: [...]}}；单个对象返回单个结果对象，其余返回
+{"n": 单元数, "results": [...]}。Accept 为 Arrow 时批量结果以 Arrow IPC 流返回。
+每个请求整体向量化计算，计算在线程池中执行，不阻塞事件循环。
+
+部署: python -m soil_loss serve（需安装 uvicorn），或任意 ASGI 服务器加载
+soil_loss.service:app；本地测试可用 LocalClient 在进程内直接调用。
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from urllib.parse import parse_qs
+
+import numpy as np
+import pandas as pd
+
+from .batch import RESULT_COLUMNS, BatchTotals, compute_units
+from .summary import COL_TOTAL, COL_UNIT, DISTURBANCE_TYPES, EXCAVATION, GENERAL, OTHER, PILE
+
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+JSON_TYPE = "application/json"
+MAX_BODY = 64 * 1024 * 1024
+LATENCY_WINDOW = 10_000
+REVISION_ENV = "SOIL_LOSS_REVISION"
+UNIT_ROUTES = {
+    "/v1/units/general": GENERAL,
+    "/v1/units/excavation": EXCAVATION,
+    "/v1/units/pile": PILE
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ========== 请求/响应编解码 ==========
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as exc:
+        raise HTTPError(415, "Arrow 请求需要服务端安装 pyarrow") from exc
+    return pa
+
+
+def decode_units(body, content_type):
+    """请求体 → (单元 DataFrame, 是否为单个对象)"""
+    if content_type.startswith(ARROW_TYPE):
+        pa = _require_pyarrow()
+        try:
+            return pa.ipc.open_stream(body).read_all().to_pandas(), False
+        except pa.ArrowInvalid as exc:
+            raise HTTPError(400, f"Arrow 请求体无效: {exc}") from exc
+    try:
+        payload = json.loads(body or b"null")
+    except ValueError as exc:
+        raise HTTPError(400, f"JSON 请求体无效: {exc}") from exc
+    if isinstance(payload, list):
+        return pd.DataFrame.from_records(payload), False
+    if isinstance(payload, dict) and isinstance(payload.get("columns"), dict):
+        return pd.DataFrame(payload["columns"]), False
+    if isinstance(payload, dict):
+        return pd.DataFrame([payload]), True
+    raise HTTPError(400, "请求体应为单元对象、对象数组或 {\"columns\": {...}}")
+
+
+def encode_frame(frame, accept):
+    """结果表 → (Content-Type, 响应体)"""
+    if accept.startswith(ARROW_TYPE):
+        pa = _require_pyarrow()
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return ARROW_TYPE, sink.getvalue().to_pybytes()
+    records = frame.to_json(orient="records", force_ascii=False)
+    return JSON_TYPE, f'{{"n": {len(frame)}, "results": {records}}}'.encode()
+
+
+def _json(payload):
+    return JSON_TYPE, json.dumps(payload, ensure_ascii=False).encode()
+
+
+# ========== 计算 ==========
+def _with_defaults(frame, kind=None):
+    frame = frame.copy()
+    if kind is not None:
+        frame["disturbance_type"] = kind
+    if "project" not in frame.columns:
+        frame["project"] = ""
+    if "area" not in frame.columns:
+        frame["area"] = 1.0
+    return frame
+
+
+def evaluate_units(frame, kind=None, tables=None):
+    """向量化计算单元表，kind 非空时所有单元按该扰动类型计算"""
+    if "disturbance_type" not in frame.columns and kind is None:
+        raise HTTPError(400, "缺少 disturbance_type 列")
+    try:
+        return compute_units(_with_defaults(frame, kind), tables)
+    except (KeyError, ValueError, TypeError) as exc:
+        raise HTTPError(400, str(exc).strip("'\"")) from exc
+
+
+def summarize(results):
+    """单元结果 → (汇总表, 项目表)"""
+    totals = BatchTotals()
+    totals.add(results)
+    return totals.summary(), totals.project_table()
+
+
+def summary_payload(payload, tables=None):
+    """结果汇总接口：{"general": {...}, "excavation": {...}, "pile": {...}, "other_area": 面积}"""
+    if not isinstance(payload, dict):
+        raise HTTPError(400, "请求体应为对象")
+    rows = []
+    for key, kind in (("general", GENERAL), ("excavation", EXCAVATION), ("pile", PILE)):
+        if payload.get(key):
+            rows.append({**payload[key], "disturbance_type": kind})
+    rows.append({"disturbance_type": OTHER, "area": float(payload.get("other_area", 0.0))})
+    frame = pd.DataFrame.from_records(rows)
+    if frame.get("area") is None or frame["area"].isna().any():
+        raise HTTPError(400, "各扰动类型须给出 area")
+    results = evaluate_units(frame, tables=tables)
+    df_summary, _ = summarize(results)
+    # 与“结果汇总”标签页一致：单位流失量为各类型单元本身的值，平均值为四类算术平均
+    units = dict(zip(results["disturbance_type"], results["unit_loss"]))
+    df_summary[COL_UNIT] = [float(units.get(kind, 0.0)) for kind in DISTURBANCE_TYPES]
+    return {
+        "summary": df_summary.to_dict(orient="records"),
+        "total_loss": float(df_summary[COL_TOTAL].sum()),
+        "avg_unit_loss": float(df_summary[COL_UNIT].mean())
+    }
+
+
+# ========== 指标 ==========
+class Metrics:
+    """按接口统计请求数、错误数、单元数及最近 LATENCY_WINDOW 次请求的延迟"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.routes = {}
+
+    def record(self, route, seconds, units, error=False):
+        stats = self.routes.setdefault(route, {
+            "requests": 0, "errors": 0, "units": 0, "busy": 0.0,
+            "latency": deque(maxlen=LATENCY_WINDOW)
+        })
+        stats["requests"] += 1
+        stats["errors"] += int(error)
+        stats["units"] += units
+        stats["busy"] += seconds
+        stats["latency"].append(seconds)
+
+    def snapshot(self):
+        uptime = time.time() - self.started
+        routes = {}
+        for route, stats in self.routes.items():
+            latency = np.asarray(stats["latency"]) * 1000
+            p50, p95, p99 = np.percentile(latency, [50, 95, 99]) if len(latency) else (0.0, 0.0, 0.0)
+            routes[route] = {
+                "requests": stats["requests"],
+                "errors": stats["errors"],
+                "units": stats["units"],
+                "latency_ms": {"mean": float(latency.mean()) if len(latency) else 0.0,
+                               "p50": float(p50), "p95": float(p95), "p99": float(p99)},
+                # 按请求处理时间计的单元吞吐量（单进程满载时可达到的速率）
+                "units_per_second": stats["units"] / stats["busy"] if stats["busy"] > 0 else 0.0
+            }
+        return {"uptime_s": uptime, "pid": os.getpid(), "routes": routes}
+
+
+# ========== ASGI 应用 ==========
+class CalculationService:
+    """ASGI 应用；tables 为分类系数表（缺省为 engine.DEFAULT_TABLES）"""
+
+    def __init__(self, tables=None):
+        self.tables = tables
+        self.metrics = Metrics()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        started = time.perf_counter()
+        path = scope["path"].rstrip("/") or "/"
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        units, error = 0, False
+        try:
+            body = await self._read_body(receive, headers)
+            status, content_type, payload, units = await self._dispatch(
+                scope["method"], path, parse_qs(scope.get("query_string", b"").decode()), headers, body)
+        except HTTPError as exc:
+            status, (content_type, payload), error = exc.status, _json({"error": str(exc)}), True
+        except Exception as exc:  # noqa: BLE001 - 服务端错误也以 JSON 返回
+            status, (content_type, payload), error = 500, _json({"error": f"服务器内部错误: {exc}"}), True
+        elapsed = time.perf_counter() - started
+        if path != "/metrics":
+            self.metrics.record(path, elapsed, units, error)
+        await send({"type": "http.response.start", "status": status, "headers": [
+            (b"content-type", content_type.encode()),
+            (b"content-length", str(len(payload)).encode()),
+            (b"x-units", str(units).encode()),
+            (b"server-timing", f"calc;dur={elapsed * 1000:.2f}".encode())
+        ]})
+        await send({"type": "http.response.body", "body": payload})
+
+    @staticmethod
+    async def _lifespan(receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def _read_body(receive, headers):
+        if int(headers.get("content-length") or 0) > MAX_BODY:
+            raise HTTPError(413, f"请求体超过 {MAX_BODY // 1024 // 1024} MB")
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY:
+                raise HTTPError(413, f"请求体超过 {MAX_BODY // 1024 // 1024} MB")
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                break
+        return b"".join(chunks)
+
+    async def _dispatch(self, method, path, query, headers, body):
+        if path == "/health":
+            return (200, *_json({"status": "ok"}), 0)
+        if path == "/metrics":
+            return (200, *_json(self.metrics.snapshot()), 0)
+        if path not in UNIT_ROUTES and path not in ("/v1/batch", "/v1/summary"):
+            raise HTTPError(404, f"未知的接口: {path}")
+        if method != "POST":
+            raise HTTPError(405, "仅支持 POST")
+        content_type = headers.get("content-type", JSON_TYPE)
+        accept = headers.get("accept", JSON_TYPE)
+
+        if path == "/v1/summary":
+            try:
+                payload = json.loads(body or b"null")
+            except ValueError as exc:
+                raise HTTPError(400, f"JSON 请求体无效: {exc}") from exc
+            result = await asyncio.to_thread(summary_payload, payload, self.tables)
+            return (200, *_json(result), len(result["summary"]))
+
+        frame, single = decode_units(body, content_type)
+        if frame.empty:
+            raise HTTPError(400, "请求中没有单元")
+        kind = UNIT_ROUTES.get(path)
+
+        def run():
+            results = evaluate_units(frame, kind, self.tables)
+            if single:
+                return _json(json.loads(results.iloc[:1].to_json(orient="records", force_ascii=False))[0])
+            if path == "/v1/batch" and query.get("summary", ["1"])[0] != "0" and not accept.startswith(ARROW_TYPE):
+                df_summary, df_projects = summarize(results)
+                records = results[RESULT_COLUMNS].to_json(orient="records", force_ascii=False)
+                return JSON_TYPE, (f'{{"n": {len(results)}, "results": {records}, '
+                                   f'"summary": {df_summary.to_json(orient="records", force_ascii=False)}, '
+                                   f'"projects": {df_projects.to_json(orient="records", force_ascii=False)}}}'
+                                   ).encode()
+            return encode_frame(results[RESULT_COLUMNS], accept)
+
+        content_type, payload = await asyncio.to_thread(run)
+        return 200, content_type, payload, len(frame)
+
+
+def create_app(params_db=None, revision=None):
+    """按参数库版本创建服务；两者皆空时使用内置参数表"""
+    revision = revision or os.environ.get(REVISION_ENV)
+    tables = None
+    if params_db or revision:
+        from .params import DEFAULT_REVISION, ParameterStore
+        store = ParameterStore(params_db, revision or DEFAULT_REVISION)
+        if store.revision not in store.revisions():
+            raise ValueError(f"参数库中没有版本: {store.revision}")
+        tables = store.tables()
+    return CalculationService(tables)
+
+
+app = CalculationService()
+
+
+# ========== 进程内测试客户端 ==========
+class LocalResponse:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+    def frame(self):
+        """Arrow 响应体 → DataFrame"""
+        import pyarrow as pa
+        return pa.ipc.open_stream(self.body).read_all().to_pandas()
+
+
+class LocalClient:
+    """不经网络直接调用 ASGI 应用，便于本地测试和基准测试"""
+
+    def __init__(self, app=None):
+        self.app = app or CalculationService()
+        self._loop = asyncio.new_event_loop()
+
+    def close(self):
+        self._loop.close()
+
+    def request(self, method, path, body=b"", headers=None):
+        path, _, query = path.partition("?")
+        headers = dict(headers or {})
+        headers.setdefault("content-length", str(len(body)))
+        scope = {
+            "type": "http", "method": method, "path": path, "query_string": query.encode(),
+            "headers": [(k.lower().encode(), str(v).encode()) for k, v in headers.items()]
+        }
+        sent = []
+        messages = deque([{"type": "http.request", "body": body, "more_body": False}])
+
+        async def receive():
+            return messages.popleft() if messages else {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        self._loop.run_until_complete(self.app(scope, receive, send))
+        start = sent[0]
+        response_headers = {k.decode(): v.decode() for k, v in start["headers"]}
+        return LocalResponse(start["status"], response_headers, b"".join(m.get("body", b"") for m in sent[1:]))
+
+    def get(self, path, headers=None):
+        return self.request("GET", path, headers=headers)
+
+    def post(self, path, json_body=None, data=None, headers=None):
+        headers = dict(headers or {})
+        if json_body is not None:
+            data = json.dumps(json_body, ensure_ascii=False).encode()
+            headers.setdefault("content-type", JSON_TYPE)
+        return self.request("POST", path, data or b"", headers)
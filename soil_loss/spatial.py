@@ -0,0 +1,142 @@
+"""空间数据输入：由扰动区多边形图层（GeoPackage/GeoJSON/Shapefile）直接测算
+
+每个多边形为一个扰动单元，属性列与批量单元表相同（见 batch.COLUMN_DEFAULTS）:
+- 面积: 按多边形投影面积计算 (hm²)，覆盖图层中的 area 属性；地理坐标系图层先转换到所在 UTM 带;
+- R、K 等参数: 单元属性缺失时，从分区图层（降雨侵蚀力分区、土壤图等）按最大重叠面积取值。
+  分区多边形建 STRtree（R 树）索引，只对包围盒相交的候选对计算交集，10 万级多边形无需两两比较;
+- 结果: 原属性加 LS、单位面积流失量、总流失量，按原坐标系写回图层。
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .batch import COLUMN_DEFAULTS, REQUIRED_COLUMNS, RESULT_COLUMNS, BatchTotals, compute_units
+from .summary import DISTURBANCE_TYPES
+
+# 可由分区图层提供的单元参数列
+JOIN_COLUMNS = [c for c in COLUMN_DEFAULTS if c not in REQUIRED_COLUMNS]
+SQUARE_METRES_PER_HM2 = 10_000.0
+
+
+def _require_geopandas():
+    try:
+        import geopandas
+    except ImportError as exc:
+        raise ImportError("读写空间图层需要安装 geopandas: pip install geopandas") from exc
+    return geopandas
+
+
+def read_layer(path, layer=None):
+    """读取多边形图层；layer 为 GeoPackage 中的图层名，缺省取第一个图层"""
+    gpd = _require_geopandas()
+    return gpd.read_file(path, layer=layer)
+
+
+def projected(frame):
+    """地理坐标系（经纬度）图层转换到所在 UTM 带，投影坐标系或未设坐标系的图层原样返回"""
+    if frame.crs is not None and frame.crs.is_geographic:
+        return frame.to_crs(frame.estimate_utm_crs())
+    return frame
+
+
+def polygon_areas(frame):
+    """各多边形的投影面积 (hm²)"""
+    return projected(frame).geometry.area.to_numpy() / SQUARE_METRES_PER_HM2
+
+
+def type_areas(frame, type_column="disturbance_type"):
+    """按扰动类型汇总投影面积 (hm²)，返回与 DISTURBANCE_TYPES 顺序一致的列表"""
+    if type_column not in frame.columns:
+        raise ValueError(f"图层缺少扰动类型列: {type_column}")
+    areas = pd.Series(polygon_areas(frame)).groupby(frame[type_column].to_numpy()).sum()
+    unknown = set(areas.index) - set(DISTURBANCE_TYPES)
+    if unknown:
+        raise ValueError(f"未知的扰动类型: {', '.join(map(str, unknown))}")
+    return [float(areas.get(t, 0.0)) for t in DISTURBANCE_TYPES]
+
+
+# ========== 空间连接 ==========
+def largest_overlap(units, zones):
+    """每个单元重叠面积最大的分区序号，不与任何分区相交时为 -1
+
+    先用分区的 STRtree 索引查询包围盒相交且几何相交的候选对；只与一个分区相交的单元直接取该分区，
+    其余候选对才计算交集面积。
+    """
+    unit_idx, zone_idx = zones.sindex.query(units.geometry, predicate="intersects")
+    chosen = np.full(len(units), -1, dtype=np.int64)
+    if not len(unit_idx):
+        return chosen
+    overlap = np.ones(len(unit_idx))
+    multi = np.bincount(unit_idx, minlength=len(units))[unit_idx] > 1
+    if multi.any():
+        a = units.geometry.iloc[unit_idx[multi]].reset_index(drop=True)
+        b = zones.geometry.iloc[zone_idx[multi]].reset_index(drop=True)
+        overlap[multi] = a.intersection(b).area.to_numpy()
+    # 按 (单元, 重叠面积降序) 排序后取每个单元的第一对
+    order = np.lexsort((-overlap, unit_idx))
+    first = order[np.r_[True, unit_idx[order][1:] != unit_idx[order][:-1]]]
+    chosen[unit_idx[first]] = zone_idx[first]
+    return chosen
+
+
+def join_attributes(units, zones, columns=None):
+    """从分区图层取属性，单元已有的非空值不覆盖
+
+    columns 缺省为分区图层中与单元参数同名的列（R、K、soil_type 等）。
+    两个图层坐标系不同时分区图层转换到单元图层的坐标系。
+    """
+    columns = [c for c in JOIN_COLUMNS if c in zones.columns] if columns is None else list(columns)
+    if not columns:
+        return units
+    if zones.crs is not None and units.crs is not None and zones.crs != units.crs:
+        zones = zones.to_crs(units.crs)
+    chosen = largest_overlap(units, zones)
+    matched = chosen >= 0
+    units = units.copy()
+    for column in columns:
+        values = pd.Series(zones[column].to_numpy()[np.maximum(chosen, 0)], index=units.index).where(matched)
+        units[column] = units[column].fillna(values) if column in units.columns else values
+    return units
+
+
+# ========== 测算 ==========
+def compute_layer(units, zones=(), tables=None, project=None, type_column="disturbance_type"):
+    """测算扰动区图层，返回附加 area、LS、unit_loss、total_loss 列的图层（原坐标系）
+
+    zones 为分区图层序列，靠前的图层优先；project 为图层无 project 列时的项目名。
+    """
+    if type_column != "disturbance_type":
+        units = units.rename(columns={type_column: "disturbance_type"})
+    if "project" not in units.columns:
+        units = units.assign(project=project or "")
+    work = projected(units)
+    for zone in zones:
+        work = join_attributes(work, zone)
+    work["area"] = work.geometry.area.to_numpy() / SQUARE_METRES_PER_HM2
+    results = compute_units(pd.DataFrame(work.drop(columns=work.geometry.name)), tables)
+    output = units.copy()
+    for column in JOIN_COLUMNS:
+        if column in work.columns:
+            output[column] = work[column].to_numpy()
+    for column in RESULT_COLUMNS:
+        output[column] = results[column].to_numpy()
+    return output
+
+
+def write_layer(frame, path, layer=None):
+    """写出结果图层，格式按扩展名推断 (.gpkg/.geojson/.shp)"""
+    frame.to_file(path, layer=layer)
+
+
+def run_spatial(input_path, output_path=None, zone_paths=(), layer=None, output_layer=None, tables=None,
+                project=None, type_column="disturbance_type"):
+    """空间测算入口：读取扰动区图层和分区图层，写出逐多边形结果图层，返回累计汇总 BatchTotals"""
+    units = read_layer(input_path, layer)
+    zones = [read_layer(path) for path in zone_paths]
+    result = compute_layer(units, zones, tables, project or Path(input_path).stem, type_column)
+    if output_path:
+        write_layer(result, output_path, output_layer)
+    totals = BatchTotals()
+    totals.add(pd.DataFrame(result[RESULT_COLUMNS]))
+    return totals
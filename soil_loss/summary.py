@@ -0,0 +1,31 @@
+"""结果汇总：与“结果汇总”标签页 df_summary 相同的表格布局"""
+import pandas as pd
+
+GENERAL = "一般扰动地表"
+EXCAVATION = "工程开挖面"
+PILE = "工程堆积体"
+OTHER = "其他扰动"
+DISTURBANCE_TYPES = [GENERAL, EXCAVATION, PILE, OTHER]
+
+COL_TYPE = "扰动类型"
+COL_AREA = "面积(hm²)"
+COL_UNIT = "单位流失量(t/hm²)"
+COL_TOTAL = "总流失量(t)"
+
+
+def summary_frame(areas, unit_losses, total_losses):
+    """按扰动类型顺序构建汇总表，参数为与 DISTURBANCE_TYPES 对应的列表"""
+    return pd.DataFrame({
+        COL_TYPE: DISTURBANCE_TYPES,
+        COL_AREA: list(areas),
+        COL_UNIT: list(unit_losses),
+        COL_TOTAL: list(total_losses)
+    })
+
+
+def summary_from_totals(area_by_type, loss_by_type):
+    """由各类型累计面积和累计流失量构建汇总表，单位流失量按面积加权"""
+    areas = [float(area_by_type.get(t, 0.0)) for t in DISTURBANCE_TYPES]
+    totals = [float(loss_by_type.get(t, 0.0)) for t in DISTURBANCE_TYPES]
+    units = [total / area if area > 0 else 0.0 for area, total in zip(areas, totals)]
+    return summary_frame(areas, units, totals)
@@ -0,0 +1,177 @@
+"""参数扫描：在 N 维参数网格上一次性计算单位面积流失量（响应面），按切片查看
+
+每个扫描轴为一个公式输入（连续参数给定取值序列，分类参数给定选项列表），其余输入取现状值。
+各轴取值整形为互相正交的广播形状后直接代入 engine 向量化公式，不展开完整网格的输入数组；
+为控制中间数组大小，沿第一轴分块计算。结果 ResponseSurface 保存整个网格，
+二维剖面、一维曲线都是对该数组的索引，切换切片位置不重新计算。
+"""
+import numpy as np
+
+from . import engine
+from .batch import CATEGORY_TABLES, COLUMN_DEFAULTS
+from .summary import EXCAVATION, GENERAL, PILE
+
+MAX_CELLS = 20_000_000
+BLOCK_CELLS = 1_000_000
+DEFAULT_STEPS = 46
+
+# 各公式可扫描的输入
+AXES = {
+    GENERAL: ["R", "K", "C", "P", "T", "slope_length", "slope_angle"],
+    EXCAVATION: ["R", "soil_type", "saturation", "slope_height", "slope_angle"],
+    PILE: ["R", "pile_height", "pile_angle", "pile_length", "shape", "material", "gradation", "contains_clay",
+           "compaction"]
+}
+LABELS = {
+    "R": "R 降雨侵蚀力",
+    "K": "K 土壤可蚀性",
+    "C": "C 植被覆盖",
+    "P": "P 水保措施",
+    "T": "T 耕作管理",
+    "slope_length": "坡长 (m)",
+    "slope_angle": "坡度 (°)",
+    "slope_height": "坡高 (m)",
+    "soil_type": "土体类型",
+    "saturation": "饱和度",
+    "pile_height": "堆高 (m)",
+    "pile_angle": "堆积坡度 (°)",
+    "pile_length": "坡长 L (m)",
+    "shape": "堆积体形状",
+    "material": "材料",
+    "gradation": "级配",
+    "contains_clay": "含黏粒",
+    "compaction": "压实度 (%)"
+}
+# 连续参数默认扫描范围
+DEFAULT_RANGES = {
+    "R": (500.0, 10_000.0),
+    "K": (0.05, 0.5),
+    "C": (0.0, 1.0),
+    "P": (0.0, 1.0),
+    "T": (0.4, 1.0),
+    "slope_length": (5.0, 200.0),
+    "slope_angle": (0.0, 90.0),
+    "slope_height": (1.0, 30.0),
+    "pile_height": (1.0, 30.0),
+    "pile_angle": (5.0, 45.0),
+    "pile_length": (5.0, 100.0),
+    "compaction": (0.0, 100.0)
+}
+
+
+def is_categorical(name):
+    return name in CATEGORY_TABLES or name == "contains_clay"
+
+
+def default_axis(name, steps=DEFAULT_STEPS, tables=None):
+    """扫描轴默认取值：连续参数为默认范围内等距 steps 个值，分类参数为参数表全部选项"""
+    if name == "contains_clay":
+        return [True, False]
+    if name in CATEGORY_TABLES:
+        return list((tables or engine.DEFAULT_TABLES)[CATEGORY_TABLES[name]])
+    return np.linspace(*DEFAULT_RANGES[name], steps)
+
+
+def _unit_loss(kind, p, tables):
+    if kind == GENERAL:
+        LS = engine.ls_factor(p["slope_length"], p["slope_angle"]) if "LS" not in p else p["LS"]
+        return engine.general_unit_loss(p["R"], p["K"], LS, p["C"], p["P"], p["T"])
+    if kind == EXCAVATION:
+        return engine.excavation_loss(p["R"], p["soil_type"], p["saturation"], p["slope_height"],
+                                      p["slope_angle"], 1.0, tables)[0]
+    return engine.pile_loss(p["R"], p["pile_height"], p["pile_angle"], p["pile_length"], p["shape"],
+                            p["material"], p["gradation"], p["contains_clay"], p["compaction"], 1.0, tables)[2]
+
+
+def evaluate(kind, inputs, axes, tables=None):
+    """在扫描网格上计算单位面积流失量，返回 ResponseSurface
+
+    inputs 为该公式的现状输入（同 uncertainty.simulate，含 area），缺少的输入取批量表缺省值；
+    axes 为 {输入名: 取值序列}，按给定顺序构成网格的各维。
+    """
+    tables = tables or engine.DEFAULT_TABLES
+    unknown = [name for name in axes if name not in AXES[kind]]
+    if unknown:
+        raise ValueError(f"{kind}公式没有可扫描的参数: {', '.join(unknown)}")
+    axes = {name: (list(values) if is_categorical(name) else np.asarray(values, dtype=np.float64))
+            for name, values in axes.items()}
+    shape = tuple(len(values) for values in axes.values())
+    if not shape or min(shape) == 0:
+        raise ValueError("扫描轴不能为空")
+    cells = int(np.prod(shape, dtype=np.int64))
+    if cells > MAX_CELLS:
+        raise ValueError(f"网格共 {cells:,} 个格点，超过上限 {MAX_CELLS:,}，请减少轴数或取值个数")
+
+    params = {name: inputs.get(name, COLUMN_DEFAULTS.get(name)) for name in AXES[kind]}
+    if kind == GENERAL and "LS" in inputs and not {"slope_length", "slope_angle"} & set(axes):
+        # 多坡段输入且不扫描坡长、坡度时沿用其 LS
+        params["LS"] = inputs["LS"]
+    ndim = len(shape)
+    grids = {}
+    for i, (name, values) in enumerate(axes.items()):
+        if name in CATEGORY_TABLES:
+            values = engine.encode(tables[CATEGORY_TABLES[name]], np.asarray(values))
+        grids[name] = np.asarray(values).reshape([-1 if j == i else 1 for j in range(ndim)])
+
+    unit = np.empty(shape, dtype=np.float64)
+    first = next(iter(axes))
+    block = max(1, BLOCK_CELLS // (cells // shape[0]))
+    for start in range(0, shape[0], block):
+        stop = min(start + block, shape[0])
+        p = {**params, **grids, first: grids[first][start:stop]}
+        unit[start:stop] = _unit_loss(kind, p, tables)
+    return ResponseSurface(kind, axes, unit, float(inputs.get("area", 0.0)))
+
+
+class ResponseSurface:
+    """扫描网格上的单位面积流失量 (t/hm²)，unit 的各维依次对应 axes"""
+
+    def __init__(self, kind, axes, unit, area):
+        self.kind = kind
+        self.axes = axes
+        self.unit = unit
+        self.area = area
+
+    @property
+    def names(self):
+        return list(self.axes)
+
+    @property
+    def nbytes(self):
+        return self.unit.nbytes
+
+    def index(self, name, value):
+        """轴上与 value 最接近的取值序号（分类轴按名称匹配）"""
+        values = self.axes[name]
+        if is_categorical(name):
+            return list(values).index(value)
+        return int(np.abs(values - float(value)).argmin())
+
+    def _take(self, keep, fixed):
+        fixed = fixed or {}
+        index = []
+        for name in self.axes:
+            if name in keep:
+                index.append(slice(None))
+            elif name in fixed:
+                index.append(self.index(name, fixed[name]))
+            else:
+                index.append(0)
+        return self.unit[tuple(index)]
+
+    def section(self, x, y, fixed=None, total=False):
+        """二维剖面 (x 取值, y 取值, Z)，Z[i, j] 对应 y 第 i 个、x 第 j 个取值
+
+        未固定的其他轴取第一个值；total 为 True 时乘以面积得到总流失量 (t)。返回数组为网格的视图或小拷贝。
+        """
+        if x == y:
+            raise ValueError("x、y 轴不能相同")
+        z = self._take({x, y}, fixed)
+        if self.names.index(x) < self.names.index(y):
+            z = z.T
+        return self.axes[x], self.axes[y], z * self.area if total else z
+
+    def profile(self, x, fixed=None, total=False):
+        """一维曲线 (x 取值, 流失量)"""
+        z = self._take({x}, fixed)
+        return self.axes[x], z * self.area if total else z
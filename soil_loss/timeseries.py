@@ -0,0 +1,124 @@
+"""施工期逐月土壤流失量模拟
+
+年 R 按地区典型逐月分配比例拆分为逐月降雨侵蚀力；各扰动单元的面积、C、P
+按施工分期表逐月变化。全部单元按 (月份 × 单元) 矩阵一次性计算:
+
+    流失量[t, u] = R月[t, u] × 系数[u] × C[t, u] × P[t, u] × 面积[t, u]
+
+系数[u] 为 R=C=P=1 时的单位面积流失量（一般扰动地表为 K×LS×T，开挖面、堆积体为
+各自公式除以 R）。开挖面、堆积体公式不含 C，分期表中的 P 作为防护措施折减系数。
+"""
+import numpy as np
+import pandas as pd
+
+from . import engine
+from .summary import DISTURBANCE_TYPES
+
+PHASE_COLUMNS = ["unit", "start", "end", "area", "C", "P"]
+
+
+def monthly_shares(region, shares=None):
+    """地区逐月 R 分配比例（和为 1），shares 缺省为 engine.R_MONTHLY_SHARES"""
+    values = np.asarray((shares or engine.R_MONTHLY_SHARES)[region], dtype=np.float64)
+    return values / values.sum()
+
+
+def erosivity_matrix(annual_R, regions, n_months, start_month=1, shares=None):
+    """(月份 × 单元) 逐月降雨侵蚀力，start_month 为施工起始月 (1-12)"""
+    shares = shares or engine.R_MONTHLY_SHARES
+    annual_R = np.atleast_1d(np.asarray(annual_R, dtype=np.float64))
+    table = np.array([monthly_shares(r, shares) for r in shares])
+    codes = np.broadcast_to(engine.encode(shares, regions), annual_R.shape)
+    calendar = (start_month - 1 + np.arange(n_months)) % 12
+    return table[codes[np.newaxis, :], calendar[:, np.newaxis]] * annual_R
+
+
+class Schedule:
+    """分期表展开后的 (月份, 单元) 格索引，面积、C、P 矩阵共用同一索引
+
+    每个分期覆盖 start..end 月（从 1 起、含两端），同一格被多个分期覆盖时后面的分期优先。
+    """
+
+    def __init__(self, n_months, n_units, units, starts, ends):
+        self.shape = (n_months, n_units)
+        starts = np.clip(np.asarray(starts, dtype=np.int64), 1, n_months)
+        ends = np.clip(np.asarray(ends, dtype=np.int64), 0, n_months)
+        lengths = np.maximum(ends - starts + 1, 0)
+        total = int(lengths.sum())
+
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        months = np.repeat(starts - 1, lengths) + offsets
+        units = np.repeat(np.asarray(units, dtype=np.int64), lengths)
+        phase = np.repeat(np.arange(len(lengths)), lengths)
+        cells = months * n_units + units
+
+        winner = np.full(n_months * n_units, -1, dtype=np.int64)
+        np.maximum.at(winner, cells, phase)
+        keep = winner[cells] == phase
+        self.cells = cells[keep]
+        self.units = units[keep]
+        self.phase = phase[keep]
+
+    def matrix(self, values, base, outside=None):
+        """分期值为 NaN 时取单元基础值 base，不在任何分期内的格取 outside（缺省为 base）"""
+        base = np.asarray(base, dtype=np.float64)
+        matrix = np.empty(self.shape)
+        matrix[:] = base if outside is None else outside
+        values = np.asarray(values, dtype=np.float64)[self.phase]
+        matrix.reshape(-1)[self.cells] = np.where(np.isnan(values), base[self.units], values)
+        return matrix
+
+
+class MonthlyResult:
+    """逐月计算结果：loss 为 (月份 × 单元) 流失量矩阵 (t)"""
+
+    def __init__(self, loss, kinds, start_month=1, start_year=None):
+        self.loss = loss
+        self.kinds = np.asarray(kinds)
+        self.start_month = start_month
+        self.start_year = start_year
+
+    @property
+    def cumulative(self):
+        return np.cumsum(self.loss, axis=0)
+
+    @property
+    def unit_totals(self):
+        return self.loss.sum(axis=0)
+
+    def month_labels(self):
+        months = self.start_month - 1 + np.arange(self.loss.shape[0])
+        if self.start_year is None:
+            return [f"第{i + 1}月" for i in range(len(months))]
+        return [f"{self.start_year + m // 12}-{m % 12 + 1:02d}" for m in months]
+
+    def by_type(self):
+        """逐月各扰动类型流失量及累计流失量"""
+        frame = pd.DataFrame({"月份": self.month_labels()})
+        for kind in DISTURBANCE_TYPES:
+            frame[kind] = self.loss[:, self.kinds == kind].sum(axis=1)
+        frame["合计(t)"] = frame[DISTURBANCE_TYPES].sum(axis=1)
+        frame["累计(t)"] = frame["合计(t)"].cumsum()
+        return frame
+
+
+def simulate_period(coefficients, kinds, annual_R, regions, base_area, base_C, base_P, phases,
+                    n_months, start_month=1, start_year=None, shares=None):
+    """逐月模拟
+
+    coefficients: 各单元 R=C=P=1 时的单位面积流失量；kinds: 各单元扰动类型；
+    phases: 分期表 DataFrame，列为 unit(单元序号)、start、end(月)、area、C、P，
+            area/C/P 为 NaN 时取单元基础值；不在任何分期内的月份面积为 0；
+    shares: 各地区逐月 R 分配比例，可由参数库按版本提供。
+    """
+    missing = [c for c in PHASE_COLUMNS if c not in phases.columns]
+    if missing:
+        raise ValueError(f"分期表缺少必需列: {', '.join(missing)}")
+    coefficients = np.asarray(coefficients, dtype=np.float64)
+    schedule = Schedule(n_months, len(coefficients), phases["unit"], phases["start"], phases["end"])
+    loss = erosivity_matrix(annual_R, regions, n_months, start_month, shares)
+    loss *= coefficients
+    loss *= schedule.matrix(phases["C"], np.broadcast_to(base_C, coefficients.shape))
+    loss *= schedule.matrix(phases["P"], np.broadcast_to(base_P, coefficients.shape))
+    loss *= schedule.matrix(phases["area"], np.broadcast_to(base_area, coefficients.shape), outside=0.0)
+    return MonthlyResult(loss, kinds, start_month, start_year)
@@ -0,0 +1,222 @@
+"""蒙特卡洛不确定性分析
+
+各因子可给定为常数或 Distribution，每次模拟按抽样次数一次性生成全部样本，
+三类扰动公式对整组样本向量化计算，输出单位流失量和总流失量的分位数。
+同一个 Distribution 对象在一次模拟中只抽样一次，可用于在多个扰动类型间共享
+同一组降雨侵蚀力 R 样本。
+"""
+import numpy as np
+import pandas as pd
+
+from . import engine
+from .summary import COL_AREA, COL_TYPE, DISTURBANCE_TYPES, EXCAVATION, GENERAL, OTHER, PILE
+
+DEFAULT_DRAWS = 100_000
+DEFAULT_PERCENTILES = (5, 50, 95)
+TOTAL_LABEL = "合计"
+
+
+class Distribution:
+    """因子抽样分布: uniform(下限, 上限) / normal(均值, 标准差) / triangular(下限, 众数, 上限)"""
+
+    def __init__(self, kind, *params, lower=None, upper=None):
+        if kind not in ("uniform", "normal", "triangular"):
+            raise ValueError(f"未知的分布类型: {kind}")
+        self.kind = kind
+        self.params = params
+        self.lower = lower
+        self.upper = upper
+
+    def sample(self, rng, n):
+        if self.kind == "uniform":
+            values = rng.uniform(*self.params, size=n)
+        elif self.kind == "normal":
+            values = rng.normal(*self.params, size=n)
+        else:
+            lo, mode, hi = self.params
+            values = rng.triangular(lo, mode, hi, size=n) if hi > lo else np.full(n, float(mode))
+        if self.lower is not None or self.upper is not None:
+            np.clip(values, self.lower, self.upper, out=values)
+        return values
+
+    def __repr__(self):
+        return f"Distribution({self.kind!r}, {', '.join(map(str, self.params))})"
+
+
+def uniform(lo, hi):
+    return Distribution("uniform", lo, hi)
+
+
+def normal(mean, sd, lower=0.0, upper=None):
+    return Distribution("normal", mean, sd, lower=lower, upper=upper)
+
+
+def triangular(lo, mode, hi):
+    return Distribution("triangular", lo, mode, hi)
+
+
+def around(value, lo, hi):
+    """以输入值为众数、参数手册范围为上下限的三角分布（范围不含输入值时自动扩展）"""
+    return triangular(min(lo, value), value, max(hi, value))
+
+
+def spread(value, fraction, lower=0.0, upper=None):
+    """输入值 ±fraction 的均匀分布，并截断到 [lower, upper]"""
+    lo, hi = value * (1 - fraction), value * (1 + fraction)
+    if lower is not None:
+        lo = max(lo, lower)
+    if upper is not None:
+        hi = min(hi, upper)
+    return Distribution("uniform", lo, hi) if hi > lo else value
+
+
+def region_r(region, value=None, ranges=None):
+    """地区 R 因子默认分布（参数查询手册范围，ranges 缺省为 engine.R_FACTOR_RANGES）"""
+    lo, hi = (ranges or engine.R_FACTOR_RANGES)[region]
+    return around(engine.R_FACTOR_DB[region] if value is None else value, lo, hi)
+
+
+def soil_k(soil_type, value=None, ranges=None):
+    """土壤类型 K 因子默认分布（参数查询手册范围，ranges 缺省为 engine.K_FACTOR_RANGES）"""
+    lo, hi = (ranges or engine.K_FACTOR_RANGES)[soil_type]
+    return around(engine.K_FACTOR_DB[soil_type] if value is None else value, lo, hi)
+
+
+# 按输入值 ±fraction 抽样的因子及其上限
+SPREAD_FACTORS = {
+    "C": 1.0,
+    "P": 1.0,
+    "slope_length": None,
+    "slope_angle": 90.0,
+    "slope_height": None,
+    "pile_height": None,
+    "pile_angle": 90.0,
+    "pile_length": None,
+    "compaction": 100.0
+}
+
+
+def default_distributions(general, excavation, pile, region, soil_type, fraction=0.1,
+                          r_ranges=None, k_ranges=None):
+    """将各类型的确定性输入转换为默认抽样分布
+
+    R 取所在地区、K 取主要土壤类型的参数手册范围（以输入值为众数的三角分布），
+    输入值相同的 R 共享同一组样本；C、P 与几何参数取 ±fraction 均匀分布；
+    分类参数、T 与面积保持不变。r_ranges/k_ranges 可由参数库按版本提供。
+    """
+    shared_r = {}
+
+    def convert(inputs):
+        if not inputs:
+            return inputs
+        result = dict(inputs)
+        for name, value in inputs.items():
+            if name == "R":
+                if value not in shared_r:
+                    shared_r[value] = region_r(region, value, r_ranges)
+                result[name] = shared_r[value]
+            elif name == "K":
+                result[name] = soil_k(soil_type, value, k_ranges)
+            elif name in SPREAD_FACTORS and fraction > 0:
+                result[name] = spread(value, fraction, upper=SPREAD_FACTORS[name])
+        return result
+
+    return convert(general), convert(excavation), convert(pile)
+
+
+class _Sampler:
+    def __init__(self, rng, n):
+        self.rng = rng
+        self.n = n
+        self._drawn = {}
+
+    def __call__(self, value):
+        if not isinstance(value, Distribution):
+            return value
+        if id(value) not in self._drawn:
+            self._drawn[id(value)] = value.sample(self.rng, self.n)
+        return self._drawn[id(value)]
+
+
+class MonteCarloResult:
+    """各扰动类型每次抽样的单位流失量与总流失量"""
+
+    def __init__(self, units, totals, areas, n_draws):
+        self.units = units
+        self.totals = totals
+        self.areas = areas
+        self.n_draws = n_draws
+
+    @property
+    def project_total(self):
+        total = np.zeros(self.n_draws)
+        for values in self.totals.values():
+            total += values
+        return total
+
+    def percentiles(self, q=DEFAULT_PERCENTILES):
+        """按 df_summary 的扰动类型顺序输出均值与分位数，末行为项目合计"""
+        rows = []
+        total_area = 0.0
+        for kind in DISTURBANCE_TYPES:
+            area = float(np.mean(self.areas.get(kind, 0.0)))
+            total_area += area
+            unit = self.units.get(kind, np.zeros(1))
+            total = self.totals.get(kind, np.zeros(1))
+            rows.append(self._row(kind, area, unit, total, q))
+        total = self.project_total
+        unit = total / total_area if total_area > 0 else np.zeros(1)
+        rows.append(self._row(TOTAL_LABEL, total_area, unit, total, q))
+        return pd.DataFrame(rows)
+
+    @staticmethod
+    def _row(kind, area, unit, total, q):
+        row = {COL_TYPE: kind, COL_AREA: area}
+        unit_q = np.percentile(unit, q)
+        total_q = np.percentile(total, q)
+        row["单位流失量均值"] = float(np.mean(unit))
+        for p, value in zip(q, unit_q):
+            row[f"单位流失量P{p:g}"] = value
+        row["总流失量均值(t)"] = float(np.mean(total))
+        for p, value in zip(q, total_q):
+            row[f"总流失量P{p:g}(t)"] = value
+        return row
+
+
+def simulate(general=None, excavation=None, pile=None, other_area=0.0, n_draws=DEFAULT_DRAWS, seed=None,
+             tables=None):
+    """对一个项目运行蒙特卡洛模拟
+
+    general:    R, K, C, P, T, area 以及 slope_length + slope_angle 或 LS
+    excavation: R, soil_type, saturation, slope_height, slope_angle, area
+    pile:       R, pile_height, pile_angle, pile_length, shape, material, gradation,
+                contains_clay, compaction, area
+    数值参数可为常数或 Distribution；seed 相同则结果可复现；tables 为分类系数表。
+    """
+    draw = _Sampler(np.random.default_rng(seed), n_draws)
+    units, totals, areas = {}, {}, {}
+
+    def full(values):
+        return np.broadcast_to(values, (n_draws,))
+
+    if general:
+        g = {name: draw(value) for name, value in general.items()}
+        LS = g["LS"] if "LS" in g else engine.ls_factor(g["slope_length"], g["slope_angle"])
+        unit = engine.general_unit_loss(g["R"], g["K"], LS, g["C"], g["P"], g["T"])
+        units[GENERAL], totals[GENERAL], areas[GENERAL] = full(unit), full(unit * g["area"]), g["area"]
+
+    if excavation:
+        e = {name: draw(value) for name, value in excavation.items()}
+        unit, total = engine.excavation_loss(e["R"], e["soil_type"], e["saturation"],
+                                             e["slope_height"], e["slope_angle"], e["area"], tables)
+        units[EXCAVATION], totals[EXCAVATION], areas[EXCAVATION] = full(unit), full(total), e["area"]
+
+    if pile:
+        p = {name: draw(value) for name, value in pile.items()}
+        _, _, unit, total = engine.pile_loss(p["R"], p["pile_height"], p["pile_angle"], p["pile_length"],
+                                             p["shape"], p["material"], p["gradation"],
+                                             p["contains_clay"], p["compaction"], p["area"], tables)
+        units[PILE], totals[PILE], areas[PILE] = full(unit), full(total), p["area"]
+
+    areas[OTHER] = draw(other_area)
+    return MonteCarloResult(units, totals, areas, n_draws)
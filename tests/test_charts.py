@@ -0,0 +1,48 @@
+"""图表降采样与分箱：保留计数、端点和形状"""
+import numpy as np
+import pandas as pd
+
+from soil_loss import charts
+
+
+def test_lttb_keeps_endpoints_and_peak():
+    x = np.arange(10_000, dtype=float)
+    y = np.sin(x / 500)
+    y[4321] = 10.0
+    index = charts.lttb_indices(x, y, 200)
+    assert len(index) == 200
+    assert index[0] == 0 and index[-1] == len(x) - 1
+    assert np.all(np.diff(index) > 0)
+    assert 4321 in index
+
+
+def test_histogram_counts_all_positive_values():
+    values = np.array([0.0, -1.0, np.nan, 0.5, 5.0, 50.0, 500.0])
+    edges, counts = charts.histogram(values, bins=10, log=True)
+    assert counts.sum() == 4
+    assert np.isclose(edges[0], 0.5) and np.isclose(edges[-1], 500.0)
+
+
+def test_file_distribution_matches_in_memory(tmp_path):
+    rng = np.random.default_rng(1)
+    frame = pd.DataFrame({"unit_loss": rng.lognormal(3, 2, 5000),
+                          "disturbance_type": rng.choice(["一般扰动地表", "工程开挖面"], 5000)})
+    path = tmp_path / "results.csv"
+    frame.to_csv(path, index=False)
+    streamed = charts.file_distribution(path, chunk_size=700)
+    direct = charts.grouped_histogram(frame["unit_loss"], frame["disturbance_type"], log=True)
+    assert streamed.keys() == direct.keys()
+    for name in direct:
+        np.testing.assert_allclose(streamed[name][0], direct[name][0])
+        np.testing.assert_array_equal(streamed[name][1], direct[name][1])
+
+
+def test_raster_pyramid_means_ignore_nan():
+    array = np.arange(15 * 9, dtype=np.float32).reshape(15, 9)
+    array[0, 0] = np.nan
+    levels = charts.raster_pyramid(array, min_size=4)
+    assert [level.shape for level in levels] == [(15, 9), (8, 5), (4, 3)]
+    assert levels[1][0, 0] == np.nanmean(array[:2, :2])
+    assert levels[1][-1, -1] == array[-1, -1]
+    level, block, (row0, col0, factor) = charts.pyramid_window(levels, max_pixels=40)
+    assert (level, block.shape, factor) == (1, (8, 5), 2)
@@ -0,0 +1,113 @@
+"""金标准测试：固定当前公式输出，公式或页面改动导致结果变化时报错
+
+期望值由当前实现计算得到（相对误差 1e-12）；确需修改公式时应同时更新此处数值并说明原因。
+"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from soil_loss import engine
+from soil_loss.summary import COL_TOTAL, COL_UNIT, summary_frame
+
+REL = 1e-12
+APP_PATH = str(Path(__file__).resolve().parents[1] / "app.py")
+
+LS_CASES = [
+    # (坡长 λ, 坡度 θ, LS)
+    (50, 15, 1.1026355073272809),
+    (20, 10, 0.5188702496371669),
+    (100, 19.9, 1.8858261242834804),
+    (100, 20, 2.6515178862640507),
+    (35, 45, 4.0326626792115965),
+    (0, 15, 0.0),
+    (10, 0, 0.0)
+]
+
+GENERAL_CASES = [
+    # (R, K, C, P, T, λ, θ, 面积) → (LS, 单位面积流失量, 总流失量)
+    ((1800, 0.12, 0.3, 1.0, 1.0, 50, 15, 4), (1.1026355073272809, 71.45078087480779, 285.80312349923116)),
+    ((5800, 0.42, 0.05, 0.5, 0.8, 120, 30, 12.5), (4.75859780235827, 231.8388849308949, 2897.986061636186))
+]
+
+EXCAVATION_CASES = [
+    # (R, 土体, 饱和度, H, β, 面积) → (单位面积流失量, 总流失量)
+    ((1800, "砂土", "湿润", 8, 45, 2), (5388.493083896461, 10776.986167792922)),
+    ((3500, "黏土", "半湿润", 12.5, 60, 0.8), (42607.63796737833, 34086.110373902666)),
+    ((1200, "砾石土", "干燥", 3, 30, 5), (555.6599999999999, 2778.2999999999993))
+]
+
+PILE_CASES = [
+    # (R, H, φ, L, 形状, 材料, 级配, 含黏粒, 压实度, 面积) → (基础计算值, 材料调整系数, 单位面积流失量, 总流失量)
+    ((1800, 6, 28, 25, "锥形", "弃渣", "良好", True, 75, 3),
+     (13679.123128011533, 0.8324999999999999, 11387.8700040696, 34163.6100122088)),
+    ((4200, 10, 35, 40, "脊形", "建筑垃圾", "不良", False, 90, 1.5),
+     (153255.3091446761, 0.8729999999999999, 133791.88488330223, 200687.82732495334)),
+    ((5800, 4, 20, 15, "扇形", "表土", "一般", True, 60, 2),
+     (11694.07978703952, 0.7603199999999999, 8891.242743681887, 17782.485487363774))
+]
+
+# 页面默认输入下“结果汇总”标签页的指标
+APP_DEFAULT_METRICS = {
+    "LS因子": "1.1026",
+    "总流失量": "285.80 t",
+    "开挖面总流失量": "10776.99 t",
+    "材料调整系数": "0.832",
+    "基础计算值": "13679.12 t/hm²",
+    "堆积体总流失量": "34163.61 t",
+    "🌍 项目总流失量": "45226.40 t",
+    "📦 平均单位流失量": "4211.95 t/hm²"
+}
+
+
+@pytest.mark.parametrize("length, angle, expected", LS_CASES)
+def test_ls_factor(length, angle, expected):
+    assert engine.ls_factor(length, angle) == pytest.approx(expected, rel=REL, abs=1e-15)
+
+
+@pytest.mark.parametrize("args, expected", GENERAL_CASES)
+def test_general_loss(args, expected):
+    assert engine.general_loss(*args) == pytest.approx(expected, rel=REL)
+
+
+@pytest.mark.parametrize("args, expected", EXCAVATION_CASES)
+def test_excavation_loss(args, expected):
+    assert engine.excavation_loss(*args) == pytest.approx(expected, rel=REL)
+
+
+@pytest.mark.parametrize("args, expected", PILE_CASES)
+def test_pile_loss(args, expected):
+    assert engine.pile_loss(*args) == pytest.approx(expected, rel=REL)
+
+
+def test_vectorized_matches_scalar():
+    columns = list(zip(*[args for args, _ in PILE_CASES]))
+    _, _, unit, total = engine.pile_loss(*[np.array(c) for c in columns])
+    assert unit == pytest.approx([e[2] for _, e in PILE_CASES], rel=REL)
+    assert total == pytest.approx([e[3] for _, e in PILE_CASES], rel=REL)
+
+    columns = list(zip(*[args for args, _ in EXCAVATION_CASES]))
+    unit, total = engine.excavation_loss(*[np.array(c) for c in columns])
+    assert total == pytest.approx([e[1] for _, e in EXCAVATION_CASES], rel=REL)
+
+    lengths, angles, expected = (np.array(c) for c in zip(*LS_CASES))
+    assert engine.ls_factor(lengths, angles) == pytest.approx(expected, rel=REL, abs=1e-15)
+
+
+def test_summary_frame():
+    df = summary_frame([4, 2, 3, 1],
+                       [GENERAL_CASES[0][1][1], EXCAVATION_CASES[0][1][0], PILE_CASES[0][1][2], 0],
+                       [GENERAL_CASES[0][1][2], EXCAVATION_CASES[0][1][1], PILE_CASES[0][1][3], 0])
+    assert df[COL_TOTAL].sum() == pytest.approx(45226.399303500955, rel=REL)
+    assert df[COL_UNIT].mean() == pytest.approx(4211.953467210217, rel=REL)
+
+
+def test_app_default_metrics(tmp_path, monkeypatch):
+    testing = pytest.importorskip("streamlit.testing.v1")
+    monkeypatch.setenv("SOIL_LOSS_PARAMS_DB", str(tmp_path / "params.sqlite"))
+    monkeypatch.setenv("SOIL_LOSS_PROJECTS_DB", str(tmp_path / "projects.sqlite"))
+    at = testing.AppTest.from_file(APP_PATH, default_timeout=120).run()
+    assert not at.exception
+    metrics = {m.label: m.value for m in at.metric}
+    for label, value in APP_DEFAULT_METRICS.items():
+        assert metrics[label] == value, label
@@ -0,0 +1,69 @@
+"""编译内核：与 engine/segments/raster 的 NumPy 实现一致；未安装 numba 或强制 numpy 时退回原实现"""
+import os
+import subprocess
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from soil_loss import engine, kernels, raster, segments
+
+REL = 1e-12
+
+
+def test_formulas_match_engine():
+    rng = np.random.default_rng(0)
+    n = 5000
+    R, area, angle = rng.uniform(800, 7000, n), rng.uniform(0.01, 10, n), rng.uniform(0, 60, n)
+    general = (R, rng.uniform(0.1, 0.45, n), rng.uniform(0, 1, n), rng.uniform(0.1, 1, n), 1.0,
+               rng.uniform(5, 300, n), angle, area)
+    excavation = (R, rng.integers(0, 4, n), np.array(list(engine.SATURATION_FACTORS))[rng.integers(0, 3, n)],
+                  rng.uniform(1, 30, n), angle, area)
+    pile = (R, rng.uniform(1, 20, n), rng.uniform(10, 40, n), rng.uniform(5, 60, n), rng.integers(0, 4, n),
+            "弃渣", rng.integers(0, 3, n), rng.random(n) < 0.5, rng.uniform(50, 100, n), area)
+    for name, args in (("general_loss", general), ("excavation_loss", excavation), ("pile_loss", pile)):
+        expected = getattr(engine, name)(*args)
+        for result in (getattr(kernels, name)(*args), _in_thread(getattr(kernels, name), *args)):
+            for got, want in zip(result, expected):
+                np.testing.assert_allclose(got, want, rtol=REL)
+    # 标量参数返回标量
+    assert kernels.excavation_loss(1800, "壤土", "湿润", 5, 40, 1) == pytest.approx(
+        engine.excavation_loss(1800, "壤土", "湿润", 5, 40, 1), rel=REL)
+    assert np.ndim(kernels.general_loss(1800, 0.3, 0.5, 1, 1, 50, 25, 2)[1]) == 0
+
+
+def _in_thread(func, *args):
+    # 非主线程调用串行编译版本
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func(*args)))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_loops_match_numpy():
+    rng = np.random.default_rng(1)
+    offsets = segments.offsets_from_counts(rng.integers(0, 6, 2000))
+    lengths = rng.uniform(0, 80, offsets[-1])
+    lengths[::7] = 0
+    angles = rng.uniform(0, 50, offsets[-1])
+    np.testing.assert_allclose(kernels.profile_ls(lengths, angles, offsets),
+                               segments.profile_ls(lengths, angles, offsets), rtol=1e-9)
+
+    dem = np.cumsum(rng.normal(0, 1, (120, 90)), axis=0) + rng.normal(0, 3, (120, 90))
+    dem[40, 30] = np.nan
+    direction, step = raster.flow_directions(dem, 10.0)
+    np.testing.assert_array_equal(kernels.flow_length(direction, step, 300.0),
+                                  raster.flow_length(direction, step, 300.0))
+
+
+def test_numpy_backend_forced():
+    code = ("from soil_loss import engine, kernels; "
+            "assert kernels.BACKEND == 'numpy' and not kernels.ENABLED; "
+            "args = (1800, 0.3, 0.5, 1, 1, 50, 25, 2); "
+            "print(kernels.general_loss(*args) == engine.general_loss(*args))")
+    env = {**os.environ, kernels.BACKEND_ENV: "numpy"}
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True)
+    assert out.stdout.strip() == "True"
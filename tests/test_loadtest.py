@@ -0,0 +1,53 @@
+"""并发压测：汇总、容量估算和基线比较；本地实例上的小规模端到端运行"""
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from soil_loss import loadtest
+
+
+def make_result(latency_scale=1.0):
+    rng = np.random.default_rng(0)
+    records, levels = [], {}
+    for level in (1, 10, 40):
+        n = level * 5
+        latency = rng.uniform(0.1, 0.2, n) * level * latency_scale
+        records += [(level, i % level, "tab", t, 30_000, None) for i, t in enumerate(latency)]
+        levels[level] = dict(wall=10.0, cpu=n * 0.1, rss_start=200 * loadtest.MB,
+                             rss_connected=(200 + 2 * level) * loadtest.MB, rss_peak=(210 + 2 * level) * loadtest.MB)
+    records.append((40, 0, "report", np.nan, 0, "TimeoutError: "))
+    frame = pd.DataFrame(records, columns=["level", "session", "action", "latency", "bytes", "error"])
+    config = dict(levels=[1, 10, 40], actions=5, think=[1.0, 3.0], seed=0, app="app.py",
+                  idle_rss=200 * loadtest.MB, cpu_count=4)
+    return loadtest.LoadResult(frame, pd.DataFrame(), levels, config)
+
+
+def test_level_table_and_capacity():
+    result = make_result()
+    table = result.level_table().set_index("sessions")
+    assert table.loc[10, "reruns"] == 50 and table.loc[40, "errors"] == 1
+    assert table.loc[10, "mb_per_session"] == pytest.approx(2.0)
+    assert table.loc[10, "cpu_ms_per_rerun"] == pytest.approx(100.0)
+    capacity = result.capacity(target_p90=2.0, memory_limit=1000 * loadtest.MB)
+    # 40 个会话有错误且 p90 超标，延迟上限为 10；内存 (1000 - 200) / 2 = 400
+    assert capacity["latency_bound"] == 10 and capacity["memory_bound"] == 400
+    assert capacity["sessions"] == min(10, capacity["cpu_bound"])
+    assert "TimeoutError" in result.report(memory_limit=1000 * loadtest.MB)
+
+
+def test_regressions_against_baseline():
+    baseline = make_result().summary()
+    assert make_result().regressions(baseline) == []
+    problems = make_result(latency_scale=2.0).regressions(baseline)
+    assert len(problems) == 3 and all("p90" in p for p in problems)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="进程采样依赖 /proc")
+def test_local_instance_round_trip():
+    pytest.importorskip("websockets")
+    result = loadtest.run_loadtest(levels=(2,), actions=3, think=(0.0, 0.1), warmup=False)
+    table = result.level_table()
+    assert table["reruns"].iloc[0] == 8 and table["errors"].iloc[0] == 0
+    assert table["kb_per_rerun"].iloc[0] > 0 and np.isfinite(table["cpu_ms_per_rerun"].iloc[0])
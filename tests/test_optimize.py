@@ -0,0 +1,39 @@
+"""反算设计：非支配解筛选、现状总流失量与目标约束"""
+import numpy as np
+import pytest
+
+from soil_loss import optimize
+
+GENERAL = dict(R=1800, K=0.12, C=0.3, P=1.0, T=1.0, area=4, slope_length=50, slope_angle=15)
+EXCAVATION = dict(R=1800, soil_type="砂土", saturation="湿润", slope_height=8, slope_angle=45, area=2)
+PILE = dict(R=1800, pile_height=6, pile_angle=28, pile_length=25, shape="锥形", material="弃渣",
+            gradation="良好", contains_clay=True, compaction=75, area=3)
+
+
+def test_pareto_mask():
+    loss = np.array([5.0, 4.0, 6.0, 1.0, 4.0, 3.0])
+    cost = np.array([0.0, 1.0, 1.0, 9.0, 2.0, 2.0])
+    np.testing.assert_array_equal(optimize.pareto_mask(loss, cost), [True, True, False, True, False, True])
+
+
+def test_current_loss_matches_page_total():
+    problem = optimize.DesignProblem(GENERAL, EXCAVATION, PILE)
+    assert problem.current_loss() == pytest.approx(45226.399303500955, rel=1e-12)
+
+
+def test_cheapest_design_meets_target():
+    bounds = optimize.default_bounds(GENERAL, EXCAVATION, PILE)
+    problem = optimize.DesignProblem(GENERAL, EXCAVATION, PILE, bounds=bounds,
+                                     options={"gradation": ["良好", "一般", "不良"], "shape": ["锥形", "脊形"]})
+    result = optimize.optimize(problem, target=20_000, population=1024, generations=20, seed=0)
+    front = result.front
+    assert front[optimize.COL_COST].is_monotonic_increasing
+    assert front[optimize.COL_LOSS].is_monotonic_decreasing
+    assert front[optimize.COL_COST].iloc[0] == 0.0
+    chosen = result.cheapest()
+    assert chosen[optimize.COL_LOSS] <= 20_000
+    # 方案按公式复算的流失量与费用一致
+    unit, codes = problem.baseline()
+    loss, cost = problem.evaluate(unit[np.newaxis], codes[np.newaxis])
+    assert loss[0] == pytest.approx(result.baseline_loss) and cost[0] == 0.0
+    assert result.cheapest(1.0) is None
@@ -0,0 +1,49 @@
+"""进程池批量测算：与单进程结果一致，按输入顺序写出"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from soil_loss import batch, engine, parallel
+from soil_loss.summary import DISTURBANCE_TYPES
+
+
+def make_units(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "project": rng.choice(["甲", "乙"], n),
+        "disturbance_type": rng.choice(DISTURBANCE_TYPES, n),
+        "area": rng.uniform(0.1, 5, n),
+        "slope_angle": rng.uniform(2, 45, n),
+        "saturation": rng.choice(list(engine.SATURATION_FACTORS), n),
+        "material": rng.choice(list(engine.MATERIAL_FACTORS), n)
+    })
+
+
+def test_parallel_run_matches_serial(tmp_path):
+    make_units(2000).to_csv(tmp_path / "units.csv", index=False)
+    serial = batch.run_batch(tmp_path / "units.csv", tmp_path / "serial.csv", chunk_size=300)
+    pooled = parallel.run_batch_parallel(tmp_path / "units.csv", tmp_path / "pooled.csv", workers=2,
+                                         chunk_size=300)
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "pooled.csv"), pd.read_csv(tmp_path / "serial.csv"),
+                                  rtol=1e-12)
+    assert pooled.units == serial.units and set(pooled.loss) == set(serial.loss)
+    for key, loss in serial.loss.items():
+        assert pooled.loss[key] == pytest.approx(loss, rel=1e-12)
+        assert pooled.area[key] == pytest.approx(serial.area[key], rel=1e-12)
+
+
+def test_compute_arrays_matches_unit_losses():
+    units = batch.prepare_chunk(make_units(500, seed=1))
+    columns = {name: units[name].to_numpy() for name in batch.COLUMN_DEFAULTS}
+    ls, unit, totals = parallel.compute_arrays(columns, workers=2, chunk_size=128)
+    expected_ls, expected_unit = batch.unit_losses(columns, engine.encode(batch.TYPE_TABLE,
+                                                                           columns["disturbance_type"]))
+    np.testing.assert_allclose(ls, expected_ls, rtol=1e-12)
+    np.testing.assert_allclose(unit, expected_unit, rtol=1e-12)
+    assert sum(totals.loss.values()) == pytest.approx((expected_unit * units["area"]).sum(), rel=1e-12)
+
+
+def test_scalar_columns_broadcast():
+    ls, unit, totals = parallel.compute_arrays({"slope_angle": np.linspace(5, 40, 8), "area": 2.0}, workers=1)
+    np.testing.assert_allclose(ls, engine.ls_factor(50.0, np.linspace(5, 40, 8)), rtol=1e-12)
+    assert totals.units == 8 and len(unit) == 8
@@ -0,0 +1,66 @@
+"""措施情景：增量合计与整表重算一致，撤销和非法取值不破坏情景"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from soil_loss import batch, scenarios
+from soil_loss.summary import COL_TOTAL, DISTURBANCE_TYPES
+
+
+def make_units(n=2_000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "project": "p",
+        "disturbance_type": np.array(DISTURBANCE_TYPES)[rng.integers(0, 4, n)],
+        "area": rng.uniform(0.1, 3, n),
+        "P": rng.uniform(0.3, 1, n),
+        "compaction": rng.uniform(50, 100, n),
+        "slope_angle": rng.uniform(5, 60, n)
+    }, index=[f"u{i}" for i in range(n)])
+
+
+def test_incremental_totals_match_full_recompute():
+    units = make_units()
+    scenario = scenarios.Baseline(units).scenario("s")
+    rng = np.random.default_rng(1)
+    first, second = units.index[rng.choice(len(units), 300, replace=False)], units.index[:40]
+    scenario.set(first, "P", 0.5).set(second, "compaction", 95.0).set(second[:5], "disturbance_type", "工程堆积体")
+    scenario.set(first[:10], "P", 0.2)
+
+    expected = units.copy()
+    expected.loc[first, "P"] = 0.5
+    expected.loc[second, "compaction"] = 95.0
+    expected.loc[second[:5], "disturbance_type"] = "工程堆积体"
+    expected.loc[first[:10], "P"] = 0.2
+    full = batch.compute_units(expected).groupby("disturbance_type")["total_loss"].sum()
+    summary = scenario.summary().set_index("扰动类型")[COL_TOTAL]
+    np.testing.assert_allclose(summary.reindex(full.index), full, rtol=1e-10)
+    assert len(scenario.changes()) == len(set(first) | set(second))
+    assert scenario.evaluated == 355
+
+
+def test_reset_and_invalid_values():
+    baseline = scenarios.Baseline(make_units(200))
+    scenario = baseline.scenario("s").set(["u1", "u2"], "pile_height", 12.0)
+    with pytest.raises(KeyError):
+        scenario.set("u3", "material", "不存在的材料")
+    assert list(scenario.overrides) == ["pile_height"]
+    scenario.reset("u1")
+    assert list(scenario.changed) == [2]
+    scenario.reset()
+    assert scenario.state == {} and scenario.total_loss == pytest.approx(baseline.total_loss, rel=1e-12)
+
+
+def test_table_compare_and_given_ls():
+    units = pd.DataFrame({"disturbance_type": ["一般扰动地表"] * 2 + ["工程开挖面"], "area": [1.0, 1.0, 2.0],
+                          "project": "p", "LS": [2.0, 4.0, np.nan]}, index=["坡面 1", "坡面 2", "开挖面"])
+    baseline = scenarios.Baseline(units)
+    table = pd.DataFrame({"scenario": ["减半", "减半", "削坡"], "unit": ["坡面 1", "坡面 2", "开挖面"],
+                          "column": ["C", "C", "slope_angle"], "value": ["0.15", "0.15", "30"]})
+    result = scenarios.scenarios_from_table(baseline, table)
+    assert baseline.ls[:2].tolist() == [2.0, 4.0]
+    df = scenarios.compare(baseline, result.values()).set_index(["情景", "扰动类型"])
+    general = df.loc[("减半", "一般扰动地表")]
+    assert general[COL_TOTAL] == pytest.approx(df.loc[("基准", "一般扰动地表"), COL_TOTAL] / 2)
+    assert general["变化率(%)"] == pytest.approx(-50)
+    assert df.loc[("减半", "合计"), "变化量(t)"] == pytest.approx(general["变化量(t)"])
@@ -0,0 +1,40 @@
+"""多坡段 LS：与手算坡面一致，单一坡段退化为 engine.ls_factor，大规模输入无 NaN"""
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from soil_loss import engine, segments
+
+
+def test_two_segment_profile_by_hand():
+    # 上段 10 m、10°（缓坡 m=0.3, n=1.2），下段 30 m、25°（陡坡 m=0.5, n=1.3）
+    upper = 10 ** 1.3 / (10 * 20 ** 0.3) * (math.sin(math.radians(10)) / 0.3) ** 1.2
+    lower = (40 ** 1.5 - 10 ** 1.5) / (30 * 20 ** 0.5) * (math.sin(math.radians(25)) / 0.3) ** 1.3
+    frame = pd.DataFrame({"profile": ["A", "A", "B"], "segment_length": [10.0, 30.0, 50.0],
+                          "segment_angle": [10.0, 25.0, 30.0]})
+    table = segments.profile_table(frame).set_index("坡面")
+    assert table.loc["A", "LS因子"] == pytest.approx((upper * 10 + lower * 30) / 40, rel=1e-12)
+    assert table.loc["A", "坡段数"] == 2 and table.loc["A", "总坡长(m)"] == 40
+    assert table.loc["B", "LS因子"] == pytest.approx(engine.ls_factor(50.0, 30.0), rel=1e-12)
+
+
+def test_empty_and_zero_length_profiles():
+    offsets = segments.offsets_from_counts([0, 2, 1])
+    ls = segments.profile_ls(np.array([0.0, 20.0, 0.0]), np.array([15.0, 15.0, 40.0]), offsets)
+    assert ls[0] == 0 and ls[2] == 0
+    assert ls[1] == pytest.approx(engine.ls_factor(20.0, 15.0), rel=1e-12)
+
+
+def test_large_input_has_no_nan_at_profile_tops():
+    # 全局 cumsum 相减会在坡顶留下约 -1e-14 的累计坡长，分数次幂后为 NaN
+    rng = np.random.default_rng(0)
+    offsets = segments.offsets_from_counts(rng.integers(0, 6, 200_000))
+    lengths = rng.uniform(0, 80, offsets[-1])
+    lengths[::7] = 0
+    angles = rng.uniform(0, 50, offsets[-1])
+    upper, _ = segments.cumulative_lengths(lengths, offsets)
+    assert upper.min() < 0
+    assert np.isfinite(segments.segment_ls(lengths, angles, offsets)).all()
+    assert np.isfinite(segments.profile_ls(lengths, angles, offsets)).all()
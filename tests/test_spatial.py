@@ -0,0 +1,41 @@
+"""空间输入：投影面积、按最大重叠面积连接分区属性"""
+import numpy as np
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+from shapely import box
+
+from soil_loss import spatial
+from soil_loss.batch import compute_units
+
+
+@pytest.fixture
+def zones():
+    # 两个 R 分区，以 x = 100 m 为界
+    return gpd.GeoDataFrame({"R": [1800.0, 3500.0]}, geometry=[box(0, 0, 100, 100), box(100, 0, 200, 100)],
+                            crs=32649)
+
+
+def test_largest_overlap_picks_dominant_zone(zones):
+    units = gpd.GeoDataFrame(geometry=[box(10, 10, 30, 30), box(90, 0, 130, 10), box(60, 0, 110, 10),
+                                       box(500, 500, 510, 510)], crs=32649)
+    np.testing.assert_array_equal(spatial.largest_overlap(units, zones), [0, 1, 0, -1])
+
+
+def test_compute_layer_matches_batch(zones):
+    units = gpd.GeoDataFrame({
+        "disturbance_type": ["一般扰动地表", "工程开挖面", "工程堆积体"],
+        "R": [np.nan, np.nan, 1200.0]
+    }, geometry=[box(0, 0, 200, 100), box(150, 0, 190, 50), box(0, 0, 50, 20)], crs=32649)
+    result = spatial.compute_layer(units, [zones], project="p")
+    np.testing.assert_allclose(result["area"], [2.0, 0.2, 0.1])
+    np.testing.assert_allclose(result["R"], [1800.0, 3500.0, 1200.0])
+    expected = compute_units(result.drop(columns="geometry")[["project", "disturbance_type", "area", "R"]])
+    np.testing.assert_allclose(result["total_loss"], expected["total_loss"])
+
+
+def test_geographic_layer_area_in_hm2():
+    # 赤道附近 0.01° × 0.01° 约 1.11 km × 1.11 km
+    units = gpd.GeoDataFrame({"disturbance_type": ["一般扰动地表"]}, geometry=[box(111.0, 0.0, 111.01, 0.01)],
+                             crs=4326)
+    assert spatial.type_areas(units)[0] == pytest.approx(123.0, rel=0.01)
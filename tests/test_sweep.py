@@ -0,0 +1,36 @@
+"""参数扫描：网格结果与逐点公式一致，剖面取向正确"""
+import numpy as np
+import pytest
+
+from soil_loss import engine, sweep
+
+PILE = dict(R=1800, pile_height=6, pile_angle=28, pile_length=25, shape="锥形", material="弃渣",
+            gradation="良好", contains_clay=True, compaction=75, area=3)
+
+
+def test_grid_matches_scalar_formula():
+    axes = {"pile_height": [2.0, 6.0, 9.5], "gradation": ["良好", "不良"], "pile_angle": [10.0, 28.0, 40.0, 45.0],
+            "contains_clay": [True, False]}
+    surface = sweep.evaluate("工程堆积体", PILE, axes)
+    assert surface.unit.shape == (3, 2, 4, 2)
+    for i, j, k, m in np.ndindex(surface.unit.shape):
+        expected = engine.pile_loss(1800, axes["pile_height"][i], axes["pile_angle"][k], 25, "锥形", "弃渣",
+                                    axes["gradation"][j], axes["contains_clay"][m], 75, 1.0)[2]
+        assert surface.unit[i, j, k, m] == pytest.approx(expected, rel=1e-12)
+
+
+def test_section_orientation_and_slicing():
+    surface = sweep.evaluate("工程堆积体", PILE, {"pile_height": np.linspace(1, 30, 5),
+                                                  "pile_angle": np.linspace(5, 45, 7),
+                                                  "gradation": ["良好", "一般", "不良"]})
+    x, y, z = surface.section("pile_angle", "pile_height", {"gradation": "一般"}, total=True)
+    assert z.shape == (len(y), len(x)) == (5, 7)
+    np.testing.assert_allclose(z, surface.unit[:, :, 1] * 3)
+    x, z = surface.profile("gradation", {"pile_height": 30, "pile_angle": 44})
+    np.testing.assert_allclose(z, surface.unit[-1, -1, :])
+
+
+def test_grid_size_limit():
+    axes = {"slope_angle": np.zeros(5000), "slope_length": np.zeros(5000)}
+    with pytest.raises(ValueError):
+        sweep.evaluate("一般扰动地表", {"area": 1}, axes)